@@ -1,14 +1,40 @@
 from __future__ import annotations
+import time
 import pygame
-import random
 
 # from game import Game
-from typing import Optional, Tuple, Union
+from typing import List, Optional, Tuple, Union
+from ai import AIController
+from physics import Impact
+from profiler import PHASES, FrameProfiler
+from simulation import (DOWN, PADDLE_HEIGHT, PADDLE_WIDTH, UP,
+                        BallState, Box, Paddle)
+from text_cache import render_text
 
 WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
 RED = (255, 0, 0)
 
+# The least number of seconds between two refreshes of the profiler HUD
+HUD_REFRESH = 0.5
+
+# The simulation direction for each direction a player can move in
+DIRECTIONS = {"up": UP, "down": DOWN}
+
+
+def _body_property(name: str) -> property:
+    """
+    Return a property that reads and writes the attribute <name> of the
+    simulation body behind an actor.
+    """
+    def fget(self):
+        return getattr(self.body, name)
+
+    def fset(self, value):
+        setattr(self.body, name, value)
+
+    return property(fget, fset)
+
 
 class Actor:
     """
@@ -17,6 +43,17 @@ class Actor:
 
     This is an abstract class. Only subclasses should be instantiated.
 
+    Actors have __slots__ rather than a __dict__, so every subclass lists
+    the attributes it adds in its own __slots__.
+
+    === Public Attributes ===
+    dirty:
+        True if this actor looks different although its rectangle on the
+        screen has not changed, so it must be redrawn on the next frame
+    body:
+        The object in the game's simulation holding this actor's position,
+        or None if the actor only exists on screen
+
     === Private Attributes ===
     _x:
         x coordinate of this actor's location on the stage
@@ -34,6 +71,9 @@ class Actor:
         color of this actor
     _speed:
         speed of this actor
+    _last_position:
+        Where this actor was before the latest simulation tick, or None
+        if it is always drawn where it is
     """
     _x: int
     _y: int
@@ -41,16 +81,22 @@ class Actor:
     _height: int
     _color: Tuple[int]
     _speed: int
+    __slots__ = ('_x', '_y', '_width', '_height', '_color', '_speed',
+                 'y_bound', 'game', 'dirty', 'body', '_last_position')
 
-    def __init__(self, x, y, width, height, y_bound, game):
+    def __init__(self, x, y, width, height, y_bound, game, body=None):
         """
         Initialize an actor with the given <x> and <y> position and
-        <width>x<height> dimensions on the game's stage.
+        <width>x<height> dimensions on the game's stage, drawing the
+        simulation object <body> if one is given.
         """
+        self.body = body
         self._x, self._y, self._width, self._height = x, y, width, height
         self._color = WHITE
         self.y_bound = y_bound
         self.game = game
+        self.dirty = False
+        self._last_position = None
 
     def move(self, dt: float) -> None:
         """
@@ -59,12 +105,15 @@ class Actor:
 
         raise NotImplementedError
 
-    def draw(self) -> None:
+    def draw(self, surface: Optional[pygame.Surface] = None) -> None:
         """
-        Draw this actor on the stage.
+        Draw this actor on the stage, or on <surface> if one is given.
         """
-        pygame.draw.rect(self.game.screen, self._color, (int(self._x), int(self._y),
-                                                    self._width, self._height))
+        if surface is None:
+            surface = self.game.screen
+        x, y = self.get_draw_coordinates()
+        pygame.draw.rect(surface, self._color, (int(x), int(y),
+                                                self._width, self._height))
 
     def get_coordinates(self) -> Tuple[int, int]:
         """
@@ -84,36 +133,82 @@ class Actor:
         """
         return self._speed
 
+    def get_rect(self) -> Optional[pygame.Rect]:
+        """
+        Return the area of the screen this actor covers when drawn, or None
+        if it is not drawn at all.
+        """
+        x, y = self.get_draw_coordinates()
+        return pygame.Rect(int(x), int(y), self._width, self._height)
+
+    def remember_position(self) -> None:
+        """
+        Remember where this actor is before a simulation tick moves it.
+        """
+        self._last_position = (self._x, self._y)
+
+    def get_draw_coordinates(self) -> Tuple[float, float]:
+        """
+        Return where to draw this actor in the current frame: between where
+        it was before the latest simulation tick and where it is now, by the
+        game's interpolation.
+        """
+        if self._last_position is None:
+            return self._x, self._y
+        last_x, last_y = self._last_position
+        alpha = self.game.interpolation
+        return (last_x + (self._x - last_x) * alpha,
+                last_y + (self._y - last_y) * alpha)
+
+    def get_bounds(self) -> Tuple[float, float, float, float]:
+        """
+        Return the (left, top, right, bottom) bounds of this actor.
+        """
+        return (self._x, self._y, self._x + self._width,
+                self._y + self._height)
+
+    def sync_world(self) -> None:
+        """
+        Let the game's collision world know this actor has moved.
+        """
+        if self.body is not None and self.body in self.game.world:
+            self.game.world.update(self.body)
+
 
 class HumanPlayer(Actor):
     """
-    A class to represent a Human Player in the game.
+    A class to represent a Human Player in the game. Its position, speed
+    and score are those of its paddle in the game's simulation.
 
     === Private Attributes ===
     _score:
         score of this human player
     """
-    _x: int
-    _y: int
-    _width: int
-    _height: int
     _color: Tuple[int]
-    _speed: int
-    _score: int
+    body: Paddle
+    __slots__ = ()
+    _x = _body_property('x')
+    _y = _body_property('y')
+    _width = _body_property('width')
+    _height = _body_property('height')
+    _speed = _body_property('speed')
+    _score = _body_property('score')
 
-    def __init__(self, x: int, y: int, y_bound, game: 'Game') -> None:
+    def __init__(self, x: int, y: int, y_bound, game: 'Game',
+                 body: Optional[Paddle] = None) -> None:
         """
-        Initialize a HumanPlayer at the position <x> and <y> on the stage.
+        Initialize a HumanPlayer at the position <x> and <y> on the stage,
+        drawing and moving the simulation paddle <body> if one is given.
         """
-        super().__init__(x, y, 15, 80, y_bound, game)
-        self._speed = 10
-        self._score = 0
+        super().__init__(x, y, PADDLE_WIDTH, PADDLE_HEIGHT, y_bound, game,
+                         body if body is not None else Paddle(x, y))
 
     def reset_pos(self) -> None:
         """
         Set the position of the bar by changing the self._x and self._y values.
         """
         self._y = (self.game.d_h//2) - 40
+        self.sync_world()
 
     def get_score(self) -> int:
         """
@@ -126,10 +221,8 @@ class HumanPlayer(Actor):
         """
         Move the human player on the <game>'s stage based on direction.
         """
-        if (direction == "up") and (self._y-self._speed) >= self.y_bound[0]:
-            self._y -= self._speed * dt
-        elif (direction == "down") and ((self._y+self._height)+self._speed)<=self.y_bound[1]:
-            self._y += self._speed * dt
+        if direction in DIRECTIONS:
+            self.game.sim.move_paddle(self.body, DIRECTIONS[direction], dt)
 
     def change_score(self, change_in_score: int):
         """
@@ -143,31 +236,49 @@ class HumanPlayer(Actor):
         Resets the position of this player to the default starting location
         """
         self._y = game.screen_size[1] // 2 + self._height//2
+        self.sync_world()
 
 
 class AIPlayer(Actor):
     """
-    A class to represent an AI Player in the game.
+    A class to represent an AI Player in the game. Like a HumanPlayer, its
+    position, speed and score are those of its paddle in the game's
+    simulation, but it chooses its own direction: towards the point where
+    the ball will reach it.
 
     === Private Attributes ===
     _score:
         score of this AI player
+    _controller:
+        chooses the direction this player moves in
     """
-    _x: int
-    _y: int
-    _width: int
-    _height: int
     _color: Tuple[int]
-    _speed: int
-    _score: int
+    _controller: AIController
+    body: Paddle
+    __slots__ = ('_controller',)
+    _x = _body_property('x')
+    _y = _body_property('y')
+    _width = _body_property('width')
+    _height = _body_property('height')
+    _speed = _body_property('speed')
+    _score = _body_property('score')
+
+    def __init__(self, x: int, y: int, y_bound, game: 'Game',
+                 body: Optional[Paddle] = None) -> None:
+        """
+        Initialize an AI Player at the position <x> and <y> on the stage,
+        drawing and moving the simulation paddle <body> if one is given.
+        """
+        super().__init__(x, y, PADDLE_WIDTH, PADDLE_HEIGHT, y_bound, game,
+                         body if body is not None else Paddle(x, y))
+        self._controller = AIController()
 
-    def __init__(self, x: int, y: int, game: 'Game') -> None:
+    def reset_pos(self) -> None:
         """
-        Initialize an AI Player at the position <x> and <y> on the stage.
+        Set the position of the bar by changing the self._x and self._y values.
         """
-
-        super().__init__(x, y, 10, 10, game)
-        self.velocity = 10
+        self._y = (self.game.d_h//2) - 40
+        self.sync_world()
 
     def get_score(self) -> int:
         """
@@ -176,164 +287,96 @@ class AIPlayer(Actor):
 
         return self._score
 
-    # TODO: implement
-    def move(self) -> None:
+    def change_score(self, change_in_score: int):
+        """
+        Change the score for this player
+        change_in_score: an int, which will be added to the current score
+        """
+        self._score += change_in_score
+
+    def get_direction(self) -> int:
+        """
+        Return the direction this player wants to move in on this tick.
+        """
+        sim = self.game.sim
+        return self._controller(sim, sim.paddles.index(self.body))
+
+    def move(self, dt: float) -> None:
         """
         Move the player on the <game>'s stage.
         """
-        pass
+        self.game.sim.move_paddle(self.body, self.get_direction(), dt)
 
 
 class Ball(Actor):
     """
-    A class to represent a Ball in the game.
+    A class to represent a Ball in the game. Its position and velocity are
+    those of the ball in the game's simulation; its width and height are the
+    radius of the ball.
     """
-    _x: int
-    _y: int
-    _dx: int
-    _dy: int
     _width: int
     _height: int
     _color: str
-
-    def __init__(self, x: int, y: int, y_bound: list[int] , x_bound: list[int], game: 'Game') -> None:
-        """
-        Initialize a ball with the given x and y position
-        """
-        super().__init__(x, y, 18, 18, y_bound, game)
+    body: BallState
+    __slots__ = ('x_bound',)
+    _x = _body_property('x')
+    _y = _body_property('y')
+    _dx = _body_property('dx')
+    _dy = _body_property('dy')
+
+    def __init__(self, x: int, y: int, y_bound: list[int] , x_bound: list[int], game: 'Game',
+                 body: Optional[BallState] = None) -> None:
+        """
+        Initialize a ball with the given x and y position, drawing and moving
+        the simulation ball <body> if one is given.
+        """
+        if body is None:
+            body = BallState(x, y)
+        super().__init__(x, y, body.radius, body.radius, y_bound, game, body)
         self._color = RED
-        # self._range_of_dx = range(-4,4)
-        # self._range_of_dy = range(-4,4)
-        self._dx = None
-        self._dy = None
         self.x_bound = x_bound
-        # self._edges = []
-        # self.get_edges()
 
     def draw(self) -> None:
         """
         Draws the ball to the screen.
         """
-        pygame.draw.circle(self.game.screen, self._color, (int(self._x), int(self._y)),
+        x, y = self.get_draw_coordinates()
+        pygame.draw.circle(self.game.screen, self._color, (int(x), int(y)),
                            self._width)
 
-    def move(self, dt: float) -> None:
+    def get_rect(self) -> Optional[pygame.Rect]:
         """
-        Move the ball on the <game>'s stage based.
+        Return the area of the screen covered by this ball's circle.
         """
-        new_x = self._x+self._dx
-        new_y = self._y+self._dy
-
-        check_collision = self.check_collision(new_x, new_y)
+        x, y = self.get_draw_coordinates()
+        return pygame.Rect(int(x) - self._width, int(y) - self._width,
+                           2 * self._width + 1, 2 * self._width + 1)
 
-        # Check collision with Top border
-        if new_y - self._width <= self.y_bound[0]:
-            self._x += self._dx * dt
-            self._y = self.y_bound[0]+self._height
-            self._dy = -self._dy
-            return
-
-        # Check Collision with bottom Border
-        elif new_y + self._width >= self.y_bound[1]:
-            self._x += self._dx * dt
-            self._y = self.y_bound[1]-self._height
-            self._dy = -self._dy
-            return
+    def get_bounds(self) -> Tuple[float, float, float, float]:
+        """
+        Return the (left, top, right, bottom) bounds of this ball, which is
+        drawn as a circle centred on its coordinates.
+        """
+        return (self._x - self._width, self._y - self._width,
+                self._x + self._width, self._y + self._width)
 
-        # Check collision with paddles
-        # elif isinstance(self.game.get_actor(new_x + self._width, new_y), HumanPlayer) \
-        #         or isinstance(self.game.get_actor(new_x - self._width, new_y), HumanPlayer):
-        elif check_collision:
-            # self._x = int(check_collision[1][0])
-            # self._y = int(check_collision[1][1])
-            self._x = new_x
-            self._y = new_y
-            self._dx = -self._dx
-
-            # check if the ball is coming up or coming down
-            if self._dy > 0:
-                self._dy = self.new_direction(-16, 0)[1]
-            elif self._dy < 0:
-                self._dy = self.new_direction(0, 16)[1]
-            else:
-                self._dy = self.new_direction(-16, 16)[1]
-
-        # elif check_collision[0]:
-        #     self._x = int(check_collision[1][0])
-        #     self._y = int(check_collision[1][1])
-        #     self._dx = -self._dx
-        #
-        #     # check if the ball is coming up or coming down
-        #     if self._dy > 0:
-        #         self._dy = self.new_direction(-16, 0)[1]
-        #     elif self._dy < 0:
-        #         self._dy = self.new_direction(0, 16)[1]
-        #     else:
-        #         self._dy = self.new_direction(-16, 16)[1]
-
-
-        # Check Collision with left screen edge
-        elif new_x - self._width <= self.x_bound[0] - 35:
-            self.game.player2.change_score(1)
-            self.game.new_round()
-            self.game.set_new_round(True)
-            return
+    def move(self, dt: float) -> None:
+        """
+        Move the ball on the <game>'s stage based.
 
-        # Check Collision with right screen edge
-        elif new_x + self._width >= self.x_bound[1] + 35:
-            self.game.player1.change_score(1)
-            self.game.new_round()
-            self.game.set_new_round(True)
-            return
+        The game's simulation moves the ball, resolving collisions
+        continuously, and starts a new round when somebody scores.
+        """
+        if self.game.sim.move_ball(dt) is not None:
+            self.game.end_round()
 
-        # Check Collision with right paddle
-        # coords = game.player2.get_coordinates()
-        # dims = game.player2.get_dimensions()
-        # mid_y = (new_y + dims[1]) // 2 + new_y
-        # if new_x + self._width > coords[0] and coords[1] < mid_y < coords[1] - dims[0]:
-        #     self._dx = -self._dx
-        #     self._x = coords[0] + self._width
-        #     self._y += self._dy
-
-        # No Collision
-        else:
-            self._x += self._dx * dt
-            self._y += self._dy * dt
-
-    def check_collision (self, new_x: int, new_y: int):
-        for h in range(-self._height, self._height+1):
-            if self._dx > 0:
-                if isinstance(self.game.get_actor(new_x + self._width, new_y + h), HumanPlayer):
-                    return True
-            else:
-                if isinstance(self.game.get_actor(new_x - self._width, new_y - h), HumanPlayer):
-                    return True
-        return False
-
-    # def check_collision(self, new_x: int, new_y: int):
-    #     """
-    #     Checks if the ball collides with a paddle and returns [True/False, pos
-    #     of collision]
-    #     """
-    #     if self._dx > 0:
-    #         for cord in self._edges:
-    #             if isinstance(self.game.get_actor(new_x + cord[0], new_y - cord[1]), HumanPlayer):
-    #                 return [True, (new_x + cord[0], new_y - cord[1])]
-    #             elif isinstance(self.game.get_actor(new_x + cord[0], new_y + cord[1]), HumanPlayer):
-    #                 return [True, new_x + cord[0], new_y + cord[1]]
-    #         return [False]
-    #     else:
-    #         for cord in self._edges:
-    #             if isinstance(self.game.get_actor(new_x - cord[0], new_y - cord[1]), HumanPlayer):
-    #                 return [True, (new_x - cord[0], new_y - cord[1])]
-    #             elif isinstance(self.game.get_actor(new_x - cord[0], new_y + cord[1]), HumanPlayer):
-    #                 return [True, (new_x - cord[0], new_y + cord[1])]
-    #         return [False]
-    #
-    # def get_edges(self):
-    #          for x in range(self._width + 1):
-    #              y = math.sqrt(self._width*self._width - x * x)
-    #              self._edges.append((x,round(y)))
+    def check_collision(self, step_x: float,
+                        step_y: float) -> Optional[Impact]:
+        """
+        Return the first Impact of this ball with a paddle while it moves by
+        <step_x>, <step_y>, or None if it does not hit any paddle.
+        """
+        return self.game.sim.ball_impact(step_x, step_y)
 
     def reset_pos(self):
         """
@@ -341,13 +384,13 @@ class Ball(Actor):
         """
         self._x = self.game.d_w//2
         self._y = self.game.d_h//2
+        self.sync_world()
 
     def init_move(self) -> None:
         """
         Is the initial movement of the ball at the beginning of the round.
         """
-        self._dy = self.new_direction(-16, 16)[1]
-        self._dx = random.choice([-10, 10])
+        self.game.sim.serve()
 
     def new_direction(self, lower: int, upper: int) -> Tuple[int, int]:
         """
@@ -357,35 +400,27 @@ class Ball(Actor):
         upper: the upper bound for the change in the y direction
         return a tuple containing x, and y coordinates for the new direction
         """
-        y = random.randint(lower, upper)
-
-        x = 10
-        # if x in range(-1, 1):
-        #     x = 2
-        return x, y
+        return self.game.sim.new_direction(lower, upper)
 
 
 class Boundaries(Actor):
     """
     Class represents the upper and lower boundaries of the stage.
     """
-    _x: int
-    _y: int
-    _width: int
-    _height: int
     _color: Tuple[int]
-
-    def __init__(self, x: int, y: int, width: int, height: int, y_bound: list[int], game:'Game' ) ->None:
-        super().__init__(x, y, width, height, y_bound, game)
+    body: Box
+    __slots__ = ()
+    _x = _body_property('x')
+    _y = _body_property('y')
+    _width = _body_property('width')
+    _height = _body_property('height')
+
+    def __init__(self, x: int, y: int, width: int, height: int, y_bound: list[int], game:'Game',
+                 body: Optional[Box] = None) ->None:
+        super().__init__(x, y, width, height, y_bound, game,
+                         body if body is not None else Box(x, y, width, height))
         self._color = RED
 
-    def draw(self) -> None:
-        """
-        Draws the ball to the screen.
-        """
-        pygame.draw.rect(self.game.screen, self._color, (self._x, self._y,
-                                                    self._width, self._height))
-
     def move(self):
         return
 
@@ -402,6 +437,7 @@ class Message(Actor):
     _speed: int
     _text: str
     _is_drawn: bool
+    __slots__ = ('_text', '_is_drawn')
 
     def __init__(self, x, y, width, height, y_bound, game, text, is_shown):
         """
@@ -423,17 +459,33 @@ class Message(Actor):
         """
         self._is_drawn = cond
 
+    def set_text(self, text: str) -> None:
+        """
+        Show <text> instead of the current text.
+        """
+        if text != self._text:
+            self._text = text
+            self.dirty = True
+
     def draw(self):
         """
         Draw the text to the screen if the message is supposed to
         be drawn
         """
         if self._is_drawn:
-            font = pygame.font.Font(None, 70)
-            text = font.render(self._text, 1, self._color)
+            text = render_text(self._text, 70, self._color)
             text_pos = text.get_rect(centerx=self._x, centery=self._y)
             self.game.screen.blit(text, text_pos)
 
+    def get_rect(self) -> Optional[pygame.Rect]:
+        """
+        Return the area covered by the text, or None if it is not shown.
+        """
+        if not self._is_drawn:
+            return None
+        text = render_text(self._text, 70, self._color)
+        return text.get_rect(centerx=self._x, centery=self._y)
+
     def move(self):
         """
         This actor cannot be moved
@@ -453,6 +505,7 @@ class ScoreBoard(Actor):
     _color: Tuple[int]
     _score: int
     _player: Union[HumanPlayer, AIPlayer]
+    __slots__ = ('_score', '_player')
 
     def __init__(self, x: int, y: int, width: int, height: int, y_bound,
                  player: Union[HumanPlayer, AIPlayer], game:'Game') -> None:
@@ -465,11 +518,17 @@ class ScoreBoard(Actor):
         """
         Draws the score to the screen.
         """
-        font = pygame.font.Font(None, 70)
-        text = font.render(str(self._score), 1, self._color)
+        text = render_text(str(self._score), 70, self._color)
         text_pos = text.get_rect(centerx=self._x, centery=self._y)
         self.game.screen.blit(text, text_pos)
 
+    def get_rect(self) -> Optional[pygame.Rect]:
+        """
+        Return the area covered by the score.
+        """
+        text = render_text(str(self._score), 70, self._color)
+        return text.get_rect(centerx=self._x, centery=self._y)
+
     def move(self):
         return
 
@@ -478,4 +537,97 @@ class ScoreBoard(Actor):
         Updates the score value of this object with the corresponding score
         value in the game
         """
-        self._score = self._player.get_score()
+        score = self._player.get_score()
+        if score != self._score:
+            self._score = score
+            self.dirty = True
+
+
+class ProfilerHUD(Actor):
+    """
+    An overlay showing the frame rate, the p50 and p99 frame times and how
+    long each phase of a frame takes on average, from a FrameProfiler.
+
+    === Private Attributes ===
+    _profiler:
+        The profiler whose timings are shown
+    _lines:
+        The lines of text being shown
+    _is_drawn:
+        True if the overlay is shown
+    _updated_at:
+        When the lines were last worked out again
+    """
+    _profiler: FrameProfiler
+    _lines: List[str]
+    _is_drawn: bool
+    _updated_at: float
+    __slots__ = ('_profiler', '_lines', '_is_drawn', '_updated_at')
+
+    def __init__(self, x: int, y: int, game: 'Game',
+                 profiler: FrameProfiler) -> None:
+        super().__init__(x, y, 0, 0, None, game)
+        self._color = (81, 194, 231)
+        self._profiler = profiler
+        self._lines = []
+        self._is_drawn = False
+        self._updated_at = 0.0
+
+    def is_drawn(self) -> bool:
+        return self._is_drawn
+
+    def set_drawn(self, cond: bool) -> None:
+        """
+        Show the overlay if <cond> is True, and hide it otherwise.
+        """
+        self._is_drawn = cond
+        self._updated_at = 0.0
+        self.dirty = True
+
+    def update(self) -> None:
+        """
+        Work out the lines to show again, at most every HUD_REFRESH seconds
+        so the numbers can be read.
+        """
+        now = time.monotonic()
+        if not self._is_drawn or now - self._updated_at < HUD_REFRESH:
+            return
+        self._updated_at = now
+        summary = self._profiler.summary()
+        lines = ["FPS {:.0f}   frame p50 {:.1f} ms   p99 {:.1f} ms".format(
+            summary["fps"], summary["p50"], summary["p99"])]
+        lines.append("   ".join("{} {:.2f}".format(phase, summary[phase])
+                                for phase in PHASES) + " ms")
+        if lines != self._lines:
+            self._lines = lines
+            self.dirty = True
+
+    def _render_lines(self) -> List[pygame.Surface]:
+        return [render_text(line, 20, self._color) for line in self._lines]
+
+    def draw(self) -> None:
+        """
+        Draw the overlay on a dark box, if it is shown.
+        """
+        rect = self.get_rect()
+        if rect is None:
+            return
+        self.game.screen.fill(BLACK, rect)
+        y = self._y + 4
+        for text in self._render_lines():
+            self.game.screen.blit(text, (self._x + 4, y))
+            y += text.get_height()
+
+    def get_rect(self) -> Optional[pygame.Rect]:
+        """
+        Return the area covered by the overlay, or None if it is not shown.
+        """
+        if not self._is_drawn or not self._lines:
+            return None
+        texts = self._render_lines()
+        return pygame.Rect(self._x, self._y,
+                           max(text.get_width() for text in texts) + 8,
+                           sum(text.get_height() for text in texts) + 8)
+
+    def move(self):
+        return
@@ -0,0 +1,108 @@
+"""
+A computer player that moves its paddle to where the ball will cross it.
+
+The crossing point is found in closed form, by unfolding the ball's
+bounces off the top and bottom borders, and is only worked out again when
+the ball's velocity changes, so the AI costs almost nothing per tick.
+"""
+from __future__ import annotations
+from typing import Dict, Optional, Tuple
+from simulation import DOWN, STAY, UP, Paddle, Simulation
+
+
+def predict_intercept(x: float, y: float, dx: float, dy: float,
+                      target_x: float, lower: float,
+                      upper: float) -> Optional[float]:
+    """
+    Return the y coordinate at which a ball centred on <x>, <y> and moving
+    by <dx>, <dy> reaches <target_x>, bouncing between <lower> and <upper>.
+    Return None if the ball is moving away from <target_x>.
+    """
+    if dx == 0 or (target_x - x) * dx < 0:
+        return None
+    raw_y = y + dy * (target_x - x) / dx
+    span = upper - lower
+    if span <= 0:
+        return lower
+    # Reflecting between two walls is a triangle wave of period 2 * span.
+    offset = (raw_y - lower) % (2 * span)
+    if offset > span:
+        offset = 2 * span - offset
+    return lower + offset
+
+
+class InterceptPredictor:
+    """
+    Predicts where the ball will reach one paddle, remembering the answer
+    until the ball's velocity changes.
+
+    A bounce off a border only flips the sign of dy and does not change
+    where the ball ends up, so it does not invalidate the prediction.
+
+    === Private Attributes ===
+    _key:
+        The serve, dx and speed of dy the cached prediction was made for
+    _target:
+        The cached prediction
+    """
+    _key: Optional[Tuple[int, float, float]]
+    _target: Optional[float]
+
+    def __init__(self) -> None:
+        self._key = None
+        self._target = None
+
+    def predict(self, sim: Simulation, paddle: Paddle) -> Optional[float]:
+        """
+        Return the y coordinate at which the ball of <sim> will reach
+        <paddle>, or None if it is moving away from it.
+        """
+        ball = sim.ball
+        key = (sim.serves, ball.dx, abs(ball.dy))
+        if key != self._key:
+            self._key = key
+            if paddle.x < sim.width / 2:
+                target_x = paddle.x + paddle.width + ball.radius
+            else:
+                target_x = paddle.x - ball.radius
+            self._target = predict_intercept(
+                ball.x, ball.y, ball.dx, ball.dy, target_x,
+                sim.y_bound[0] + ball.radius, sim.y_bound[1] - ball.radius)
+        return self._target
+
+
+class AIController:
+    """
+    Chooses a direction for each paddle it controls: towards where the ball
+    will arrive when it is coming, and back to the middle when it is not.
+
+    Instances can be called like the controllers in tournament.py.
+
+    === Private Attributes ===
+    _predictors:
+        The predictor of each paddle this controller has moved
+    """
+    _predictors: Dict[int, InterceptPredictor]
+
+    def __init__(self) -> None:
+        self._predictors = {}
+
+    def __call__(self, sim: Simulation, index: int) -> int:
+        """
+        Return the direction to move paddle <index> of <sim> in.
+        """
+        predictor = self._predictors.get(index)
+        if predictor is None:
+            predictor = self._predictors[index] = InterceptPredictor()
+        paddle = sim.paddles[index]
+        target = None
+        if not sim.waiting:
+            target = predictor.predict(sim, paddle)
+        if target is None:
+            target = sim.height / 2
+        middle = paddle.y + paddle.height / 2
+        if target < middle - paddle.speed / 2:
+            return UP
+        if target > middle + paddle.speed / 2:
+            return DOWN
+        return STAY
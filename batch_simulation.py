@@ -0,0 +1,316 @@
+"""
+A vectorized version of the rules in simulation.py that steps many
+independent matches at once, for AI training and balance analysis.
+
+The state of every match is kept as a structure of NumPy arrays, and one
+call to step() advances all of them with a fixed set of array operations,
+so the cost per match-tick is a tiny fraction of stepping a Simulation.
+
+This module needs NumPy, which the game itself does not.
+"""
+from __future__ import annotations
+from typing import Optional
+import numpy as np
+from simulation import (BALL_RADIUS, BALL_SPEED, DOWN, MAX_BALL_DY,
+                        MAX_CONTACTS, PADDLE_HEIGHT, PADDLE_SPEED,
+                        PADDLE_WIDTH, SCORE_MARGIN, UP)
+
+
+@np.errstate(divide='ignore', invalid='ignore')
+def swept_circle_aabb(px: np.ndarray, py: np.ndarray, vx: np.ndarray,
+                      vy: np.ndarray, r: float, left: np.ndarray,
+                      top: np.ndarray, right: np.ndarray,
+                      bottom: np.ndarray) -> np.ndarray:
+    """
+    Return, for each circle, the fraction of the step at which it first
+    touches its rectangle, or infinity if it does not.
+
+    This is physics.swept_circle_aabb applied element-wise: every branch
+    of it is computed for every circle, and the one it would take is
+    picked.
+    """
+    no_hit = np.full(px.shape, np.inf)
+
+    # Already overlapping: only collide if still moving inwards.
+    near_x = np.clip(px, left, right)
+    near_y = np.clip(py, top, bottom)
+    overlap = (px - near_x) ** 2 + (py - near_y) ** 2 < r * r
+    inwards = vx * ((left + right) / 2 - px) + \
+        vy * ((top + bottom) / 2 - py) > 0
+
+    # Slab test against the rectangle grown by r on every side.
+    tx1 = (left - r - px) / vx
+    tx2 = (right + r - px) / vx
+    ty1 = (top - r - py) / vy
+    ty2 = (bottom + r - py) / vy
+    still_x = vx == 0
+    outside_x = still_x & ((px < left - r) | (px > right + r))
+    tx_min = np.where(still_x, -np.inf, np.minimum(tx1, tx2))
+    tx_max = np.where(still_x, np.inf, np.maximum(tx1, tx2))
+    still_y = vy == 0
+    outside_y = still_y & ((py < top - r) | (py > bottom + r))
+    ty_min = np.where(still_y, -np.inf, np.minimum(ty1, ty2))
+    ty_max = np.where(still_y, np.inf, np.maximum(ty1, ty2))
+    t_enter = np.maximum(tx_min, ty_min)
+    t_exit = np.minimum(tx_max, ty_max)
+    entered = ~outside_x & ~outside_y & (t_enter <= t_exit) & \
+        (t_enter <= 1) & (t_exit >= 0)
+
+    # Entering through a face ahead: resting on it and moving away from
+    # it does not count. The face is the one of the slab entered last, x
+    # on a tie.
+    ahead = t_enter >= 0
+    along_x = tx_min >= ty_min
+    away = ahead & (np.where(along_x, -np.abs(vx), -np.abs(vy)) >= 0)
+    start = np.where(ahead, t_enter, 0.0)
+    hit_x = px + vx * start
+    hit_y = py + vy * start
+    face = ahead & (((left <= hit_x) & (hit_x <= right)) |
+                    ((top <= hit_y) & (hit_y <= bottom)))
+
+    # Corner region, entered ahead or already inside the grown rectangle
+    # without touching the rectangle: test against the circle around the
+    # nearest corner.
+    corner_x = np.where(hit_x < left, left, right)
+    corner_y = np.where(hit_y < top, top, bottom)
+    fx, fy = px - corner_x, py - corner_y
+    a = vx * vx + vy * vy
+    b = fx * vx + fy * vy
+    c = fx * fx + fy * fy - r * r
+    disc = b * b - a * c
+    t_corner = (-b - np.sqrt(np.maximum(disc, 0))) / a
+    corner = (disc >= 0) & (a > 0) & (t_corner >= 0) & (t_corner <= 1)
+
+    hit = entered & ~away
+    t = np.where(hit & face, t_enter,
+                 np.where(hit & ~face & corner, t_corner, no_hit))
+    return np.where(overlap, np.where(inwards, 0.0, no_hit), t)
+
+
+class BatchSimulation:
+    """
+    Many independent matches stepped together.
+
+    Index i of every array is match i. Paddle arrays have a second axis for
+    the left (0) and right (1) player.
+
+    === Public Attributes ===
+    size:
+        The number of matches
+    width, height:
+        The size of the stage, the same for every match
+    y_bound:
+        The vertical [upper, lower] bounds of the moving actors
+    goal_score:
+        The score that wins a match
+    infinite_mode:
+        True if the matches never end
+    auto_serve:
+        True to serve the ball as soon as a match is waiting for a serve
+    auto_reset:
+        True to start a match again as soon as somebody wins it
+    ball_x, ball_y, ball_dx, ball_dy:
+        The position and velocity of each match's ball
+    paddle_y:
+        The y coordinate of the top of each paddle
+    scores:
+        The score of each player in the current match
+    wins:
+        The number of matches each player has won since the batch started
+    ticks:
+        The number of ticks each match has been played for in total
+    waiting:
+        True for matches waiting for a serve
+    finished:
+        True for matches that have been won and not started again
+    rng:
+        The source of the random ball directions
+    """
+    size: int
+    width: int
+    height: int
+    goal_score: int
+    infinite_mode: bool
+    auto_serve: bool
+    auto_reset: bool
+    ball_x: np.ndarray
+    ball_y: np.ndarray
+    ball_dx: np.ndarray
+    ball_dy: np.ndarray
+    paddle_y: np.ndarray
+    scores: np.ndarray
+    wins: np.ndarray
+    ticks: np.ndarray
+    waiting: np.ndarray
+    finished: np.ndarray
+    rng: np.random.Generator
+
+    def __init__(self, size: int, width: int, height: int,
+                 goal_score: int = 10, infinite_mode: bool = False,
+                 seed: Optional[int] = None, auto_serve: bool = True,
+                 auto_reset: bool = True) -> None:
+        """
+        Initialize <size> matches on a <width>x<height> stage.
+        """
+        self.size = size
+        self.width, self.height = width, height
+        self.goal_score = goal_score
+        self.infinite_mode = infinite_mode
+        self.auto_serve = auto_serve
+        self.auto_reset = auto_reset
+        self.rng = np.random.default_rng(seed)
+
+        h_bars = round(height * 0.05)
+        self.y_bound = [h_bars, height - h_bars]
+        self.x_bound = [0, width]
+        self._paddle_x = np.array([10.0, width - 25.0])
+
+        self.ball_x = np.empty(size)
+        self.ball_y = np.empty(size)
+        self.ball_dx = np.zeros(size)
+        self.ball_dy = np.zeros(size)
+        self.paddle_y = np.empty((size, 2))
+        self.scores = np.zeros((size, 2), dtype=np.int64)
+        self.wins = np.zeros((size, 2), dtype=np.int64)
+        self.ticks = np.zeros(size, dtype=np.int64)
+        self.waiting = np.ones(size, dtype=bool)
+        self.finished = np.zeros(size, dtype=bool)
+        self.reset_round(np.ones(size, dtype=bool))
+
+    def reset_round(self, mask: np.ndarray) -> None:
+        """
+        Put the paddles and ball of the matches in <mask> back in their
+        starting positions and wait for the next serve.
+        """
+        self.ball_x[mask] = self.width // 2
+        self.ball_y[mask] = self.height // 2
+        self.ball_dx[mask] = 0
+        self.ball_dy[mask] = 0
+        self.paddle_y[mask] = (self.height // 2) - 40
+        self.waiting[mask] = True
+
+    def reset_match(self, mask: np.ndarray) -> None:
+        """
+        Start the matches in <mask> again from 0-0.
+        """
+        self.scores[mask] = 0
+        self.finished[mask] = False
+        self.reset_round(mask)
+
+    def serve(self, mask: np.ndarray) -> None:
+        """
+        Start the ball of the matches in <mask> in a random direction.
+        """
+        count = int(np.count_nonzero(mask))
+        self.ball_dy[mask] = self.rng.integers(-MAX_BALL_DY, MAX_BALL_DY,
+                                               count, endpoint=True)
+        self.ball_dx[mask] = self.rng.choice([-BALL_SPEED, BALL_SPEED],
+                                             count)
+        self.waiting[mask] = False
+
+    def _move_paddles(self, inputs: np.ndarray, dt: float,
+                      playing: np.ndarray) -> None:
+        """
+        Move each paddle of the <playing> matches in its direction in
+        <inputs>, stopping it at the edge of the stage.
+        """
+        live = playing[:, None]
+        step = np.where(live & (inputs == UP), -PADDLE_SPEED * dt,
+                        np.where(live & (inputs == DOWN), PADDLE_SPEED * dt,
+                                 0.0))
+        np.clip(self.paddle_y + step, self.y_bound[0],
+                self.y_bound[1] - PADDLE_HEIGHT, out=self.paddle_y)
+
+    def _move_balls(self, dt: float, playing: np.ndarray) -> None:
+        """
+        Move the ball of every <playing> match for <dt>, resolving each
+        impact with a border or a paddle continuously.
+        """
+        r = BALL_RADIUS
+        x, y, dx, dy = self.ball_x, self.ball_y, self.ball_dx, self.ball_dy
+        top = self.y_bound[0] + r
+        bottom = self.y_bound[1] - r
+        remaining = np.where(playing, dt, 0.0)
+        active = playing.copy()
+        for _ in range(MAX_CONTACTS):
+            if not active.any():
+                break
+            step_x = dx * remaining
+            step_y = dy * remaining
+
+            # Check collision with the top and bottom borders
+            with np.errstate(divide='ignore', invalid='ignore'):
+                wall_t = np.where(step_y < 0, (top - y) / step_y,
+                                  np.where(step_y > 0,
+                                           (bottom - y) / step_y, np.inf))
+            wall_t = np.where((wall_t >= 0) & (wall_t <= 1), wall_t,
+                              np.inf)
+
+            # Check collision with paddles
+            paddle_t = np.full(self.size, np.inf)
+            for side in (0, 1):
+                left = self._paddle_x[side]
+                t = swept_circle_aabb(x, y, step_x, step_y, r, left,
+                                      self.paddle_y[:, side],
+                                      left + PADDLE_WIDTH,
+                                      self.paddle_y[:, side] + PADDLE_HEIGHT)
+                paddle_t = np.minimum(paddle_t, t)
+
+            wall = active & (wall_t < paddle_t)
+            paddle = active & ~wall & np.isfinite(paddle_t)
+            free = active & ~wall & ~paddle
+            t = np.where(wall, wall_t, np.where(paddle, paddle_t, 1.0))
+            t = np.where(active, t, 0.0)
+
+            x += step_x * t
+            y += step_y * t
+            remaining *= 1 - t
+
+            dy[wall] = -dy[wall]
+            if paddle.any():
+                dx[paddle] = -dx[paddle]
+                going = dy[paddle]
+                lower = np.where(going < 0, 0, -MAX_BALL_DY)
+                upper = np.where(going > 0, 0, MAX_BALL_DY)
+                dy[paddle] = self.rng.integers(lower, upper, endpoint=True)
+            active &= ~free
+
+    def step(self, inputs: np.ndarray, dt: float) -> np.ndarray:
+        """
+        Advance every match by <dt>, moving its paddles in the directions in
+        <inputs> (an array of shape (size, 2) of UP, STAY and DOWN).
+
+        Return an array holding, for each match, the index of the player who
+        scored during this tick, or -1 if nobody did.
+        """
+        if self.auto_serve and self.waiting.any():
+            self.serve(self.waiting & ~self.finished)
+        playing = ~self.waiting & ~self.finished
+        self.ticks += playing
+
+        self._move_paddles(np.asarray(inputs), dt, playing)
+        self._move_balls(dt, playing)
+
+        # Check Collision with the left and right screen edges
+        scorer = np.full(self.size, -1, dtype=np.int64)
+        scorer[playing & (self.ball_x - BALL_RADIUS <=
+                          self.x_bound[0] - SCORE_MARGIN)] = 1
+        scorer[playing & (self.ball_x + BALL_RADIUS >=
+                          self.x_bound[1] + SCORE_MARGIN)] = 0
+        scored = scorer >= 0
+        if scored.any():
+            rows = np.nonzero(scored)[0]
+            self.scores[rows, scorer[rows]] += 1
+            self.reset_round(scored)
+
+            if not self.infinite_mode:
+                won = scored & (self.scores[np.arange(self.size),
+                                            np.maximum(scorer, 0)]
+                                >= self.goal_score)
+                if won.any():
+                    rows = np.nonzero(won)[0]
+                    self.wins[rows, scorer[rows]] += 1
+                    self.finished |= won
+                    if self.auto_reset:
+                        self.reset_match(won)
+        return scorer
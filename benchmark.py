@@ -0,0 +1,354 @@
+"""
+Time the hot paths of the game (physics, collision queries and drawing)
+over seeded scenarios, without a window.
+
+Run it through main.py, for example:
+
+    python main.py bench --json before.json
+    python main.py bench --json after.json --compare before.json
+
+Every benchmark reports operations per second and percentiles of the time
+one operation takes. The JSON results of two runs, for example on two
+commits, can be compared with --compare.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import pickle
+import platform
+import random
+import subprocess
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+SCREEN_SIZE = (960, 500)
+
+
+def _percentile(samples: List[float], fraction: float) -> float:
+    """
+    Return the value below which <fraction> of the sorted <samples> fall.
+    """
+    index = min(len(samples) - 1, max(0, round(fraction * len(samples)) - 1))
+    return samples[index]
+
+
+def measure(operation: Callable[[], None], samples: int,
+            number: int = 1) -> Dict:
+    """
+    Call <operation> <number> times in a row, <samples> times over, and
+    return the operations per second and the percentiles of the time of
+    one operation, in microseconds.
+    """
+    timings = []
+    clock = time.perf_counter_ns
+    for _ in range(samples):
+        start = clock()
+        for _ in range(number):
+            operation()
+        timings.append((clock() - start) / number / 1000)
+    timings.sort()
+    total = sum(timings)
+    return {
+        "ops_per_second": len(timings) / total * 1e6 if total else 0.0,
+        "mean_us": total / len(timings),
+        "min_us": timings[0],
+        "p50_us": _percentile(timings, 0.5),
+        "p90_us": _percentile(timings, 0.9),
+        "p99_us": _percentile(timings, 0.99),
+        "max_us": timings[-1],
+        "samples": samples,
+        "number": number,
+    }
+
+
+class _FixedScheduler:
+    """
+    Stands in for the game's FrameScheduler so that every frame is exactly
+    one tick long and nothing sleeps.
+    """
+
+    def __init__(self, frame_ms: float) -> None:
+        self._frame_ms = frame_ms
+
+    def tick(self, fps_cap: Optional[int] = None) -> float:
+        return self._frame_ms
+
+    def wait(self) -> list:
+        return []
+
+
+def _make_game(seed: int, directory: str):
+    """
+    Return a game in the middle of a rally, on a seeded simulation, that
+    records its scores in a leaderboard inside <directory>.
+    """
+    from game import Game
+    from leaderboard import Leaderboard
+
+    leaderboard = Leaderboard(os.path.join(directory, "bench.db"))
+    game = Game(SCREEN_SIZE, 10, leaderboard)
+    game.record_replays = False
+    # Never won, so that the benchmarks keep measuring a ball in play
+    game.infinite_mode = True
+    game.sim.rng = random.Random(seed)
+    game.on_init()
+    game.scheduler = _FixedScheduler(1000 / game.tick_rate)
+    game.serve()
+    game.draw_full()
+    return game
+
+
+def _serve_if_waiting(game) -> None:
+    """
+    Serve the ball of <game> again if somebody scored, so the benchmarks
+    keep measuring a ball in play.
+    """
+    if game.sim.waiting:
+        game.new_round()
+        game.serve()
+
+
+def _snapshot_benchmarks(game, samples: Callable[[int], int]) -> Dict:
+    """
+    Time encoding and decoding the states of a rally of <game> with the
+    snapshot codec, delta-encoded against the state two ticks earlier as a
+    client acknowledging over a short round trip would, and with pickle,
+    pickling the attributes of the game the states hold. The results also
+    give the mean number of bytes per snapshot.
+    """
+    from simulation import DOWN, UP
+    from snapshot import DeltaEncoder, decode, encode
+
+    states = []
+    attributes = []
+    dt = game.get_tick_dt()
+    sim = game.sim
+    for tick in range(600):
+        _serve_if_waiting(game)
+        # Paddles sweeping up and down, so that they change too
+        direction = UP if tick // 40 % 2 else DOWN
+        game.step([direction, -direction], dt)
+        states.append(game.capture_state())
+        attributes.append({
+            "ball": (sim.ball.x, sim.ball.y, sim.ball.dx, sim.ball.dy),
+            "paddles": [(p.y, p.score) for p in sim.paddles],
+            "lifecycle": game.lifecycle.state,
+            "waiting": sim.waiting})
+    deltas = [encode(tick, state, tick - 2, states[tick - 2])
+              for tick, state in enumerate(states) if tick >= 2]
+    wholes = [encode(tick, state) for tick, state in enumerate(states)]
+    pickles = [pickle.dumps(a, pickle.HIGHEST_PROTOCOL) for a in attributes]
+    bases = dict(enumerate(states))
+    index = [0]
+
+    def next_index(count: int) -> int:
+        index[0] += 1
+        return index[0] % count
+
+    results = {}
+    encoder = DeltaEncoder()
+
+    def encode_delta() -> None:
+        tick = next_index(len(states))
+        encoder.ack(tick - 2)
+        encoder.encode(tick, states[tick])
+    results["snapshot_encode_delta"] = measure(encode_delta, samples(2000),
+                                               20)
+    results["snapshot_encode_delta"]["bytes"] = \
+        sum(map(len, deltas)) / len(deltas)
+
+    def decode_delta() -> None:
+        decode(deltas[next_index(len(deltas))], bases)
+    results["snapshot_decode_delta"] = measure(decode_delta, samples(2000),
+                                               20)
+
+    def encode_whole() -> None:
+        tick = next_index(len(states))
+        encode(tick, states[tick])
+    results["snapshot_encode_whole"] = measure(encode_whole, samples(2000),
+                                               20)
+    results["snapshot_encode_whole"]["bytes"] = \
+        sum(map(len, wholes)) / len(wholes)
+
+    def encode_pickle() -> None:
+        pickle.dumps(attributes[next_index(len(attributes))],
+                     pickle.HIGHEST_PROTOCOL)
+    results["snapshot_encode_pickle"] = measure(encode_pickle,
+                                                samples(2000), 20)
+    results["snapshot_encode_pickle"]["bytes"] = \
+        sum(map(len, pickles)) / len(pickles)
+
+    def decode_pickle() -> None:
+        pickle.loads(pickles[next_index(len(pickles))])
+    results["snapshot_decode_pickle"] = measure(decode_pickle,
+                                                samples(2000), 20)
+    return results
+
+
+def run_benchmarks(seed: int = 0, scale: float = 1.0) -> Dict:
+    """
+    Run every benchmark on scenarios seeded with <seed>, taking <scale>
+    times the default number of samples, and return the results by name.
+    """
+    import pygame
+    from controls import SERVE, ScriptedSource
+    from high_score import HighScore
+    from leaderboard import INFINITE_MODE
+    from menu import MainMenu
+
+    def samples(count: int) -> int:
+        return max(10, int(count * scale))
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        game = _make_game(seed, directory)
+        rng = random.Random(seed)
+        dt = game.get_tick_dt()
+
+        def ball_move() -> None:
+            _serve_if_waiting(game)
+            game.ball.move(dt)
+        results["ball_move"] = measure(ball_move, samples(2000), 20)
+
+        # Steps from random places on the stage, many of them near a paddle
+        sim = game.sim
+        steps = []
+        for _ in range(1000):
+            paddle = rng.choice(sim.paddles)
+            x = rng.choice((rng.uniform(0, sim.width),
+                            paddle.x + rng.uniform(-60, 60)))
+            steps.append((x, rng.uniform(*sim.y_bound),
+                          rng.uniform(-30, 30), rng.uniform(-30, 30)))
+        index = [0]
+
+        def check_collision() -> None:
+            x, y, step_x, step_y = steps[index[0] % len(steps)]
+            index[0] += 1
+            sim.ball.x, sim.ball.y = x, y
+            game.ball.check_collision(step_x, step_y)
+        results["ball_check_collision"] = measure(check_collision,
+                                                  samples(2000), 20)
+        sim.reset_round()
+
+        points = [(rng.uniform(0, sim.width), rng.uniform(0, sim.height))
+                  for _ in range(1000)]
+
+        def get_actor() -> None:
+            x, y = points[index[0] % len(points)]
+            index[0] += 1
+            game.get_actor(x, y)
+        results["game_get_actor"] = measure(get_actor, samples(2000), 20)
+
+        # Frames are driven like a match at the keyboard, with scripted
+        # players who serve whenever the ball waits and events not pumped
+        game.sources = [ScriptedSource([SERVE], loop=True),
+                        ScriptedSource([SERVE], loop=True)]
+        game.read_events = False
+
+        def frame() -> None:
+            game.run_frame()
+        game.dirty_rendering = True
+        results["game_frame_dirty"] = measure(frame, samples(1000))
+        game.dirty_rendering = False
+        results["game_frame_full"] = measure(frame, samples(300))
+
+        results.update(_snapshot_benchmarks(game, samples))
+
+        menu = MainMenu(game, SCREEN_SIZE)
+        results["menu_draw"] = measure(menu.draw_menu, samples(300))
+
+        for i in range(200):
+            game.leaderboard.record("Player " + str(i % 2 + 1),
+                                    rng.randint(1, 100), INFINITE_MODE)
+        surface = pygame.Surface(SCREEN_SIZE)
+        high_score = HighScore(SCREEN_SIZE[0] // 2, SCREEN_SIZE[1] // 4, 70,
+                               (250, 250, 250), surface, game.leaderboard)
+        results["high_score_draw"] = measure(high_score.draw, samples(1000))
+        game.leaderboard.close()
+    return results
+
+
+def _environment() -> Dict:
+    """
+    Return a description of where the benchmarks were run.
+    """
+    import pygame
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                                capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)),
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "pygame": pygame.version.ver,
+        "platform": platform.platform(),
+        "video_driver": os.environ.get("SDL_VIDEODRIVER"),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def print_results(results: Dict, baseline: Optional[Dict] = None) -> None:
+    """
+    Print a table of <results>, next to the results of <baseline> if it
+    is given.
+    """
+    header = "{:<22}{:>12}{:>10}{:>10}{:>10}".format(
+        "benchmark", "ops/s", "p50 us", "p90 us", "p99 us")
+    if baseline is not None:
+        header += "{:>12}{:>9}".format("base ops/s", "change")
+    print(header)
+    for name, result in results.items():
+        line = "{:<22}{:>12.0f}{:>10.1f}{:>10.1f}{:>10.1f}".format(
+            name, result["ops_per_second"], result["p50_us"],
+            result["p90_us"], result["p99_us"])
+        old = baseline.get(name) if baseline is not None else None
+        if old is not None:
+            change = result["ops_per_second"] / old["ops_per_second"] - 1
+            line += "{:>12.0f}{:>+9.1%}".format(old["ops_per_second"], change)
+        print(line)
+    sizes = [(name, result["bytes"]) for name, result in results.items()
+             if "bytes" in result]
+    if sizes:
+        print()
+        print("{:<22}{:>12}".format("snapshot", "bytes"))
+        for name, size in sizes:
+            print("{:<22}{:>12.1f}".format(name, size))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Run the benchmarks from the command line and print their results.
+    """
+    parser = argparse.ArgumentParser(
+        prog="main.py bench",
+        description="Time the game's hot paths without a window.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="multiply the number of samples by this")
+    parser.add_argument("--json", metavar="FILE",
+                        help="also write the results to FILE as JSON")
+    parser.add_argument("--compare", metavar="FILE",
+                        help="compare with the JSON results in FILE")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    import pygame
+    pygame.init()
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)["results"]
+
+    report = {"environment": _environment(), "seed": args.seed,
+              "results": run_benchmarks(args.seed, args.scale)}
+    print_results(report["results"], baseline)
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(report, file, indent=2)
+    pygame.quit()
@@ -1,6 +1,7 @@
 from __future__ import annotations
 from typing import Callable
 import pygame
+from text_cache import render_text
 
 black = (0, 0, 0)
 red = (255, 0, 0)
@@ -43,8 +44,7 @@ class Button:
         """
 
         # Setting up label text
-        font = pygame.font.Font(None, 24)
-        button_label = font.render(self._label, True, white)
+        button_label = render_text(self._label, 24, white)
         label_size = button_label.get_size()
         offset_x = (self._width - label_size[0])//2
         offset_y = (self._height - label_size[1])//2
@@ -0,0 +1,323 @@
+"""
+A uniform grid broadphase holding only the actors that take part in
+collisions (paddles, borders and balls).
+"""
+from __future__ import annotations
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+# Bounds are given as (left, top, right, bottom)
+Bounds = Tuple[float, float, float, float]
+
+
+class CollisionWorld:
+    """
+    A uniform grid of square cells. Every body is stored in each cell its
+    bounds overlap, so point and box queries only look at the few bodies
+    near the queried area instead of every body in the world.
+
+    A body is any object with a get_bounds() method returning its
+    (left, top, right, bottom) bounds. The bounds are read when a body is
+    inserted or updated and kept in one array per side, so queries compare
+    numbers in bulk instead of calling get_bounds() on every candidate.
+    A body that moves must therefore be updated before it is queried.
+
+    === Private Attributes ===
+    _cell_size:
+        The width and height of one cell, in pixels
+    _cells:
+        The slots of the bodies stored in each non-empty cell, keyed by
+        cell coordinates
+    _slots:
+        The slot of each body in the arrays below
+    _bodies:
+        The body in each slot, or None if the slot is free
+    _free:
+        The slots left free by removed bodies, to be used again
+    _left, _top, _right, _bottom:
+        The bounds of the body in each slot
+    _order:
+        The insertion order of the body in each slot, so queries answer in
+        the same order every time
+    _ranges:
+        The (first column, first row, last column, last row) of cells the
+        body in each slot currently occupies
+    """
+    _cell_size: int
+    _cells: Dict[Tuple[int, int], List[int]]
+    _slots: Dict[Any, int]
+    _bodies: List[Any]
+    _free: List[int]
+    _left: array
+    _top: array
+    _right: array
+    _bottom: array
+    _order: array
+    _ranges: List[Optional[Tuple[int, int, int, int]]]
+
+    def __init__(self, cell_size: int = 64) -> None:
+        """
+        Initialize an empty world with cells of <cell_size> pixels.
+        """
+        self._cell_size = cell_size
+        self._cells = {}
+        self._slots = {}
+        self._bodies = []
+        self._free = []
+        self._left = array('d')
+        self._top = array('d')
+        self._right = array('d')
+        self._bottom = array('d')
+        self._order = array('q')
+        self._ranges = []
+        self._next_order = 0
+
+    def __contains__(self, body: Any) -> bool:
+        return body in self._slots
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def _cell_range(self, bounds: Bounds) -> Tuple[int, int, int, int]:
+        """
+        Return the range of cells covered by <bounds>.
+        """
+        size = self._cell_size
+        left, top, right, bottom = bounds
+        return (int(left // size), int(top // size),
+                int(right // size), int(bottom // size))
+
+    def _link(self, slot: int, cells: Tuple[int, int, int, int]) -> None:
+        """
+        Add the body in <slot> to every cell in the range <cells>.
+        """
+        col0, row0, col1, row1 = cells
+        for col in range(col0, col1 + 1):
+            for row in range(row0, row1 + 1):
+                self._cells.setdefault((col, row), []).append(slot)
+        self._ranges[slot] = cells
+
+    def _unlink(self, slot: int) -> None:
+        """
+        Remove the body in <slot> from every cell it occupies.
+        """
+        col0, row0, col1, row1 = self._ranges[slot]
+        self._ranges[slot] = None
+        for col in range(col0, col1 + 1):
+            for row in range(row0, row1 + 1):
+                cell = self._cells[(col, row)]
+                cell.remove(slot)
+                if not cell:
+                    del self._cells[(col, row)]
+
+    def _store(self, slot: int, bounds: Bounds) -> None:
+        """
+        Keep <bounds> as the bounds of the body in <slot>.
+        """
+        (self._left[slot], self._top[slot], self._right[slot],
+         self._bottom[slot]) = bounds
+
+    def insert(self, body: Any) -> None:
+        """
+        Add <body> to this world. Inserting a body twice only updates it.
+        """
+        if body in self._slots:
+            self.update(body)
+            return
+        if self._free:
+            slot = self._free.pop()
+            self._bodies[slot] = body
+            self._order[slot] = self._next_order
+        else:
+            slot = len(self._bodies)
+            self._bodies.append(body)
+            self._ranges.append(None)
+            for column in (self._left, self._top, self._right, self._bottom):
+                column.append(0.0)
+            self._order.append(self._next_order)
+        self._next_order += 1
+        self._slots[body] = slot
+        bounds = body.get_bounds()
+        self._store(slot, bounds)
+        self._link(slot, self._cell_range(bounds))
+
+    def remove(self, body: Any) -> None:
+        """
+        Remove <body> from this world, if it is in it.
+        """
+        slot = self._slots.pop(body, None)
+        if slot is not None:
+            self._unlink(slot)
+            self._bodies[slot] = None
+            self._free.append(slot)
+
+    def update(self, body: Any) -> None:
+        """
+        Keep the current bounds of <body>, and move it to the cells matching
+        them if it no longer covers the same cells.
+        """
+        slot = self._slots[body]
+        bounds = body.get_bounds()
+        self._store(slot, bounds)
+        cells = self._cell_range(bounds)
+        if self._ranges[slot] != cells:
+            self._unlink(slot)
+            self._link(slot, cells)
+
+    def clear(self) -> None:
+        """
+        Remove every body from this world.
+        """
+        self._cells.clear()
+        self._slots.clear()
+        self._bodies.clear()
+        self._free.clear()
+        for column in (self._left, self._top, self._right, self._bottom,
+                       self._order):
+            del column[:]
+        self._ranges.clear()
+        self._next_order = 0
+
+    def get_bounds(self, body: Any) -> Bounds:
+        """
+        Return the bounds of <body> as of when it was last inserted or
+        updated.
+        """
+        slot = self._slots[body]
+        return (self._left[slot], self._top[slot], self._right[slot],
+                self._bottom[slot])
+
+    def query_point(self, x: float, y: float) -> List[Any]:
+        """
+        Return the bodies whose bounds strictly contain the point <x>, <y>,
+        in insertion order.
+        """
+        size = self._cell_size
+        cell = self._cells.get((int(x // size), int(y // size)))
+        if not cell:
+            return []
+        left, right = self._left, self._right
+        top, bottom = self._top, self._bottom
+        found = []
+        for slot in cell:
+            if left[slot] < x < right[slot] and top[slot] < y < bottom[slot]:
+                found.append(slot)
+        if len(found) == 1:
+            return [self._bodies[found[0]]]
+        return self._bodies_of(found)
+
+    def query_box(self, left: float, top: float, right: float,
+                  bottom: float) -> List[Any]:
+        """
+        Return the bodies whose bounds overlap the box <left>, <top>,
+        <right>, <bottom>, in insertion order.
+        """
+        col0, row0, col1, row1 = self._cell_range((left, top, right, bottom))
+        b_left, b_top, b_right, b_bottom = (self._left, self._top,
+                                            self._right, self._bottom)
+        if col0 == col1 and row0 == row1:
+            # The usual case: the box is within a single cell
+            found = [slot for slot in self._cells.get((col0, row0), ())
+                     if b_left[slot] <= right and left <= b_right[slot]
+                     and b_top[slot] <= bottom and top <= b_bottom[slot]]
+            return self._bodies_of(found)
+        seen = set()
+        found = []
+        for col in range(col0, col1 + 1):
+            for row in range(row0, row1 + 1):
+                for slot in self._cells.get((col, row), ()):
+                    if slot in seen:
+                        continue
+                    seen.add(slot)
+                    if b_left[slot] <= right and left <= b_right[slot] and \
+                            b_top[slot] <= bottom and top <= b_bottom[slot]:
+                        found.append(slot)
+        return self._bodies_of(found)
+
+    def _bodies_of(self, slots: List[int]) -> List[Any]:
+        """
+        Return the bodies in <slots>, in insertion order.
+        """
+        if len(slots) > 1:
+            slots.sort(key=self._order.__getitem__)
+        bodies = self._bodies
+        return [bodies[slot] for slot in slots]
+
+
+class SweepAndPrune:
+    """
+    A broadphase for many bodies that all move every tick, such as the
+    balls of a multi-ball match.
+
+    The bodies are kept sorted by the left side of their bounds. Bodies
+    only move a little between two ticks, so the order barely changes and
+    an insertion sort puts it right again in close to linear time. Two
+    bodies can then only overlap if the left side of one lies between the
+    left and right sides of the other, so a single sweep along x finds
+    every overlapping pair without comparing bodies that are far apart.
+
+    === Private Attributes ===
+    _bodies:
+        The bodies, sorted by the left side of their bounds as of the last
+        update
+    _bounds:
+        The bounds of each body in _bodies, as of the last update
+    """
+    _bodies: List[Any]
+    _bounds: List[Bounds]
+
+    def __init__(self, bodies: Optional[List[Any]] = None) -> None:
+        self._bodies = list(bodies) if bodies is not None else []
+        self._bounds = []
+
+    def __len__(self) -> int:
+        return len(self._bodies)
+
+    def insert(self, body: Any) -> None:
+        """
+        Add <body>. It is put in order on the next update.
+        """
+        self._bodies.append(body)
+
+    def remove(self, body: Any) -> None:
+        """
+        Remove <body>, if it was added.
+        """
+        if body in self._bodies:
+            index = self._bodies.index(body)
+            del self._bodies[index]
+            if index < len(self._bounds):
+                del self._bounds[index]
+
+    def update(self) -> List[Tuple[Any, Any]]:
+        """
+        Read the current bounds of every body, sort the bodies again, and
+        return every pair of bodies whose bounds overlap.
+        """
+        bodies = self._bodies
+        bounds = [body.get_bounds() for body in bodies]
+        # Insertion sort: cheap when the bodies are nearly in order already
+        for i in range(1, len(bodies)):
+            body, box = bodies[i], bounds[i]
+            left = box[0]
+            j = i - 1
+            if bounds[j][0] <= left:
+                continue
+            while j >= 0 and bounds[j][0] > left:
+                bodies[j + 1] = bodies[j]
+                bounds[j + 1] = bounds[j]
+                j -= 1
+            bodies[j + 1], bounds[j + 1] = body, box
+        self._bounds = bounds
+
+        pairs = []
+        count = len(bodies)
+        for i in range(count):
+            _, top, right, bottom = bounds[i]
+            j = i + 1
+            while j < count and bounds[j][0] <= right:
+                other = bounds[j]
+                if other[1] <= bottom and top <= other[3]:
+                    pairs.append((bodies[i], bodies[j]))
+                j += 1
+        return pairs
@@ -0,0 +1,295 @@
+"""
+Turns whatever plays a paddle into the actions of each tick: the keyboard,
+a gamepad, a script, a recorded replay or the computer.
+
+The actions of one player on one tick are the bits of a byte, and the
+actions of both players are packed into one int, the action frame of the
+tick. The game only ever reads action frames, so a match played headless
+from a script goes through the same code as one played at the keyboard.
+"""
+from __future__ import annotations
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence
+import pygame
+from ai import AIController
+from replay import Replay, decode_inputs
+from simulation import DOWN, STAY, UP
+
+if TYPE_CHECKING:
+    from game import Game
+
+# The actions a player can take on a tick, as bits of an action byte
+MOVE_UP = 1
+MOVE_DOWN = 2
+SERVE = 4
+PAUSE = 8
+RESUME = 16
+PLAY_AGAIN = 32
+
+# The keys of each player on a shared keyboard. The first player's keys
+# also serve, pause, resume and start the next game.
+PLAYER1_KEYS = {pygame.K_w: MOVE_UP, pygame.K_s: MOVE_DOWN,
+                pygame.K_SPACE: SERVE, pygame.K_p: PAUSE,
+                pygame.K_r: RESUME, pygame.K_h: PLAY_AGAIN}
+PLAYER2_KEYS = {pygame.K_UP: MOVE_UP, pygame.K_DOWN: MOVE_DOWN}
+# The keys of a player alone at the keyboard, as in an online match
+SOLO_KEYS = {pygame.K_w: MOVE_UP, pygame.K_UP: MOVE_UP,
+             pygame.K_s: MOVE_DOWN, pygame.K_DOWN: MOVE_DOWN,
+             pygame.K_SPACE: SERVE}
+
+# The actions of the buttons of a gamepad, by button number: A and Start
+# on the usual layout
+GAMEPAD_BUTTONS = {0: SERVE | RESUME | PLAY_AGAIN, 7: PAUSE}
+# How far a stick must be pushed to move the paddle, from 0 to 1
+DEADZONE = 0.5
+
+# The events telling that part of the window was uncovered or restored,
+# and must be drawn again
+EXPOSE_EVENTS = [pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED]
+# The only events the game and the menu read. Nothing else is queued, so
+# mouse motion, key releases and stick motion do not wake an idle screen.
+EVENTS = [pygame.QUIT, pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN,
+          pygame.MOUSEBUTTONUP, pygame.VIDEORESIZE] + EXPOSE_EVENTS
+GAMEPAD_EVENTS = [pygame.JOYBUTTONDOWN, pygame.JOYHATMOTION]
+
+
+def direction(actions: int) -> int:
+    """
+    Return the paddle direction of the action byte <actions>.
+    """
+    return (UP if actions & MOVE_UP else STAY) + \
+        (DOWN if actions & MOVE_DOWN else STAY)
+
+
+def moves(move: int) -> int:
+    """
+    Return the action byte that moves a paddle in the direction <move>.
+    """
+    if move == UP:
+        return MOVE_UP
+    if move == DOWN:
+        return MOVE_DOWN
+    return 0
+
+
+def pack_frame(actions: Sequence[int]) -> int:
+    """
+    Return the action frame of the action bytes of both players.
+    """
+    return actions[0] | actions[1] << 8
+
+
+def unpack_frame(frame: int) -> List[int]:
+    """
+    Return the action bytes of both players in the action frame <frame>.
+    """
+    return [frame & 0xff, frame >> 8]
+
+
+def allow_events(gamepads: bool = False) -> None:
+    """
+    Only let the events the game reads into pygame's event queue, and the
+    gamepad events too if <gamepads>.
+    """
+    pygame.event.set_blocked(None)
+    pygame.event.set_allowed(EVENTS + (GAMEPAD_EVENTS if gamepads else []))
+
+
+class InputSource:
+    """
+    Something that plays a paddle, telling the game the actions of its
+    player on each tick.
+    """
+
+    def actions(self, game: Game, index: int) -> int:
+        """
+        Return the action byte of player <index> of <game> on this tick.
+        """
+        raise NotImplementedError
+
+
+class KeyboardSource(InputSource):
+    """
+    A player at the keyboard.
+
+    === Private Attributes ===
+    _keys:
+        The key and the actions it stands for, of every key the player uses
+    """
+    _keys: List[tuple]
+
+    def __init__(self, keys: Dict[int, int]) -> None:
+        """
+        Initialize a player who takes the actions in <keys> by holding
+        down their keys.
+        """
+        self._keys = list(keys.items())
+
+    def actions(self, game: Game, index: int) -> int:
+        pressed = pygame.key.get_pressed()
+        actions = 0
+        for key, action in self._keys:
+            if pressed[key]:
+                actions |= action
+        return actions
+
+
+class GamepadSource(InputSource):
+    """
+    A player with a gamepad, moving with the left stick or the D-pad.
+
+    === Private Attributes ===
+    _joystick:
+        The gamepad, or None if it is not plugged in
+    """
+    _joystick: Optional[pygame.joystick.Joystick]
+
+    def __init__(self, number: int = 0) -> None:
+        """
+        Initialize a player with gamepad <number>. The joystick module is
+        only started once a gamepad is asked for.
+        """
+        pygame.joystick.init()
+        self._joystick = None
+        if number < pygame.joystick.get_count():
+            self._joystick = pygame.joystick.Joystick(number)
+
+    def actions(self, game: Game, index: int) -> int:
+        joystick = self._joystick
+        if joystick is None:
+            return 0
+        actions = 0
+        axis = joystick.get_axis(1) if joystick.get_numaxes() > 1 else 0.0
+        hat = joystick.get_hat(0)[1] if joystick.get_numhats() else 0
+        if axis < -DEADZONE or hat > 0:
+            actions |= MOVE_UP
+        if axis > DEADZONE or hat < 0:
+            actions |= MOVE_DOWN
+        buttons = joystick.get_numbuttons()
+        for button, action in GAMEPAD_BUTTONS.items():
+            if button < buttons and joystick.get_button(button):
+                actions |= action
+        return actions
+
+
+class AnySource(InputSource):
+    """
+    A player who can play with any of several sources at once, such as
+    the keyboard and a gamepad.
+
+    === Public Attributes ===
+    sources:
+        The sources whose actions are taken together
+    """
+    sources: List[InputSource]
+
+    def __init__(self, sources: Iterable[InputSource]) -> None:
+        self.sources = list(sources)
+
+    def actions(self, game: Game, index: int) -> int:
+        actions = 0
+        for source in self.sources:
+            actions |= source.actions(game, index)
+        return actions
+
+
+class ScriptedSource(InputSource):
+    """
+    A player taking a fixed sequence of actions, one action byte per tick
+    of the match.
+
+    The script is read at the game's tick, so one source can play both
+    paddles.
+
+    === Public Attributes ===
+    script:
+        The action bytes of each tick, in order
+    loop:
+        True to start the script again once it ends, False to do nothing
+        from then on
+    """
+    script: Sequence[int]
+    loop: bool
+
+    def __init__(self, script: Sequence[int], loop: bool = False) -> None:
+        self.script = script
+        self.loop = loop
+
+    def actions(self, game: Game, index: int) -> int:
+        tick = game.ticks
+        if tick >= len(self.script):
+            if not self.loop or not self.script:
+                return 0
+            tick %= len(self.script)
+        return self.script[tick]
+
+
+class ReplaySource(InputSource):
+    """
+    A player playing a recorded match again through the game, as it was
+    played: serving whenever the ball waits for a serve, and otherwise
+    moving as recorded.
+
+    The recorded ticks are read in step with the game's ticks, so one
+    source can play both paddles. The match only plays out as it was
+    recorded if the game's simulation also draws the replay's random
+    numbers, from Replay.random().
+
+    === Public Attributes ===
+    replay:
+        The replay being played
+
+    === Private Attributes ===
+    _tick:
+        The game's tick the source was last asked about, or -1
+    _position:
+        The number of recorded ticks reached, including that tick's
+    """
+    replay: Replay
+    _tick: int
+    _position: int
+
+    def __init__(self, replay: Replay) -> None:
+        self.replay = replay
+        self._tick = -1
+        self._position = 0
+
+    def actions(self, game: Game, index: int) -> int:
+        if game.sim.waiting:
+            return SERVE
+        if game.ticks != self._tick:
+            if game.ticks < self._tick:
+                # A new match: the replay starts again
+                self._position = 0
+            self._tick = game.ticks
+            self._position += 1
+        if self._position > len(self.replay):
+            return 0
+        inputs = decode_inputs(self.replay.inputs[self._position - 1])
+        return moves(inputs[index])
+
+
+class AISource(InputSource):
+    """
+    The computer, moving towards where the ball will reach its paddle.
+
+    === Public Attributes ===
+    serves:
+        True if it serves the ball and starts the next game itself, as
+        when two computers play each other
+
+    === Private Attributes ===
+    _controller:
+        Chooses the direction to move in
+    """
+    serves: bool
+    _controller: AIController
+
+    def __init__(self, serves: bool = False) -> None:
+        self.serves = serves
+        self._controller = AIController()
+
+    def actions(self, game: Game, index: int) -> int:
+        actions = moves(self._controller(game.sim, index))
+        if self.serves:
+            actions |= SERVE | PLAY_AGAIN
+        return actions
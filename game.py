@@ -1,15 +1,65 @@
 from __future__ import annotations
-from typing import Optional, List, Tuple, Union
-from actors import *
+import os
+import struct
+import time
+from typing import TYPE_CHECKING, Dict, Optional, List, Tuple, Union
 import pygame
-import random
-from high_score import HighScore
+from actors import (BLACK, WHITE, Actor, AIPlayer, Ball, Boundaries,
+                    HumanPlayer, Message, ProfilerHUD, ScoreBoard)
+from leaderboard import Leaderboard, import_high_score, mode_name
+from lifecycle import GAME_OVER, MENU, PAUSED, PLAYING, READY, Lifecycle
+from profiler import FrameProfiler
+from replay import EXTENSION, ReplayRecorder, prune_replays
 from button import Button
+from controls import (EXPOSE_EVENTS, PAUSE, PLAY_AGAIN, PLAYER1_KEYS,
+                      PLAYER2_KEYS, RESUME, SERVE, AISource, AnySource,
+                      GamepadSource, InputSource, KeyboardSource, direction,
+                      pack_frame, unpack_frame)
+from scheduler import FrameScheduler
+from collision import CollisionWorld
+from multiball import MULTI_BALLS, MultiBallSimulation
+from simulation import STAY, Simulation
+from snapshot import (EXTENSION as STATE_EXTENSION, NEW_ROUND,
+                      PAUSED as PAUSED_FLAG, State, capture, load_state,
+                      restore, save_state)
+
+if TYPE_CHECKING:
+    # Only broadcast games need asyncio and the network code, so they are
+    # not imported on startup
+    from spectate import Broadcaster
+
+# The length in milliseconds of one unit of simulation time
+MS_PER_UNIT = 30
+# The default number of simulation ticks per second
+TICK_RATE = 60
+# The default most frames drawn per second
+FPS_CAP = 60
+# The directory recorded matches are saved in
+REPLAY_DIR = "replays"
+# The longest frame the simulation catches up on, so that a stall does not
+# make it run thousands of ticks in a row
+MAX_FRAME_MS = 250
+# The file the state of a game is saved in with F5 and loaded from with F9
+SAVE_STATE_FILE = "quicksave" + STATE_EXTENSION
+
+
+def _add_dirty(dirty: List[pygame.Rect], rect: pygame.Rect) -> None:
+    """
+    Add <rect> to the list of <dirty> areas, merging it with every area it
+    overlaps so that no part of the screen is repainted twice.
+    """
+    rect = rect.copy()
+    index = rect.collidelist(dirty)
+    while index != -1:
+        rect.union_ip(dirty.pop(index))
+        index = rect.collidelist(dirty)
+    dirty.append(rect)
 
 
 class Game:
     """
-        This class represents the main game.
+        This class represents the main game. It draws the match held by its
+        simulation and turns the players' key presses into its input.
 
         === Public Attributes ===
         screen:
@@ -22,8 +72,16 @@ class Game:
             The first player (human) in this game.
         player2:
             The second player (human OR AI) in this game.
+        vs_ai:
+            True if the second player is controlled by the computer.
         ball:
-            The ball in this game.
+            The ball in this game, or the first ball in multi-ball mode.
+        balls:
+            Every ball in this game.
+        multi_ball:
+            True if the game is played with many balls at once.
+        ball_count:
+            The number of balls in multi-ball mode.
         start_pos:
             True if it is the start of the round, false while round is ongoing
         d_h:
@@ -41,33 +99,101 @@ class Game:
                                                                         round.
         pause_message:
             The message displayed to the user when the game is paused
+        game_over_message:
+            The message naming the winner once the game is over
+        game_over_message2:
+            The message telling the players how to play again
+        notice_message:
+            The message telling the players a saved state could not be
+            loaded, until the stage changes
+        lifecycle:
+            The stage the game is at: in the menu, ready for a serve,
+            playing, paused or over. Every change of stage goes through
+            it, and shows or hides the messages for the new stage.
         upper_bound:
             The upper bar of the stage
         lower_bound:
             The lower bar of the stage
 
         === Private Attributes ===
-        _pause:
-            True if the game is paused, false otherwise
-        _game_begun:
-            True if the game just begun, false otherwise
-        _new_round:
-            True if there is new round but has not yet been started, false
-            if it has been started.
-        _running:
-            Whether or not the game is running.
         _actors:
             The list of all the Actor objects in this game.
+        _leaderboard:
+            The leaderboard the scores are recorded on, or None until it
+            is first used.
+        sim:
+            The simulation of the match: the ball, paddles, bounds and score.
+        world:
+            The collision world of the simulation, holding only the bodies
+            that collide (players, ball and boundaries).
+        dirty_rendering:
+            True to redraw and update only the parts of the screen that
+            changed each frame, False to always redraw the whole screen.
+        tick_rate:
+            The number of fixed-length simulation ticks per second.
+        fps_cap:
+            The most frames drawn per second, or None for no limit. The
+            game sleeps between frames instead of busy-waiting.
+        interpolation:
+            How far, from 0 to 1, the frame being drawn is between the last
+            two simulation ticks.
+        scheduler:
+            Paces the frames, and blocks on input while nothing is moving.
+        broadcaster:
+            Sends the match to spectators, or None if it is not broadcast.
+        sources:
+            The source of the actions of each player: the keyboard, a
+            gamepad, a script or the computer.
+        gamepads:
+            True if people play with gamepads as well as the keyboard.
+        read_events:
+            True to read pygame's events every frame, False to run without
+            a window, when no source needs them and an idle game must not
+            block waiting for them.
+        ticks:
+            The number of ticks of the match played so far, at which the
+            sources read their actions.
+        profiler_hud:
+            The overlay of frame timings, or None before the first match.
+        exit_button:
+            The MENU button, or None before the first match.
+
+        === Private Attributes (rendering) ===
+        _drawn_rects:
+            The screen area each actor covered when it was last drawn
+        _body_actors:
+            The actor drawing each body of the simulation
+        _full_redraw:
+            True if the next frame must redraw the whole screen
+        background:
+            The static parts of the stage (net, boundaries and MENU button)
+            composited once, or None if it has to be built again.
         """
     screen: pygame.Surface
     screen_size: Tuple[int]
-    _running: bool
+    lifecycle: Lifecycle
     goal_score: int
     start_pos: bool
     player1: HumanPlayer
     player2: Union[HumanPlayer, AIPlayer]
+    vs_ai: bool
     ball: Ball
+    balls: List[Ball]
+    multi_ball: bool
+    ball_count: int
     _actors: List[Actor]
+    sim: Simulation
+    world: CollisionWorld
+    _body_actors: Dict[object, Actor]
+    dirty_rendering: bool
+    tick_rate: int
+    fps_cap: Optional[int]
+    interpolation: float
+    scheduler: FrameScheduler
+    _accumulator: float
+    _drawn_rects: Dict[Actor, Optional[pygame.Rect]]
+    _full_redraw: bool
+    background: Optional[pygame.Surface]
     d_w: int
     d_h: int
     y_bound: List[int]
@@ -79,54 +205,100 @@ class Game:
     infinite_mode: bool
     game_over_message: Message
     game_over_message2: Message
+    notice_message: Message
     winner: Optional[str]
-    game_reset: bool
-    high_score: HighScore
-
-    def __init__(self, size: Tuple[int], goal: int) -> None:
+    _leaderboard: Optional[Leaderboard]
+    record_replays: bool
+    profiler: FrameProfiler
+    profiler_hud: Optional[ProfilerHUD]
+    exit_button: Optional[Button]
+    recorder: Optional[ReplayRecorder]
+    broadcaster: Optional[Broadcaster]
+    sources: List[InputSource]
+    gamepads: bool
+    read_events: bool
+    ticks: int
+
+    def __init__(self, size: Tuple[int], goal: int,
+                 leaderboard: Optional[Leaderboard] = None) -> None:
         """
-        Initialize a game that has a display screen and game actors.
+        Initialize a game that has a display screen and game actors, and
+        records its scores on <leaderboard> (by default, the leaderboard
+        in the current directory, only opened once it is used).
+
+        The window is reused if it is already open at <size>. The actors of
+        the stage are only built once the first match starts.
         """
-        self.screen = pygame.display.set_mode(size)
+        screen = pygame.display.get_surface()
+        if screen is None or screen.get_size() != tuple(size):
+            screen = pygame.display.set_mode(size)
+        self.screen = screen
         self.screen_size = size
-        self._running = False
+        self.lifecycle = Lifecycle(self.on_state_change)
         self.goal_score = goal
         self.player1 = None
         self.player2 = None
+        self.vs_ai = False
         self.ball = None
+        self.balls = []
+        self.multi_ball = False
+        self.ball_count = MULTI_BALLS
         self.upper_bound = None
         self.lower_bound = None
         self._actors = []
-        self._pause = True
-        self.d_w, self.d_h = pygame.display.get_surface().get_size()
-        self.x_bound = [0, self.d_w]
+        self.d_w, self.d_h = screen.get_size()
+        self.sim = Simulation(self.d_w, self.d_h, goal)
+        self.profiler = FrameProfiler()
+        self.profiler_hud = None
+        self.world = self.sim.world
+        self._body_actors = {}
+        self.x_bound = self.sim.x_bound
         self.y_bound = None
         self.start_pos = True
-        self.clock = pygame.time.Clock()
+        self.scheduler = FrameScheduler()
+        self.clock = self.scheduler.clock
         self.infinite_mode = False
-        self._game_begun = False
-        self._new_round = True
         self.winner = None
-        self.game_reset = False
-        self.high_score = HighScore(0, 0, 70, (250, 250, 250),
-                                    self.screen, "high_score_value.txt")
-        self.exit_button = Button(0, 0, (0, 0, 0), 65,
-                                  round(self.d_h * 0.05), "MENU",
-                                  self.return_to_menu)
+        self._leaderboard = leaderboard
+        self.record_replays = True
+        self.recorder = None
+        self.broadcaster = None
+        self._broadcast_state = None
+        self._broadcast_frames = 0
+        self.exit_button = None
+        self.dirty_rendering = True
+        self.tick_rate = TICK_RATE
+        self.fps_cap = FPS_CAP
+        self.interpolation = 1.0
+        self._accumulator = 0.0
+        self._drawn_rects = {}
+        self._full_redraw = True
+        self.background = None
+        self.gamepads = False
+        self.read_events = True
+        self.ticks = 0
+        self.sources = self.default_sources()
+
+    @property
+    def leaderboard(self) -> Leaderboard:
+        """
+        Return the leaderboard the scores of this game are recorded on,
+        opening the default one the first time it is asked for, with the
+        high score of an earlier version of the game on it.
+        """
+        if self._leaderboard is None:
+            self._leaderboard = Leaderboard()
+            import_high_score(self._leaderboard)
+        return self._leaderboard
 
     def get_actor(self, x: int, y: int) -> Optional[Actor]:
         """
-        Return the actor object that exists in the location given by
-        <x> and <y>. If no actor exists in that location, return None.
+        Return the collidable actor object that exists in the location given
+        by <x> and <y>. If no actor exists in that location, return None.
         """
-        for actor in self._actors:
-            actor_x, actor_y = actor.get_coordinates()[0], \
-                               actor.get_coordinates()[1]
-            actor_width, actor_height = actor.get_dimensions()[0], \
-                                        actor.get_dimensions()[1]
-            if actor_x < x < actor_x + actor_width and \
-                    actor_y < y < actor_y + actor_height:
-                return actor
+        found = self.world.query_point(x, y)
+        if found:
+            return self._body_actors.get(found[0])
         return None
 
     def set_goal(self, score: int):
@@ -143,222 +315,632 @@ class Game:
     def toggle_infinite(self):
         self.infinite_mode = not self.infinite_mode
 
-    def set_pause(self, switch: bool) -> None:
-        self._pause = switch
+    def play_two_player(self) -> None:
+        """
+        Start a game between two human players.
+        """
+        self.vs_ai = False
+        self.multi_ball = False
+        self.sources = self.default_sources()
+        self.on_execute()
 
-    def set_new_round(self, switch: bool) -> None:
-        self._new_round = switch
+    def play_vs_ai(self) -> None:
+        """
+        Start a game of a human player against the computer.
+        """
+        self.vs_ai = True
+        self.multi_ball = False
+        self.sources = self.default_sources()
+        self.on_execute()
+
+    def play_multi_ball(self) -> None:
+        """
+        Start a game between two human players with <ball_count> balls at
+        once.
+        """
+        self.vs_ai = False
+        self.multi_ball = True
+        self.sources = self.default_sources()
+        self.on_execute()
+
+    def default_sources(self) -> List[InputSource]:
+        """
+        Return the sources of the players for the current mode: the
+        keyboard, and gamepads if <gamepads>, for people, and the computer
+        for the AI.
+        """
+        first = KeyboardSource(PLAYER1_KEYS)
+        second = AISource() if self.vs_ai else KeyboardSource(PLAYER2_KEYS)
+        if self.gamepads:
+            first = AnySource([first, GamepadSource(0)])
+            if not self.vs_ai:
+                second = AnySource([second, GamepadSource(1)])
+        return [first, second]
+
+    def poll_actions(self) -> int:
+        """
+        Return the action frame of this tick, from the source of each
+        player.
+        """
+        return pack_frame([source.actions(self, index)
+                           for index, source in enumerate(self.sources)])
 
     def game_won(self) -> bool:
         """
         Return True iff the game has been won.
         """
-        if self.infinite_mode:
+        winner = self.sim.winner()
+        if winner is None:
             return False
-        if self.player1.get_score() == self.goal_score:
-            self.winner = "Player 1"
-            return True
-        if self.player2.get_score() == self.goal_score:
-            self.winner = "Player 2"
-            return True
-        return False
+        self.winner = "Player " + str(winner + 1)
+        return True
+
+    def start_match(self) -> None:
+        """
+        Set the stage for a new match: reset the simulation, and create the
+        players, balls, boundaries and score boards for it.
+        """
+        d_h, d_w = self.d_h, self.d_w
+        h_bars = round(d_h * 0.05)
+        sim = self.sim
+        sim.reset_match()
+        self.start_recording()
+        self.y_bound = sim.y_bound
+        self.player1 = HumanPlayer(10, (d_h // 2) - 40, self.y_bound, self,
+                                   sim.paddles[0])
+        if self.vs_ai:
+            self.player2 = AIPlayer(d_w - 25, (d_h // 2) - 40, self.y_bound,
+                                    self, sim.paddles[1])
+        else:
+            self.player2 = HumanPlayer(d_w - 25, (d_h // 2) - 40, self.y_bound,
+                                       self, sim.paddles[1])
+        self.balls = [Ball(d_w // 2, d_h // 2, self.y_bound, self.x_bound,
+                           self, body)
+                      for body in getattr(sim, 'balls', [sim.ball])]
+        self.ball = self.balls[0]
+
+        self.upper_bound = Boundaries(0, 0, d_w, h_bars, self.y_bound, self,
+                                      sim.upper_bound)
+        self.lower_bound = Boundaries(0, d_h - h_bars, d_w, h_bars,
+                                      self.y_bound, self, sim.lower_bound)
+
+        self.board_player1 = ScoreBoard(d_w // 3, 450, 50, 50, 0,
+                                        self.player1, self)
+        self.board_player2 = ScoreBoard(2 * d_w // 3, 450, 50, 50, 0,
+                                        self.player2, self)
+
+        # The actors of the last match are dropped, but the messages are
+        # the same ones every match
+        self._actors = [self.player1, self.player2, *self.balls,
+                        self.board_player1, self.board_player2,
+                        self.start_message, self.pause_message,
+                        self.game_over_message, self.game_over_message2,
+                        self.notice_message, self.profiler_hud]
+        self._body_actors = {actor.body: actor for actor in
+                             (self.player1, self.player2, *self.balls,
+                              self.upper_bound, self.lower_bound)}
+        self._drawn_rects = {}
+        if self.background is None:
+            self.build_background()
 
     def new_round(self):
         """
-        Reset the stage for the new round. If this the beginning of the game,
-        create new players and ball, else just reset the position.
-        """
-        if self._game_begun is False:
-            d_h, d_w = self.d_h, self.d_w
-            h_bars = round(d_h * 0.05)
-            self.y_bound = [h_bars, d_h - h_bars]
-            self.player1 = HumanPlayer(10, (d_h // 2) - 40, self.y_bound, self)
-            self.player2 = HumanPlayer(d_w - 25, (d_h // 2) - 40, self.y_bound, self)
-            self.ball = Ball(d_w // 2, d_h // 2, self.y_bound, self.x_bound, self)
-
-            self.upper_bound = Boundaries(0, 0, d_w, h_bars, self.y_bound, self)
-            self.lower_bound = Boundaries(0, d_h - h_bars, d_w, h_bars,
-                                          self.y_bound, self)
-
-            self.board_player1 = ScoreBoard(d_w // 3, 450, 50, 50, 0,
-                                            self.player1, self)
-            self.board_player2 = ScoreBoard(2 * d_w // 3, 450, 50, 50, 0,
-                                            self.player2, self)
-
-            self.start_message = Message(d_w // 2, d_h // 2, 50, 50,
-                                         0, self, "Press SPACE to start", True)
-            self.pause_message = Message(d_w // 2, d_h // 2, 50, 50,0, self,
-                                         "Game Paused - Press 'r' to resume",
-                                         False)
-            self._actors = []
-            self._actors.extend([self.player1, self.player2, self.ball,
-                                 self.upper_bound, self.lower_bound,
-                                 self.board_player1, self.board_player2,
-                                 self.start_message, self.pause_message])
+        Reset the stage for the new round: put the ball back in the middle.
+        """
+        self.sim.reset_round()
+
+    def end_round(self) -> None:
+        """
+        Start a new round after somebody scored, or end the game if they
+        won it.
+        """
+        self.new_round()
+        self.lifecycle.go(GAME_OVER if self.game_won() else READY)
 
+    def serve(self) -> None:
+        """
+        Start the round that is ready by serving the ball.
+        """
+        self.lifecycle.go(PLAYING)
+        self.ball.init_move()
+
+    def on_state_change(self, old: str, new: str) -> None:
+        """
+        Show the messages for the stage <new> the game went to from <old>,
+        and hide the others.
+        """
+        if new == MENU:
+            return
+        if new == GAME_OVER:
+            self.game_won()
+            self.game_over_message.set_text(self.winner + " won!")
+        self.start_message.set_drawn(new == READY)
+        self.pause_message.set_drawn(new == PAUSED)
+        self.game_over_message.set_drawn(new == GAME_OVER)
+        self.game_over_message2.set_drawn(new == GAME_OVER)
+        self.notice_message.set_drawn(False)
+
+    def record_score(self) -> None:
+        """
+        Record the better score of the match that is ending on the
+        leaderboard, unless nobody scored.
+        """
+        if self.player1 is None:
+            return
+        score1 = self.player1.get_score()
+        score2 = self.player2.get_score()
+        if score1 >= score2:
+            player, score = "Player 1", score1
+        else:
+            player, score = ("AI" if self.vs_ai else "Player 2"), score2
+        if score > 0:
+            self.leaderboard.record(player, score,
+                                    mode_name(self.goal_score,
+                                              self.infinite_mode))
+
+    def start_recording(self) -> None:
+        """
+        Start recording the match that is beginning, dropping the recording
+        of the last one if it was not saved.
+        """
+        if self.recorder is not None:
+            self.recorder.stop()
+            self.recorder = None
+        if self.record_replays and not self.multi_ball:
+            self.recorder = ReplayRecorder(self.sim, self.get_tick_dt())
+
+    def save_replay(self) -> Optional[str]:
+        """
+        Stop recording the match that is ending and save it in REPLAY_DIR,
+        unless nobody scored in it, and return the file it was saved in.
+        Only the newest replay.KEEP_REPLAYS replays are kept there.
+        """
+        if self.recorder is None:
+            return None
+        replay = self.recorder.stop()
+        self.recorder = None
+        if not any(paddle.score for paddle in self.sim.paddles):
+            return None
+        os.makedirs(REPLAY_DIR, exist_ok=True)
+        name = os.path.join(REPLAY_DIR, time.strftime("%Y%m%d-%H%M%S"))
+        path = name + EXTENSION
+        copies = 1
+        while os.path.exists(path):
+            copies += 1
+            path = "{}-{}{}".format(name, copies, EXTENSION)
+        replay.save(path)
+        prune_replays(REPLAY_DIR)
+        return path
+
+    def dump_profile(self) -> str:
+        """
+        Write the timings of the last frames to a CSV file in the current
+        directory and return its name.
+        """
+        path = time.strftime("profile-%Y%m%d-%H%M%S.csv")
+        self.profiler.dump_csv(path)
+        print("Frame timings written to", path)
+        return path
+
+    def capture_state(self) -> State:
+        """
+        Return the state of the match being played.
+        """
+        state = self.lifecycle.state
+        return capture(self.sim, state in (PAUSED, GAME_OVER),
+                       state in (READY, GAME_OVER))
+
+    def save_state(self, path: str = SAVE_STATE_FILE) -> Optional[str]:
+        """
+        Save the state of the match being played to the file <path> and
+        return its name, or return None if no match with a single ball is
+        being played.
+        """
+        if self.player1 is None or self.multi_ball:
+            return None
+        save_state(path, self.capture_state(), self.goal_score,
+                   self.infinite_mode)
+        return path
+
+    def load_state(self, path: str = SAVE_STATE_FILE) -> bool:
+        """
+        Put the match being played as it was saved in the file <path>.
+        Return False if there is no such file, it is not a state saved by
+        this version of the game or does not add up, or no match with a
+        single ball is being played. The match being played is then left
+        as it is.
+
+        The match stops being recorded, as its replay could not be played
+        back from the state loaded.
+        """
+        if self.player1 is None or self.multi_ball or \
+                not os.path.exists(path):
+            return False
+        try:
+            state, goal_score, infinite_mode = load_state(path)
+        except (OSError, ValueError, struct.error) as error:
+            self.notice_message.set_text(
+                "Could not load {}: {}".format(path, error))
+            self.notice_message.set_drawn(True)
+            return False
+        if self.recorder is not None:
+            self.recorder.stop()
+            self.recorder = None
+        self.goal_score = self.sim.goal_score = goal_score
+        self.infinite_mode = self.sim.infinite_mode = infinite_mode
+        restore(self.sim, state)
+        self.notice_message.set_drawn(False)
+        if state.winner is not None:
+            self.lifecycle.go_to(GAME_OVER)
+        elif state.flags & NEW_ROUND:
+            self.lifecycle.go_to(READY)
+        elif state.flags & PAUSED_FLAG:
+            self.lifecycle.go_to(PAUSED)
         else:
-            self.player1.reset_pos()
-            self.player2.reset_pos()
-            self.ball.reset_pos()
-            if not self.game_won():
-                self.start_message.set_drawn(True)
+            self.lifecycle.go_to(PLAYING)
+        self.remember_positions()
+        self._full_redraw = True
+        return True
+
+    def broadcast(self) -> None:
+        """
+        Send the state of the match to the spectators of <broadcaster> if
+        it changed since the last frame. Matches with many balls are not
+        broadcast.
+        """
+        if self.broadcaster is None or self.multi_ball:
+            return
+        state = self.capture_state()
+        if state != self._broadcast_state:
+            self._broadcast_state = state
+            self._broadcast_frames += 1
+            self.broadcaster.publish(self._broadcast_frames, state)
 
     def reset_game(self) -> None:
-        """Reset this game.
-        """
-        self._running = False
-        self.game_reset = True
-        self._pause = False
-        self.game_over_message.set_drawn(False)
-        self.game_over_message2.set_drawn(False)
-        self._game_begun = False
-        self.new_round()
+        """Reset this game, to play it again.
+        """
+        self.record_score()
+        self.save_replay()
+        self.on_init()
 
     def return_to_menu(self) -> None:
         """
         Returns the game to the main menu
         """
-        score1 = self.player1.get_score()
-        score2 = self.player2.get_score()
-        if self.infinite_mode:
-            if score1 >= score2:
-                self.high_score.store_score(score1)
-            else:
-                self.high_score.store_score(score2)
-        self._running = False
-        self.game_reset = False
-        self._pause = False
-        self._game_begun = False
-        self.new_round()
-        self._new_round = True
+        self.record_score()
+        self.save_replay()
+        self.lifecycle.go(MENU)
 
     def on_init(self) -> None:
         """
-        Initialize this game.
+        Initialize this game, and start a match ready for its first serve.
         """
-        self._running = True
         self.winner = None
+        if self.exit_button is None:
+            self.build_stage()
+        if self.multi_ball != isinstance(self.sim, MultiBallSimulation) or \
+                (self.multi_ball and len(self.sim.balls) != self.ball_count):
+            self.set_simulation()
+        self.sim.goal_score = self.goal_score
+        self.sim.infinite_mode = self.infinite_mode
         pygame.display.set_caption("PING")
-        self.new_round()
-        self.game_reset = False
+        if self.broadcaster is not None:
+            self.broadcaster.set_match(self.d_w, self.d_h, self.goal_score,
+                                       self.infinite_mode)
+            # Publish the first state of the new match even if it looks
+            # like the last one of the previous match
+            self._broadcast_state = None
+        self.start_match()
+        self.ticks = 0
+        self.lifecycle.go(READY)
+        self._full_redraw = True
+        self._accumulator = 0.0
+        self.remember_positions()
+
+    def build_stage(self) -> None:
+        """
+        Build the parts of the stage that every match shares: the MENU
+        button, the overlay of frame timings and the messages.
+        """
+        d_w, d_h = self.d_w, self.d_h
+        self.profiler_hud = ProfilerHUD(10, round(self.d_h * 0.05) + 5, self,
+                                        self.profiler)
+        self.exit_button = Button(0, 0, (0, 0, 0), 65,
+                                  round(self.d_h * 0.05), "MENU",
+                                  self.return_to_menu)
+        self.start_message = Message(d_w // 2, d_h // 2, 50, 50,
+                                     0, self, "Press SPACE to start", True)
+        self.pause_message = Message(d_w // 2, d_h // 2, 50, 50, 0, self,
+                                     "Game Paused - Press 'r' to resume",
+                                     False)
+        self.game_over_message = Message(d_w // 2, d_h // 2 - 30, 50, 50,
+                                         0, self, "", False)
+        self.game_over_message2 = Message(d_w // 2, d_h // 2 + 30, 10, 10,
+                                          0, self, "Press 'H' to play again",
+                                          False)
+        self.notice_message = Message(d_w // 2, d_h // 2 + 90, 10, 10,
+                                      0, self, "", False)
+
+    def set_simulation(self) -> None:
+        """
+        Replace the simulation with a new one for the current mode: one ball,
+        or <ball_count> balls in multi-ball mode.
+        """
+        if self.recorder is not None:
+            self.recorder.stop()
+            self.recorder = None
+        if self.multi_ball:
+            self.sim = MultiBallSimulation(self.d_w, self.d_h,
+                                           self.goal_score, self.infinite_mode,
+                                           count=self.ball_count)
+        else:
+            self.sim = Simulation(self.d_w, self.d_h, self.goal_score,
+                                  self.infinite_mode)
+        self.world = self.sim.world
+        self.x_bound = self.sim.x_bound
+        self._drawn_rects = {}
+        self._full_redraw = True
+
+    def step(self, inputs: List[int], dt: float) -> None:
+        """
+        Advance the simulation by <dt> with the paddle directions <inputs>,
+        and start a new round if somebody scored. In multi-ball mode, each
+        ball scores on its own and a new round only starts once the game is
+        won.
+        """
+        if self.recorder is not None:
+            self.recorder.record(inputs)
+        scorer = self.sim.step(inputs, dt)
+        if scorer is not None and (not self.multi_ball or self.game_won()):
+            self.end_round()
+            # Do not draw the ball sliding back to the middle
+            self.remember_positions()
+
+    def remember_positions(self) -> None:
+        """
+        Remember where the moving actors are before a simulation tick, so
+        frames can be drawn between this tick and the next.
+        """
+        self.player1.remember_position()
+        self.player2.remember_position()
+        for ball in self.balls:
+            ball.remember_position()
+
+    def get_tick_dt(self) -> float:
+        """
+        Return the length of one simulation tick in units of simulation time.
+        """
+        return 1000 / self.tick_rate / MS_PER_UNIT
 
     def on_move(self, dt: float) -> None:
         """
         Move every object on the stage while this game is on execute.
         """
-        for event in pygame.event.get():
+        self.handle_events()
+        self.update(dt)
+
+    def is_idle(self) -> bool:
+        """
+        Return True if nothing on the stage moves until a key is pressed:
+        while paused, before a round starts, and once the game is over.
+        """
+        return self.lifecycle.state != PLAYING
+
+    def handle_events(self, events: Optional[List[pygame.event.Event]] = None
+                      ) -> None:
+        """
+        Handle <events>, or the events waiting in pygame's event queue if
+        none are given.
+        """
+        if events is None:
+            events = pygame.event.get()
+        for event in events:
             if event.type == pygame.QUIT:
                 pygame.quit()
                 quit()
 
+            if event.type == pygame.VIDEORESIZE:
+                self.invalidate_background()
+            elif event.type in EXPOSE_EVENTS:
+                self._full_redraw = True
+
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_F3:
+                    self.profiler_hud.set_drawn(
+                        not self.profiler_hud.is_drawn())
+                elif event.key == pygame.K_F4:
+                    self.dump_profile()
+                elif event.key == pygame.K_F5:
+                    self.save_state()
+                elif event.key == pygame.K_F9:
+                    self.load_state()
+
             mouse_pos = pygame.mouse.get_pos()
             if event.type == pygame.MOUSEBUTTONDOWN:
                 mouse_pos = pygame.mouse.get_pos()
                 if self.exit_button.get_rect().collidepoint(mouse_pos):
                     self.return_to_menu()
 
-        keys = pygame.key.get_pressed()
-
+    def update(self, dt: float) -> None:
+        """
+        Advance the game by one tick of length <dt>, based on the actions
+        of the players on this tick. Either player can serve, pause, resume
+        or start the next game.
+        """
+        actions = unpack_frame(self.poll_actions())
+        self.ticks += 1
+        buttons = actions[0] | actions[1]
+        state = self.lifecycle.state
 
         #Case when a round is on-going and is not paused.
-        if not self._pause and not self._new_round:
-            # player1 moves
-            if keys[pygame.K_p]:
-                self._pause = True
-                self.pause_message.set_drawn(True)
+        if state == PLAYING:
+            if buttons & PAUSE:
+                self.lifecycle.go(PAUSED)
                 return
-            if keys[pygame.K_w] and (self.player1.get_coordinates()[1] -
-                                     self.player1.get_speed() >= 0):
-                self.player1.move("up", dt)
-            if keys[pygame.K_s] and (self.player1.get_coordinates()[1] +
-                                     self.player1.get_dimensions()[1] +
-                                     self.player1.get_speed() <= 720):
-                self.player1.move("down", dt)
-
-            # player2 moves
-            if keys[pygame.K_UP] and (self.player2.get_coordinates()[1] -
-                                      self.player2.get_speed() >= 0):
-
-                self.player2.move("up", dt)
-            if keys[pygame.K_DOWN] and (self.player2.get_coordinates()[1] +
-                                        self.player2.get_dimensions()[1] +
-                                        self.player2.get_speed() <= 720):
-                self.player2.move("down", dt)
-            self.ball.move(dt)
-
+            # The simulation stops the paddles at the edges of the stage
+            self.step([direction(actions[0]), direction(actions[1])], dt)
 
         #Case when user has paused the game.
-        elif not self._new_round:
-            if keys[pygame.K_r]:
-                self._pause = False
-                self.start_message.set_drawn(False)
-                self.pause_message.set_drawn(False)
-                self.ball.move(dt)
-            if keys[pygame.K_ESCAPE]:
-                self.game_won()
+        elif state == PAUSED:
+            if buttons & RESUME:
+                self.lifecycle.go(PLAYING)
+                self.step([STAY, STAY], dt)
 
         # Case when the game is won
-        elif self.game_won():
-            self.game_over_message = Message(self.d_w // 2, self.d_h // 2 - 30, 50, 50,
-                                         0, self, self.winner + " won!",
-                                         True)
-            self.game_over_message2 = Message(self.d_w // 2, self.d_h // 2 + 30,
-                                             10, 10,
-                                             0, self, "Press 'H' to play again",
-                                             True)
-            self._actors.extend([self.game_over_message, self.game_over_message2])
-            self.start_message.set_drawn(False)
-            self._pause = True
-            self.pause_message.set_drawn(False)
-            if keys[pygame.K_h]:
+        elif state == GAME_OVER:
+            if buttons & PLAY_AGAIN:
                 self.reset_game()
 
-
         #Case when its a new round that has not yet been started.
-        else:
-            if keys[pygame.K_SPACE]:
-                self._game_begun = True
-                self._new_round = False
-                self._pause = False
-                self.start_message.set_drawn(False)
-                self.ball.init_move()
+        elif state == READY:
+            if buttons & SERVE:
+                self.serve()
 
-    def on_execute(self) -> None:
+    def build_background(self) -> None:
         """
-        Run the game until the game ends.
+        Composite the parts of the stage that never change (the net, the
+        boundaries and the MENU button) onto the background surface.
         """
-        # set up the game
-        self.on_init()
-        # run the game
-        while self._running:
+        background = pygame.Surface(self.screen.get_size()).convert()
+        background.fill(BLACK)
+        y = 6
+        for i in range(0, 20):
+            pygame.draw.rect(background, WHITE, ((self.d_w // 2) - 1, y,
+                                                 2, 24))
+            y += 36
+        self.upper_bound.draw(background)
+        self.lower_bound.draw(background)
+        self.exit_button.draw(background)
+        self.background = background
+
+    def invalidate_background(self) -> None:
+        """
+        Throw away the background, for example after the screen was resized
+        or the colours changed, so that it is built again before the next
+        frame.
+        """
+        self.background = None
+        self._full_redraw = True
 
-            dt = self.clock.tick() / 30
-            # print(self.clock.get_fps())
-            # move objects on the stage
-            self.on_move(dt)
+    def draw_full(self) -> None:
+        """
+        Redraw the whole screen and update all of the display.
+        """
+        if self.background is None:
+            self.build_background()
+        self.screen.blit(self.background, (0, 0))
 
-            # show up changes on the screen
-            self.screen.fill(BLACK)
-            display_width, display_height = \
-                pygame.display.get_surface().get_size()
+        for actor in self._actors:
+            actor.draw()
+            actor.dirty = False
+            self._drawn_rects[actor] = actor.get_rect()
+        self.profiler.lap("draw")
 
-            y = 6
-            for i in range(0, 20):
-                pygame.draw.rect(self.screen, WHITE, ((display_width//2)-1, y,
-                                                      2, 24))
-                y += 36
+        pygame.display.update()
+        self.profiler.lap("display")
+        self._full_redraw = False
 
+    def draw_dirty(self) -> None:
+        """
+        Redraw only the actors that moved or changed since the last frame,
+        together with anything they overlap, and update only those parts of
+        the display.
+        """
+        dirty = []
+        for actor in self._actors:
+            rect = actor.get_rect()
+            previous = self._drawn_rects.get(actor)
+            if rect != previous or actor.dirty:
+                if previous is not None:
+                    _add_dirty(dirty, previous)
+                if rect is not None:
+                    _add_dirty(dirty, rect)
+                self._drawn_rects[actor] = rect
+            actor.dirty = False
+        if not dirty:
+            self.profiler.lap("draw")
+            return
+
+        # Repaint each dirty area from the background, then redraw the
+        # actors in it with drawing clipped to it, so the parts of actors
+        # outside of it are left untouched.
+        for area in dirty:
+            self.screen.set_clip(area)
+            self.screen.blit(self.background, area, area)
             for actor in self._actors:
-                actor.draw()
-                self.exit_button.draw(self.screen)
+                rect = self._drawn_rects.get(actor)
+                if rect is not None and rect.colliderect(area):
+                    actor.draw()
+        self.screen.set_clip(None)
+        self.profiler.lap("draw")
 
-            # Update ScoreBoards:
-            self.board_player1.update()
-            self.board_player2.update()
-            # pygame.draw.rect(self.screen, RED, (0,0, display_width,5 ))
-            pygame.display.update()
+        pygame.display.update(dirty)
+        self.profiler.lap("display")
 
-        if self.game_reset:
-            self.on_execute()
+    def on_execute(self) -> None:
+        """
+        Run the game until it goes back to the menu. Playing again starts
+        a new match in the same loop.
+        """
+        # set up the game
+        self.on_init()
+        # run the game
+        while self.lifecycle.in_match:
+            self.run_frame()
+
+    def run_frame(self) -> None:
+        """
+        Run one frame of the game: handle the input, advance the simulation
+        by as many ticks as are due, and show the changes on the screen.
+        """
+        profiler = self.profiler
+        profiler.begin_frame()
+        tick_ms = 1000 / self.tick_rate
+        dt = self.get_tick_dt()
+        if self.read_events and self.is_idle() and not self._full_redraw:
+            # Nothing moves until a key is pressed: sleep until there
+            # is input, then run a single tick to react to it.
+            events = self.scheduler.wait()
+            profiler.lap("wait")
+            self.handle_events(events)
+            profiler.lap("input")
+            if self.lifecycle.in_match:
+                self.remember_positions()
+                self.update(dt)
+            self._accumulator = 0.0
+            self.interpolation = 1.0
+        else:
+            # Clock.tick sleeps rather than spins to keep to the cap
+            frame_ms = self.scheduler.tick(self.fps_cap)
+            profiler.lap("wait")
+            self._accumulator += min(frame_ms, MAX_FRAME_MS)
+            if self.read_events:
+                self.handle_events()
+            profiler.lap("input")
+
+            # move objects on the stage in ticks of a fixed length, so
+            # the game plays the same at any frame rate
+            while self.lifecycle.in_match and self._accumulator >= tick_ms:
+                self.remember_positions()
+                self.update(dt)
+                self._accumulator -= tick_ms
+            self.interpolation = min(self._accumulator / tick_ms, 1.0)
+        self.broadcast()
+        profiler.lap("physics")
+
+        # Update ScoreBoards:
+        self.board_player1.update()
+        self.board_player2.update()
+        self.profiler_hud.update()
+        profiler.lap("scoreboard")
+
+        # show up changes on the screen. With many balls, most of the
+        # screen changes every frame, so it is cheaper to redraw all of it.
+        if self.dirty_rendering and not self._full_redraw and \
+                not self.multi_ball:
+            self.draw_dirty()
+        else:
+            self.draw_full()
+        profiler.end_frame()
 
 
@@ -1,49 +1,66 @@
-from typing import Tuple
+from typing import List, Optional, Tuple
+import time
 import pygame
+from leaderboard import INFINITE_MODE, Entry, Leaderboard
+from text_cache import render_text
+
+# The least number of seconds between two checks of the leaderboard
+RELOAD_INTERVAL = 1.0
+# The number of leaderboard entries listed under the high score
+LISTED_ENTRIES = 5
 
 
 class HighScore:
     """
-    An object which displays and tracks the highest overall score.
+    An object which displays and tracks the highest overall scores, kept in
+    a leaderboard shared with every other instance of the game.
     _center_x: The x coordinate of the center of the object
     _center_y: The y coordinate of the center of the object
     _font_size: The size of the font
     _color: A RGB tuple
     _game: The game this high score is to be displayed in
-    _score_file: A string representation of a file path where the high score is
-        stored.
-    _high_score: An int representation of the high score
+    _leaderboard: The leaderboard the scores are stored in
+    _mode: The mode whose scores are displayed and stored
+    _entries: The best entries of the leaderboard, kept in memory
+    _version: The version of the leaderboard _entries were read from
+    _checked_at: When the leaderboard was last checked for changes
     """
     _center_x: int
     _center_y: int
     _font_size: int
     _color: Tuple[int, int, int]
     _surface: pygame.Surface
-    _score_file: str
-    _high_score: int
+    _leaderboard: Leaderboard
+    _mode: str
+    _entries: List[Entry]
+    _version: Optional[tuple]
+    _checked_at: float
 
     def __init__(self, center_x: int, center_y: int, font_size: int,
-                 color: Tuple, curr_surface: pygame.Surface, score_file: str):
+                 color: Tuple, curr_surface: pygame.Surface,
+                 leaderboard: Leaderboard, mode: str = INFINITE_MODE):
         self._center_x = center_x
         self._center_y = center_y
         self._color = color
         self._font_size = font_size
         self._surface = curr_surface
-        self._score_file = score_file
-        self.get_score()
+        self._leaderboard = leaderboard
+        self._mode = mode
+        self._entries = []
+        self._version = None
+        self._checked_at = 0.0
+        self.update(force=True)
 
     def draw(self) -> None:
         """
-        Draw the high score onto the game screen
+        Draw the high score and the best entries onto the game screen
         """
         self.update()
-        font = pygame.font.Font(None, self._font_size)
-        text = font.render("High Score", 1, self._color)
+        text = render_text("High Score", self._font_size, self._color)
         text_pos = text.get_rect(centerx=self._center_x,
                                  centery=self._center_y - 35)
 
-        font = pygame.font.Font(None, 70)
-        text2 = font.render(str(self._high_score), 1, self._color)
+        text2 = render_text(str(self.get_score()), 70, self._color)
         text2_pos = text2.get_rect(centerx=self._center_x,
                                    centery=self._center_y + 45)
 
@@ -53,32 +70,54 @@ class HighScore:
                           text.get_width(), 10))
         self._surface.blit(text, text_pos)
 
-    # TODO: check if this method works
-    def store_score(self, score) -> None:
+        mode = render_text(self._mode, 24, self._color)
+        self._surface.blit(mode, mode.get_rect(centerx=self._center_x,
+                                               bottom=self._center_y - 60))
+
+        y = self._center_y + 95
+        for rank, entry in enumerate(self._entries, 1):
+            line = render_text("{}. {}  {}".format(rank, entry.player,
+                                                   entry.score),
+                               24, self._color)
+            self._surface.blit(line, line.get_rect(centerx=self._center_x,
+                                                   top=y))
+            y += 22
+
+    def store_score(self, score: int, player: str = "Player") -> None:
         """
-        Store the given score in the file by over-riding the old file with
-        the new score.
+        Record the given score for <player> on the leaderboard.
         :param score: an int representing the score
         """
-        with open(self._score_file, 'w') as file:
-            if score > int(self.get_score().rstrip()):
-                self._high_score = score
-                file.write(str(score))
+        self._leaderboard.record(player, score, self._mode)
+        self.update(force=True)
+
+    def set_mode(self, mode: str) -> None:
+        """
+        Display and store the scores of <mode> from now on.
+        """
+        if mode != self._mode:
+            self._mode = mode
+            self.update(force=True)
 
-    # TODO: check if this method works
-    def get_score(self) -> None:
+    def get_score(self) -> int:
         """
-        Gets the current high score from the file and sets
-        self._high_score to it.
+        Return the current high score, or 0 if there is none.
         """
-        with open(self._score_file, 'r') as file:
-            self._high_score = file.readline().rstrip()
-        if not self._high_score:
-            return "0"
+        if self._entries:
+            return self._entries[0].score
+        return 0
 
-    def update(self) -> None:
+    def update(self, force: bool = False) -> None:
         """
-        Updates the high score with the current value from the file
+        Reload the best entries from the leaderboard, but only if it changed
+        since they were last read. Unless <force> is True, the leaderboard
+        is checked at most once every RELOAD_INTERVAL seconds.
         """
-        with open(self._score_file, 'r') as file:
-            self._high_score = file.readline().rstrip()
+        now = time.monotonic()
+        if not force and now - self._checked_at < RELOAD_INTERVAL:
+            return
+        self._checked_at = now
+        version = self._leaderboard.version()
+        if force or version != self._version:
+            self._version = version
+            self._entries = self._leaderboard.top(LISTED_ENTRIES, self._mode)
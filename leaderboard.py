@@ -0,0 +1,213 @@
+"""
+A leaderboard of the best scores, shared by every game instance that uses
+the same file.
+
+The scores are kept in an SQLite database. SQLite locks the file while it
+is written, so several instances can record scores at the same time, and
+an index on (mode, score) lets the best K scores be read without looking
+at the rest.
+"""
+from __future__ import annotations
+import datetime
+import os
+import sqlite3
+from typing import List, NamedTuple, Optional
+
+# The file the leaderboard is kept in by default
+LEADERBOARD_FILE = "leaderboard.db"
+# The file earlier versions of the game kept their one high score in
+HIGH_SCORE_FILE = "high_score_value.txt"
+# The player the score of HIGH_SCORE_FILE is recorded for, as it has none
+HIGH_SCORE_PLAYER = "Player"
+# How many scores are kept for each mode
+KEEP_PER_MODE = 100
+# How long a write waits for another instance to finish, in seconds
+BUSY_TIMEOUT = 5.0
+
+INFINITE_MODE = "infinite"
+
+
+def mode_name(goal_score: int, infinite_mode: bool) -> str:
+    """
+    Return the name a score is recorded under for a game played to
+    <goal_score>, or in infinite mode.
+    """
+    if infinite_mode:
+        return INFINITE_MODE
+    return "first to " + str(goal_score)
+
+
+def import_high_score(leaderboard: Leaderboard,
+                      path: str = HIGH_SCORE_FILE) -> bool:
+    """
+    Record the high score earlier versions of the game kept in the file
+    <path> on <leaderboard>, if there is one, and return True if it had a
+    score. Those versions only kept the score of infinite mode. The file is
+    renamed once it has been read, so the score is only recorded once.
+    """
+    if not os.path.exists(path):
+        return False
+    with open(path) as file:
+        text = file.readline().strip()
+    imported = text.isdigit() and int(text) > 0
+    if imported:
+        leaderboard.record(HIGH_SCORE_PLAYER, int(text), INFINITE_MODE)
+    os.replace(path, path + ".imported")
+    return imported
+
+
+class Entry(NamedTuple):
+    """
+    One score on the leaderboard.
+    """
+    player: str
+    score: int
+    mode: str
+    date: str
+
+
+class Leaderboard:
+    """
+    The best scores for each mode, stored in an SQLite database.
+
+    === Public Attributes ===
+    path:
+        The database file
+    keep:
+        How many scores are kept for each mode; worse ones are pruned
+
+    === Private Attributes ===
+    _connection:
+        The connection to the database
+    _writes:
+        The number of scores recorded through this connection
+    """
+    path: str
+    keep: int
+    _connection: sqlite3.Connection
+    _writes: int
+
+    def __init__(self, path: str = LEADERBOARD_FILE,
+                 keep: int = KEEP_PER_MODE) -> None:
+        self.path = path
+        self.keep = keep
+        self._writes = 0
+        self._connection = sqlite3.connect(path, timeout=BUSY_TIMEOUT,
+                                           isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        with self._transaction():
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS scores ("
+                " id INTEGER PRIMARY KEY,"
+                " player TEXT NOT NULL,"
+                " score INTEGER NOT NULL,"
+                " mode TEXT NOT NULL,"
+                " date TEXT NOT NULL)")
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS scores_by_mode"
+                " ON scores (mode, score DESC, id)")
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS scores_by_score"
+                " ON scores (score DESC, id)")
+
+    def _transaction(self) -> _Transaction:
+        """
+        Start a write and return it, to be used as a context manager around
+        the statements of the write. BEGIN IMMEDIATE takes the write lock
+        up front, so two instances never both read and then both write.
+        """
+        self._connection.execute("BEGIN IMMEDIATE")
+        return _Transaction(self._connection)
+
+    def record(self, player: str, score: int, mode: str,
+               date: Optional[str] = None) -> None:
+        """
+        Record that <player> scored <score> in <mode>, and prune the scores
+        of that mode that no longer make the leaderboard.
+        """
+        if date is None:
+            date = datetime.datetime.now().isoformat(timespec="seconds")
+        with self._transaction():
+            self._connection.execute(
+                "INSERT INTO scores (player, score, mode, date)"
+                " VALUES (?, ?, ?, ?)", (player, score, mode, date))
+            self._prune(mode)
+        self._writes += 1
+
+    def _prune(self, mode: str) -> None:
+        """
+        Delete the scores of <mode> that are not among the best <keep>.
+        """
+        self._connection.execute(
+            "DELETE FROM scores WHERE mode = ? AND id NOT IN ("
+            " SELECT id FROM scores WHERE mode = ?"
+            " ORDER BY score DESC, id LIMIT ?)", (mode, mode, self.keep))
+
+    def prune(self) -> None:
+        """
+        Delete every score that is not among the best <keep> of its mode,
+        and give the freed space back to the file system.
+        """
+        with self._transaction():
+            modes = [row[0] for row in self._connection.execute(
+                "SELECT DISTINCT mode FROM scores")]
+            for mode in modes:
+                self._prune(mode)
+        self._connection.execute("VACUUM")
+
+    def top(self, k: int, mode: Optional[str] = None) -> List[Entry]:
+        """
+        Return the best <k> scores of <mode>, or of every mode if <mode> is
+        None, best first. Earlier scores rank above later equal ones.
+        """
+        if mode is None:
+            rows = self._connection.execute(
+                "SELECT player, score, mode, date FROM scores"
+                " ORDER BY score DESC, id LIMIT ?", (k,))
+        else:
+            rows = self._connection.execute(
+                "SELECT player, score, mode, date FROM scores"
+                " WHERE mode = ? ORDER BY score DESC, id LIMIT ?", (mode, k))
+        return [Entry(*row) for row in rows]
+
+    def best(self, mode: Optional[str] = None) -> int:
+        """
+        Return the best score of <mode> (or of every mode), or 0 if there is
+        none yet.
+        """
+        entries = self.top(1, mode)
+        return entries[0].score if entries else 0
+
+    def version(self) -> tuple:
+        """
+        Return a value that changes whenever any instance records a score,
+        so readers can tell when their copy of the leaderboard is stale.
+        """
+        data_version = self._connection.execute(
+            "PRAGMA data_version").fetchone()[0]
+        return data_version, self._writes
+
+    def close(self) -> None:
+        """
+        Close the connection to the database.
+        """
+        self._connection.close()
+
+
+class _Transaction:
+    """
+    Commits a transaction when its block ends, or rolls it back if the
+    block raised.
+    """
+
+    def __init__(self, connection: sqlite3.Connection) -> None:
+        self._connection = connection
+
+    def __enter__(self) -> sqlite3.Connection:
+        return self._connection
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        if exc_type is None:
+            self._connection.execute("COMMIT")
+        else:
+            self._connection.execute("ROLLBACK")
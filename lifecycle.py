@@ -0,0 +1,115 @@
+"""
+The lifecycle of a game: the stages it goes through from the menu to the
+end of a match, and the transitions allowed between them.
+
+    menu -> ready -> playing -> paused -> game over
+
+A match starts ready, waiting for the serve. It is playing while the ball
+is in play, goes back to ready each time somebody scores, and is over once
+somebody has won, from where it can be played again or left for the menu.
+A match can be left for the menu from any stage, and loading a saved state
+gets to the stage it was saved at by the shortest way along these.
+"""
+from __future__ import annotations
+from typing import Callable, Dict, List, Optional, Tuple
+
+# The stages of a game
+MENU = "menu"
+READY = "ready"
+PLAYING = "playing"
+PAUSED = "paused"
+GAME_OVER = "game over"
+
+# The stages each stage can go to
+TRANSITIONS: Dict[str, Tuple[str, ...]] = {
+    MENU: (READY,),
+    READY: (PLAYING, MENU),
+    PLAYING: (READY, PAUSED, GAME_OVER, MENU),
+    PAUSED: (PLAYING, MENU),
+    GAME_OVER: (READY, MENU),
+}
+
+
+class Lifecycle:
+    """
+    The stage of its lifecycle a game is at, which only changes along the
+    transitions in TRANSITIONS.
+
+    === Public Attributes ===
+    state:
+        The stage the game is at
+
+    === Private Attributes ===
+    _on_change:
+        Called with the old and the new stage after each transition, or
+        None
+    """
+    state: str
+    _on_change: Optional[Callable[[str, str], None]]
+
+    def __init__(self, on_change: Optional[Callable[[str, str], None]] = None,
+                 state: str = MENU) -> None:
+        """
+        Initialize a lifecycle at <state>, which calls <on_change> after
+        each transition.
+        """
+        self.state = state
+        self._on_change = on_change
+
+    @property
+    def in_match(self) -> bool:
+        """
+        Return True if a match is being played, in any stage.
+        """
+        return self.state != MENU
+
+    def go(self, state: str) -> bool:
+        """
+        Go to <state>, and return True if the stage changed. Raise
+        ValueError if the current stage cannot go to <state>.
+        """
+        old = self.state
+        if state == old:
+            return False
+        if state not in TRANSITIONS[old]:
+            raise ValueError("a game cannot go from {} to {}".format(old,
+                                                                  state))
+        self.state = state
+        if self._on_change is not None:
+            self._on_change(old, state)
+        return True
+
+    def route(self, state: str) -> List[str]:
+        """
+        Return the stages the shortest way from the current stage to
+        <state> goes through, ending with <state>, without leaving the
+        match for the menu on the way. Raise ValueError if there is none.
+        """
+        previous = {self.state: self.state}
+        queue = [self.state]
+        for stage in queue:
+            if stage == state:
+                break
+            for next_stage in TRANSITIONS[stage]:
+                if next_stage not in previous and \
+                        (next_stage != MENU or next_stage == state):
+                    previous[next_stage] = stage
+                    queue.append(next_stage)
+        if state not in previous:
+            raise ValueError("a game cannot go from {} to {}".format(
+                self.state, state))
+        route = []
+        while state != self.state:
+            route.append(state)
+            state = previous[state]
+        return route[::-1]
+
+    def go_to(self, state: str) -> bool:
+        """
+        Go to <state> through the stages of the shortest way there, and
+        return True if the stage changed.
+        """
+        route = self.route(state)
+        for stage in route:
+            self.go(stage)
+        return bool(route)
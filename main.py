@@ -1,18 +1,102 @@
 """
 This module initializes and runs the main game.
+
+Run it with the "simulate" command to play headless matches instead, for
+example: python main.py simulate --matches 100000 --workers 8 --goal 10
+
+Run it with the "replay" command to watch a recorded match, for example:
+python main.py replay replays/20261017-120000.pingreplay --speed 4
+
+Run it with the "bench" command to time the game's hot paths without a
+window, for example: python main.py bench --json results.json
+
+Run it with the "serve" command to host a match over the network, and with
+the "connect" command to play in it, for example:
+python main.py serve --port 5290 and python main.py connect 127.0.0.1:5290
+
+Run it with the "spectate" command to broadcast, watch or load test matches
+for spectators, and with --broadcast PORT to broadcast the matches played
+in the window, for example: python main.py --broadcast 5291
+
+Run it with --startup-times to print how long each phase of starting the
+game took, up to the first frame of the menu.
 """
+import time
 
-from game import Game
-from menu import MainMenu
-import pygame
+STARTED = time.perf_counter()
+
+import sys
 
 SCREEN_SIZE = (960, 500)
 
 if __name__ == "__main__":
-    pygame.init()
+    if sys.argv[1:2] == ["simulate"]:
+        from tournament import main
+        main(sys.argv[2:])
+        sys.exit()
+    if sys.argv[1:2] == ["bench"]:
+        from benchmark import main
+        main(sys.argv[2:])
+        sys.exit()
+    if sys.argv[1:2] == ["replay"]:
+        from replay import main
+        main(sys.argv[2:])
+        sys.exit()
+    if sys.argv[1:2] == ["serve"]:
+        from network import main
+        main(sys.argv[2:])
+        sys.exit()
+    if sys.argv[1:2] == ["connect"]:
+        from network_game import main
+        main(sys.argv[2:])
+        sys.exit()
+    if sys.argv[1:2] == ["spectate"]:
+        from spectate import main
+        main(sys.argv[2:])
+        sys.exit()
+
+    import argparse
+    parser = argparse.ArgumentParser(description="Play PING.")
+    parser.add_argument("--broadcast", type=int, metavar="PORT",
+                        help="let spectators watch the matches played")
+    parser.add_argument("--gamepad", action="store_true",
+                        help="let the players play with gamepads too")
+    parser.add_argument("--startup-times", action="store_true",
+                        help="print how long each phase of startup took")
+    args = parser.parse_args()
+
+    from profiler import StartupTimer
+    timer = StartupTimer(STARTED)
+    from controls import allow_events
+    from game import Game
+    from menu import MainMenu
+    import pygame
+    timer.lap("imports")
+
+    # Only the modules the game uses are started: not audio, joysticks or
+    # the rest of what pygame.init() would start
+    pygame.display.init()
+    pygame.font.init()
+    allow_events(args.gamepad)
+    timer.lap("init")
     pygame.display.set_caption("PING")
+    pygame.display.set_mode(SCREEN_SIZE)
+    timer.lap("window")
 
     goal_score = 10
     game = Game(SCREEN_SIZE, goal_score)
+    game.gamepads = args.gamepad
+    if args.broadcast:
+        from spectate import Broadcaster
+        game.broadcaster = Broadcaster(game.d_w, game.d_h, goal_score, False)
+        game.broadcaster.start(port=args.broadcast)
+    timer.lap("game")
     mainMenu = MainMenu(game, SCREEN_SIZE)
-    mainMenu.display()
+    timer.lap("menu")
+
+    def first_frame() -> None:
+        timer.lap("first frame")
+        if args.startup_times:
+            print(timer.report(), flush=True)
+
+    mainMenu.display(first_frame)
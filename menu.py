@@ -1,9 +1,13 @@
 from __future__ import annotations
-from typing import Optional, List, Callable
-from game import Game
+from typing import TYPE_CHECKING, Optional, List, Callable
 from button import Button
 import pygame
 from high_score import HighScore
+from leaderboard import mode_name
+from text_cache import render_text
+
+if TYPE_CHECKING:
+    from game import Game
 
 black = (0, 0, 0)
 red = (255, 0, 0)
@@ -22,14 +26,21 @@ class MainMenu:
 
     def __init__(self, game, size):
         """
-        Initializes the menu and all of its buttons
+        Initializes the menu and all of its buttons, drawn in the window of
+        <game>
         """
-        self._surface = pygame.display.set_mode(size)
+        self._surface = game.screen
         self._game = game
 
         mid_pos = (size[0] // 2, size[1] // 2)
         self._buttons = [Button(mid_pos[0] - 100, mid_pos[1] - 50, red, 200,
-                                70, "Two player game", game.on_execute)]
+                                70, "Two player game", game.play_two_player)]
+        self._buttons.append(Button(mid_pos[0] - 100, mid_pos[1] + 130, red,
+                                    200, 40, "Player vs AI",
+                                    game.play_vs_ai))
+        self._buttons.append(Button(mid_pos[0] - 100, mid_pos[1] + 180, red,
+                                    200, 40, "Multi-ball",
+                                    game.play_multi_ball))
         # choose point limit
         self._buttons.append(Button(mid_pos[0] + 20, mid_pos[1] + 50, red, 30,
                                     30, "Up", game.increase_goal))
@@ -41,17 +52,32 @@ class MainMenu:
         h_s_width = 5*(self._surface.get_width()) // 6
         h_s_height = self._surface.get_height() // 4
         self._high_score = HighScore(h_s_width, h_s_height, 70, (250, 250, 250),
-                                     self._surface, "high_score_value.txt")
+                                     self._surface, game.leaderboard,
+                                     self.mode())
 
-    def display(self):
+    def display(self, on_first_frame: Optional[Callable[[], None]] = None):
         """
-        Displays the menu to the player
+        Displays the menu to the player, and calls <on_first_frame>, if it
+        is given, once the first frame of it is shown
+
+        Nothing on the menu moves, so it is only redrawn after an event
+        other than the mouse moving, such as a click or the window being
+        uncovered, and sleeps until there is one.
         """
+        scheduler = self._game.scheduler
+        redraw = True
         # Interaction loop
         while True:
-            pygame.display.update()
-            self.draw_menu()
-            for event in pygame.event.get():
+            if redraw:
+                self.draw_menu()
+                pygame.display.update()
+                redraw = False
+                if on_first_frame is not None:
+                    on_first_frame()
+                    on_first_frame = None
+            for event in scheduler.wait():
+                if event.type != pygame.MOUSEMOTION:
+                    redraw = True
 
                 if event.type == pygame.MOUSEBUTTONUP:
                     mouse_x, mouse_y = pygame.mouse.get_pos()
@@ -65,6 +91,12 @@ class MainMenu:
                     pygame.quit()
                     quit()
 
+    def mode(self) -> str:
+        """
+        Return the name of the mode of the games the menu starts.
+        """
+        return mode_name(self._game.goal_score, self._game.infinite_mode)
+
     def draw_menu(self):
         """
         Draws everything to the screen
@@ -77,21 +109,19 @@ class MainMenu:
         for button in self._buttons:
             button.draw(self._surface)
 
-        font = pygame.font.Font(None, 108)
-        title = font.render("P I N G", True, white)
+        title = render_text("P I N G", 108, white)
         self._surface.blit(title, (mid_pos[0] - title.get_size()[0]//2, 70))
 
-        font = pygame.font.Font(None, 28)
-        goal_label = font.render("Score Limit", True, white)
+        goal_label = render_text("Score Limit", 28, white)
         self._surface.blit(goal_label, (mid_pos[0] - 120, mid_pos[1] + 60))
 
+        # The scores shown are those of the mode chosen on the menu
+        self._high_score.set_mode(self.mode())
         self._high_score.draw()
 
         if self._game.infinite_mode:
-            font = pygame.font.Font(None, 28)
-            goal_label = font.render("infinite", True, white)
+            goal_label = render_text("infinite", 28, white)
             self._surface.blit(goal_label, (mid_pos[0] - 120, mid_pos[1] + 80))
         else:
-            font = pygame.font.Font(None, 36)
-            goal_label = font.render(str(self._game.goal_score), True, white)
+            goal_label = render_text(str(self._game.goal_score), 36, white)
             self._surface.blit(goal_label, (mid_pos[0]-80, mid_pos[1]+80))
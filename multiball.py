@@ -0,0 +1,174 @@
+"""
+A match played with many balls at once.
+
+The paddles and borders stay in the simulation's collision grid, but the
+balls are kept out of it: they all move on every tick, so they are found
+by a sweep and prune broadphase that is sorted again incrementally
+instead. Each ball scores on its own and is served again from the middle,
+without resetting the round.
+"""
+from __future__ import annotations
+import math
+import random
+from typing import List, Optional
+from collision import SweepAndPrune
+from simulation import BALL_SPEED, MAX_BALL_DY, BallState, Simulation
+
+# The number of balls in a multi-ball match by default
+MULTI_BALLS = 100
+# The radius of the balls in a multi-ball match
+MULTI_BALL_RADIUS = 8
+# The slowest a ball may move across the stage after hitting another one,
+# so that no ball ends up bouncing between the borders forever
+MIN_BALL_DX = BALL_SPEED / 2
+
+
+class MultiBallSimulation(Simulation):
+    """
+    A match with many balls, which bounce off the borders, the paddles and
+    each other.
+
+    === Public Attributes ===
+    balls:
+        Every ball of the match. The first one is also <ball>.
+    sweep:
+        The broadphase finding which balls may be touching
+    """
+    balls: List[BallState]
+    sweep: SweepAndPrune
+
+    def __init__(self, width: int, height: int, goal_score: int = 10,
+                 infinite_mode: bool = False,
+                 rng: Optional[random.Random] = None,
+                 count: int = MULTI_BALLS,
+                 radius: float = MULTI_BALL_RADIUS) -> None:
+        """
+        Initialize a match with <count> balls of <radius> on a
+        <width>x<height> stage.
+        """
+        super().__init__(width, height, goal_score, infinite_mode, rng)
+        self.world.remove(self.ball)
+        self.balls = [self.ball] + [BallState(0, 0)
+                                    for _ in range(count - 1)]
+        for ball in self.balls:
+            ball.radius = radius
+        self.sweep = SweepAndPrune(self.balls)
+        self._place_balls()
+
+    def _place_balls(self) -> None:
+        """
+        Line the balls up in a grid in the middle of the stage, standing
+        still.
+        """
+        radius = self.ball.radius
+        spacing = 2 * radius + 4
+        top, bottom = self.y_bound[0] + radius, self.y_bound[1] - radius
+        rows = max(1, int((bottom - top) // spacing) + 1)
+        columns = -(-len(self.balls) // rows)
+        left = self.width / 2 - (columns - 1) * spacing / 2
+        for i, ball in enumerate(self.balls):
+            column, row = divmod(i, rows)
+            ball.x = left + column * spacing
+            ball.y = min(top + row * spacing, bottom)
+            ball.dx = ball.dy = 0
+
+    def reset_round(self) -> None:
+        """
+        Put the paddles and the balls back in their starting positions and
+        wait for the next serve.
+        """
+        for paddle in self.paddles:
+            paddle.y = (self.height // 2) - 40
+            self.world.update(paddle)
+        self._place_balls()
+        self.waiting = True
+
+    def serve(self) -> None:
+        """
+        Start every ball moving in a random direction.
+        """
+        for ball in self.balls:
+            self._launch(ball)
+        self.waiting = False
+        self.rally = 0
+        self.serves += 1
+
+    def _launch(self, ball: BallState) -> None:
+        """
+        Start <ball> moving in a random direction.
+        """
+        ball.dy = self.new_direction(-MAX_BALL_DY, MAX_BALL_DY)[1]
+        ball.dx = self.rng.choice([-BALL_SPEED, BALL_SPEED])
+
+    def _respawn(self, ball: BallState) -> None:
+        """
+        Serve <ball> again from the middle of the stage after it scored.
+        """
+        r = ball.radius
+        ball.x = self.width / 2
+        ball.y = self.rng.randint(int(self.y_bound[0] + r),
+                                  int(self.y_bound[1] - r))
+        self._launch(ball)
+
+    def move_ball(self, dt: float) -> Optional[int]:
+        """
+        Move every ball for <dt> units of time and let them bounce off each
+        other. A ball that scores is served again from the middle.
+
+        Return the index of the player who scored last, or None if nobody
+        did. Scoring does not end the round.
+        """
+        scorer = None
+        paddles = self.paddles
+        for ball in self.balls:
+            scored = self.advance_ball(ball, dt)
+            if scored is not None:
+                paddles[scored].score += 1
+                scorer = scored
+                self._respawn(ball)
+        self.collide_balls()
+        return scorer
+
+    def collide_balls(self) -> int:
+        """
+        Push apart every two balls that overlap, and bounce them off each
+        other if they are moving closer. Return the number of bounces.
+
+        Balls have equal mass, so a bounce swaps the parts of their
+        velocities along the line between their centres.
+        """
+        upper = self.y_bound[0]
+        lower = self.y_bound[1]
+        bounces = 0
+        for a, b in self.sweep.update():
+            nx, ny = b.x - a.x, b.y - a.y
+            reach = a.radius + b.radius
+            distance2 = nx * nx + ny * ny
+            if distance2 >= reach * reach:
+                continue
+            distance = math.sqrt(distance2)
+            if distance == 0:
+                nx, ny = 1.0, 0.0
+            else:
+                nx, ny = nx / distance, ny / distance
+
+            # Move both balls half of the overlap apart, inside the borders
+            push = (reach - distance) / 2
+            a.x -= nx * push
+            b.x += nx * push
+            a.y = min(max(a.y - ny * push, upper + a.radius),
+                      lower - a.radius)
+            b.y = min(max(b.y + ny * push, upper + b.radius),
+                      lower - b.radius)
+
+            closing = (b.dx - a.dx) * nx + (b.dy - a.dy) * ny
+            if closing < 0:
+                a.dx += closing * nx
+                a.dy += closing * ny
+                b.dx -= closing * nx
+                b.dy -= closing * ny
+                for ball in (a, b):
+                    if abs(ball.dx) < MIN_BALL_DX:
+                        ball.dx = math.copysign(MIN_BALL_DX, ball.dx)
+                bounces += 1
+        return bounces
@@ -0,0 +1,885 @@
+"""
+Two-player matches over UDP.
+
+A NetServer hosts any number of matches on one event loop, and runs the
+authoritative Simulation of each of them on the same fixed tick.
+Each NetClient sends the direction its player holds on every tick, with a
+sequence number, and moves its own paddle straight away instead of waiting
+for the server. Every tick the server sends each client a snapshot of the
+match and the sequence number of the last input it applied for that
+client. The client then puts its paddle where the server says it is, and
+applies the inputs the server has not seen yet again on top.
+
+Snapshots are delta-encoded against the last one the client acknowledged
+in its inputs (see snapshot.py), so most of them are a few bytes long.
+
+Both sides can delay, jitter and drop the datagrams they send, to try
+networked play out with both ends on localhost.
+
+Players asking for the same goal score and mode are paired up in the same
+match. The server can report how long its ticks take and how late they
+start, to tell when its matches should be spread over more processes.
+
+Run it through main.py, for example:
+
+    python main.py serve --port 5290 --stats 10 --latency 50 --jitter 10
+    python main.py connect 127.0.0.1:5290 --goal 5 --latency 50 --jitter 10
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import random
+import struct
+import threading
+import time
+from array import array
+from collections import deque
+from typing import (Callable, Deque, Dict, List, NamedTuple, Optional,
+                    Sequence, Tuple)
+from simulation import STAY, UP, Simulation
+from snapshot import DeltaDecoder, DeltaEncoder, State, capture, restore
+
+PROTOCOL_VERSION = 3
+DEFAULT_PORT = 5290
+SCREEN_SIZE = (960, 500)
+# The number of ticks the server runs per second
+TICK_RATE = 60
+# The length in milliseconds of one unit of simulation time, as in the game
+MS_PER_UNIT = 30
+# How many of its latest inputs a client sends in every datagram, so that a
+# lost datagram does not lose an input
+INPUT_REDUNDANCY = 8
+# The most inputs the server keeps waiting for one player; older ones are
+# dropped so a client that got ahead does not lag behind forever
+MAX_INPUT_BACKLOG = 8
+# Seconds after which a silent player is dropped from the match
+PLAYER_TIMEOUT = 5.0
+# The most matches one server hosts by default
+MAX_MATCHES = 1000
+# How many ticks the server keeps the times of
+TICK_HISTORY = 600
+
+HELLO = b"H"
+WELCOME = b"W"
+FULL = b"F"
+INPUT = b"I"
+SNAPSHOT = b"S"
+BYE = b"B"
+
+_HELLO = struct.Struct("<HH?")
+_WELCOME = struct.Struct("<BHHHH?")
+# The tick of the newest snapshot received plus 1 (0 for none), the
+# sequence number of the first input and the number of inputs
+_INPUT = struct.Struct("<IIB")
+# The sequence number of the last input applied
+_SNAPSHOT = struct.Struct("<I")
+
+
+def encode_input(direction: int, serve: bool) -> int:
+    """
+    Return the byte standing for holding <direction> and, if <serve>,
+    asking for the ball to be served.
+    """
+    return (direction - UP) | (serve << 2)
+
+
+def decode_input(code: int) -> Tuple[int, bool]:
+    """
+    Return the direction and serve request stood for by <code>.
+    """
+    return (code & 3) + UP, bool(code & 4)
+
+
+class Snapshot(NamedTuple):
+    """
+    The state of a match after one server tick, as seen by one player.
+    """
+    tick: int
+    ack: int
+    state: State
+
+    @property
+    def waiting(self) -> bool:
+        return self.state.waiting
+
+    @property
+    def winner(self) -> Optional[int]:
+        return self.state.winner
+
+
+class LinkConditioner:
+    """
+    Sends datagrams late, out of order or not at all, like a real network
+    would.
+
+    === Public Attributes ===
+    latency:
+        The delay added to every datagram, in seconds
+    jitter:
+        The most a datagram's delay is randomly lengthened or shortened by,
+        in seconds
+    loss:
+        The chance of dropping a datagram, from 0 to 1
+    """
+    latency: float
+    jitter: float
+    loss: float
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0,
+                 loss: float = 0.0,
+                 rng: Optional[random.Random] = None) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self._rng = rng if rng is not None else random.Random()
+
+    def send(self, transport: asyncio.DatagramTransport, data: bytes,
+             addr: Optional[Tuple[str, int]] = None) -> None:
+        """
+        Send <data> to <addr> through <transport>, after the delay of this
+        link. Must be called from the thread running the transport's loop.
+        """
+        if self.loss and self._rng.random() < self.loss:
+            return
+        delay = self.latency
+        if self.jitter:
+            delay += self._rng.uniform(-self.jitter, self.jitter)
+        if delay <= 0:
+            transport.sendto(data, addr)
+        else:
+            asyncio.get_running_loop().call_later(delay, _send_if_open,
+                                                  transport, data, addr)
+
+
+def _send_if_open(transport: asyncio.DatagramTransport, data: bytes,
+                  addr: Optional[Tuple[str, int]]) -> None:
+    if not transport.is_closing():
+        transport.sendto(data, addr)
+
+
+class RemotePlayer:
+    """
+    A player connected to a NetServer.
+
+    === Public Attributes ===
+    addr:
+        The address the player's datagrams come from
+    index:
+        The player's paddle: 0 for the left, 1 for the right
+    last_seq:
+        The sequence number of the last input applied, or 0 for none
+    direction:
+        The direction the player last asked for
+    heard_at:
+        When the last datagram from the player arrived
+
+    encoder:
+        Encodes the snapshots sent to the player
+
+    === Private Attributes ===
+    _inputs:
+        The inputs received but not yet applied, by sequence number
+    """
+    addr: Tuple[str, int]
+    index: int
+    last_seq: int
+    direction: int
+    heard_at: float
+    encoder: DeltaEncoder
+    _inputs: Dict[int, int]
+
+    def __init__(self, addr: Tuple[str, int], index: int) -> None:
+        self.addr = addr
+        self.index = index
+        self.last_seq = 0
+        self.direction = STAY
+        self.heard_at = time.monotonic()
+        self.encoder = DeltaEncoder()
+        self._inputs = {}
+
+    def receive(self, first_seq: int, codes: bytes) -> None:
+        """
+        Keep the inputs numbered from <first_seq> in <codes> that have not
+        been applied yet.
+        """
+        self.heard_at = time.monotonic()
+        for seq, code in enumerate(codes, first_seq):
+            if seq > self.last_seq:
+                self._inputs[seq] = code
+        if len(self._inputs) > MAX_INPUT_BACKLOG:
+            for seq in sorted(self._inputs)[:-MAX_INPUT_BACKLOG]:
+                del self._inputs[seq]
+
+    def backlog(self) -> int:
+        """
+        Return the number of inputs received but not yet applied.
+        """
+        return len(self._inputs)
+
+    def next_input(self) -> Tuple[int, bool]:
+        """
+        Return the direction and serve request to apply on this tick: the
+        oldest input waiting, or the last direction again if none is.
+        """
+        if not self._inputs:
+            return self.direction, False
+        seq = min(self._inputs)
+        self.last_seq = seq
+        self.direction, serve = decode_input(self._inputs.pop(seq))
+        for old in [s for s in self._inputs if s < seq]:
+            del self._inputs[old]
+        return self.direction, serve
+
+
+class NetMatch:
+    """
+    One match played by two remote players, advanced by its server.
+
+    === Public Attributes ===
+    sim:
+        The authoritative simulation of the match
+    players:
+        The player on each side, or None while the side is free
+    tick:
+        The number of ticks run
+    state:
+        The state of the match after the last tick
+    """
+    sim: Simulation
+    players: List[Optional[RemotePlayer]]
+    tick: int
+    state: State
+
+    def __init__(self, goal_score: int = 10, infinite_mode: bool = False,
+                 size: Tuple[int, int] = SCREEN_SIZE,
+                 rng: Optional[random.Random] = None) -> None:
+        self.sim = Simulation(size[0], size[1], goal_score, infinite_mode,
+                              rng)
+        self.players = [None, None]
+        self.tick = 0
+        self.state = capture(self.sim)
+
+    def is_full(self) -> bool:
+        return None not in self.players
+
+    def is_empty(self) -> bool:
+        return self.players == [None, None]
+
+    def settings(self) -> Tuple[int, bool]:
+        """
+        Return the goal score and mode of this match.
+        """
+        return self.sim.goal_score, self.sim.infinite_mode
+
+    def add_player(self, addr: Tuple[str, int]) -> Optional[RemotePlayer]:
+        """
+        Seat the player at <addr> on a free side and return them, or return
+        None if the match is full. A new match starts when a side is taken.
+        """
+        for index, player in enumerate(self.players):
+            if player is None:
+                player = self.players[index] = RemotePlayer(addr, index)
+                self.sim.reset_match()
+                return player
+        return None
+
+    def remove_player(self, player: RemotePlayer) -> None:
+        """
+        Free the side of <player>, and stop the match until it is taken.
+        """
+        if self.players[player.index] is player:
+            self.players[player.index] = None
+            self.sim.reset_match()
+
+    def step(self, dt: float) -> None:
+        """
+        Run one tick of length <dt>, applying the next input of each player.
+        Nothing moves until both sides are taken.
+        """
+        self.tick += 1
+        if not self.is_full():
+            self.state = capture(self.sim)
+            return
+        inputs = []
+        serve = False
+        for player in self.players:
+            direction, wants_serve = player.next_input()
+            inputs.append(direction)
+            serve = serve or wants_serve
+        sim = self.sim
+        if serve and sim.waiting:
+            if sim.winner() is not None:
+                sim.reset_match()
+            sim.serve()
+        sim.step(inputs, dt)
+        self.state = capture(sim)
+
+    def snapshot_for(self, player: RemotePlayer) -> bytes:
+        """
+        Return the datagram telling <player> the state of the match.
+        """
+        return SNAPSHOT + _SNAPSHOT.pack(player.last_seq) + \
+            player.encoder.encode(self.tick, self.state)
+
+
+class TickMetrics:
+    """
+    Records how long the most recent server ticks took and how late they
+    started, in a ring buffer of fixed size, to tell when a server has more
+    matches than it can run on time.
+
+    === Public Attributes ===
+    capacity:
+        The number of ticks kept
+    ticks:
+        The number of ticks recorded so far, including overwritten ones
+    restarts:
+        The number of times the server fell so far behind that it gave up
+        on the ticks it missed
+
+    === Private Attributes ===
+    _durations:
+        How long each kept tick ran, in milliseconds
+    _lateness:
+        How long after its due time each kept tick started, in milliseconds
+    """
+    capacity: int
+    ticks: int
+    restarts: int
+    _durations: array
+    _lateness: array
+
+    def __init__(self, capacity: int = TICK_HISTORY) -> None:
+        self.capacity = capacity
+        self.ticks = 0
+        self.restarts = 0
+        self._durations = array('d', [0.0]) * capacity
+        self._lateness = array('d', [0.0]) * capacity
+
+    def __len__(self) -> int:
+        return min(self.ticks, self.capacity)
+
+    def record(self, duration: float, lateness: float) -> None:
+        """
+        Store a tick that ran for <duration> seconds, <lateness> seconds
+        after it was due.
+        """
+        index = self.ticks % self.capacity
+        self._durations[index] = duration * 1000
+        self._lateness[index] = max(0.0, lateness) * 1000
+        self.ticks += 1
+
+    def summary(self, period: float) -> Dict[str, float]:
+        """
+        Return the mean, p99 and longest tick time and lateness over the
+        kept ticks, in milliseconds, and the fraction of the tick <period>
+        the ticks took on average.
+        """
+        count = len(self)
+        durations = sorted(self._durations[:count])
+        lateness = sorted(self._lateness[:count])
+        if not count:
+            durations = lateness = [0.0]
+        mean = sum(durations) / len(durations)
+        return {"tick_mean_ms": mean,
+                "tick_p99_ms": _percentile(durations, 0.99),
+                "tick_max_ms": durations[-1],
+                "late_p99_ms": _percentile(lateness, 0.99),
+                "late_max_ms": lateness[-1],
+                "load": mean / (period * 1000),
+                "restarts": self.restarts}
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    return values[min(len(values) - 1,
+                      max(0, round(fraction * len(values)) - 1))]
+
+
+class NetServer(asyncio.DatagramProtocol):
+    """
+    Hosts any number of matches on one socket, pairing up the players who
+    ask for the same goal score and mode, and runs every match on the same
+    fixed tick, sending each player a snapshot after every tick.
+
+    === Public Attributes ===
+    goal_score:
+        The goal score of matches whose players did not ask for one
+    infinite_mode:
+        True if matches whose players did not ask for a goal score are
+        played in infinite mode
+    tick_rate:
+        The number of ticks per second
+    max_matches:
+        The most matches hosted at once; players who would need another
+        one are turned away
+    link:
+        Delays the datagrams sent to the clients
+    matches:
+        The matches being hosted
+    metrics:
+        The times of the latest ticks
+
+    === Private Attributes ===
+    _transport:
+        The socket the server listens on, once it is open
+    _players:
+        The match and player of every connected player, by address
+    _open:
+        The matches with a free side, by goal score and mode, oldest first
+    """
+    goal_score: int
+    infinite_mode: bool
+    tick_rate: int
+    max_matches: int
+    link: LinkConditioner
+    matches: List[NetMatch]
+    metrics: TickMetrics
+    _transport: Optional[asyncio.DatagramTransport]
+    _players: Dict[Tuple[str, int], Tuple[NetMatch, RemotePlayer]]
+    _open: Dict[Tuple[int, bool], List[NetMatch]]
+
+    def __init__(self, goal_score: int = 10, infinite_mode: bool = False,
+                 tick_rate: int = TICK_RATE, max_matches: int = MAX_MATCHES,
+                 link: Optional[LinkConditioner] = None) -> None:
+        self.goal_score = goal_score
+        self.infinite_mode = infinite_mode
+        self.tick_rate = tick_rate
+        self.max_matches = max_matches
+        self.link = link if link is not None else LinkConditioner()
+        self.matches = []
+        self.metrics = TickMetrics()
+        self._transport = None
+        self._players = {}
+        self._open = {}
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self._transport = transport
+
+    def datagram_received(self, data: bytes,
+                          addr: Tuple[str, int]) -> None:
+        kind = data[:1]
+        seat = self._players.get(addr)
+        if kind == INPUT and seat is not None:
+            if len(data) >= 1 + _INPUT.size:
+                snapshot, first_seq, count = _INPUT.unpack_from(data, 1)
+                if snapshot:
+                    seat[1].encoder.ack(snapshot - 1)
+                seat[1].receive(first_seq,
+                                data[1 + _INPUT.size:1 + _INPUT.size + count])
+        elif kind == HELLO:
+            if len(data) < 1 + _HELLO.size:
+                return
+            version, goal_score, infinite_mode = _HELLO.unpack_from(data, 1)
+            if version != PROTOCOL_VERSION:
+                return
+            if seat is None:
+                seat = self.join(addr, goal_score, infinite_mode)
+                if seat is None:
+                    self._send(FULL, addr)
+                    return
+            match, player = seat
+            sim = match.sim
+            self._send(WELCOME + _WELCOME.pack(
+                player.index, sim.width, sim.height, sim.goal_score,
+                self.tick_rate, sim.infinite_mode), addr)
+        elif kind == BYE and seat is not None:
+            self.leave(addr)
+
+    def _send(self, data: bytes, addr: Tuple[str, int]) -> None:
+        if self._transport is not None:
+            self.link.send(self._transport, data, addr)
+
+    def join(self, addr: Tuple[str, int], goal_score: int = 0,
+             infinite_mode: bool = False
+             ) -> Optional[Tuple[NetMatch, RemotePlayer]]:
+        """
+        Seat the player at <addr> in the oldest match waiting for a player
+        that is played to <goal_score>, or in infinite mode if
+        <infinite_mode>, starting a new match if there is none. A
+        <goal_score> of 0 in a match that is not in infinite mode asks for
+        the server's default settings.
+
+        Return the match and the seated player, or None if the server
+        already hosts as many matches as it may.
+        """
+        if infinite_mode:
+            # Infinite matches all pair up, whatever score they asked for
+            goal_score = self.goal_score
+        elif not goal_score:
+            goal_score, infinite_mode = self.goal_score, self.infinite_mode
+        key = (goal_score, infinite_mode)
+        waiting = self._open.setdefault(key, [])
+        if waiting:
+            match = waiting[0]
+        elif len(self.matches) < self.max_matches:
+            match = NetMatch(goal_score, infinite_mode)
+            self.matches.append(match)
+            waiting.append(match)
+        else:
+            return None
+        player = match.add_player(addr)
+        if match.is_full():
+            waiting.remove(match)
+        self._players[addr] = (match, player)
+        return match, player
+
+    def leave(self, addr: Tuple[str, int]) -> None:
+        """
+        Take the player at <addr> out of their match, closing the match if
+        nobody is left in it, or letting somebody else take their side.
+        """
+        match, player = self._players.pop(addr)
+        waiting = self._open.setdefault(match.settings(), [])
+        match.remove_player(player)
+        if match.is_empty():
+            self.matches.remove(match)
+            if match in waiting:
+                waiting.remove(match)
+        elif match not in waiting:
+            waiting.append(match)
+
+    def player_count(self) -> int:
+        return len(self._players)
+
+    def backlog(self) -> int:
+        """
+        Return the number of inputs received from all players that have
+        not been applied yet.
+        """
+        return sum(player.backlog() for _, player in self._players.values())
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Return the number of matches and players, the input backlog and
+        the tick metrics of this server.
+        """
+        stats = {"matches": len(self.matches),
+                 "players": self.player_count(),
+                 "backlog": self.backlog()}
+        stats.update(self.metrics.summary(1 / self.tick_rate))
+        return stats
+
+    def get_tick_dt(self) -> float:
+        """
+        Return the length of one tick in units of simulation time.
+        """
+        return 1000 / self.tick_rate / MS_PER_UNIT
+
+    def tick(self) -> None:
+        """
+        Run one tick of every match and send each player a snapshot. Once
+        a second, drop the players who have not been heard from for
+        PLAYER_TIMEOUT seconds.
+        """
+        if self.metrics.ticks % self.tick_rate == 0:
+            now = time.monotonic()
+            for addr, (_, player) in list(self._players.items()):
+                if now - player.heard_at > PLAYER_TIMEOUT:
+                    self.leave(addr)
+        dt = self.get_tick_dt()
+        for match in self.matches:
+            match.step(dt)
+        send = self._send
+        for match, player in self._players.values():
+            send(match.snapshot_for(player), player.addr)
+
+    async def serve(self, host: str = "0.0.0.0", port: int = DEFAULT_PORT,
+                    ticks: Optional[int] = None,
+                    report: Optional[Callable[[Dict[str, float]], None]]
+                    = None, report_every: float = 10.0) -> None:
+        """
+        Listen on <host>:<port> and run ticks on schedule, forever or for
+        <ticks> ticks, passing the stats of the server to <report> every
+        <report_every> seconds if it is given.
+        """
+        loop = asyncio.get_running_loop()
+        await loop.create_datagram_endpoint(lambda: self,
+                                            local_addr=(host, port))
+        every = max(1, round(report_every * self.tick_rate))
+
+        def tick() -> None:
+            self.tick()
+            if report is not None and self.metrics.ticks % every == every - 1:
+                report(self.stats())
+        try:
+            await run_ticks(tick, self.tick_rate, ticks, self.metrics)
+        finally:
+            self._transport.close()
+
+
+async def run_ticks(tick: Callable[[], None], tick_rate: int,
+                    ticks: Optional[int] = None,
+                    metrics: Optional[TickMetrics] = None) -> None:
+    """
+    Call <tick> <tick_rate> times per second, forever or <ticks> times,
+    recording how long each call took and how late it started in <metrics>
+    if it is given. Ticks are scheduled from the start, so time spent in
+    <tick> does not slow the rate down; after a long stall the schedule
+    starts over rather than running every missed tick at once.
+    """
+    loop = asyncio.get_running_loop()
+    clock = loop.time
+    period = 1 / tick_rate
+    deadline = clock()
+    count = 0
+    while ticks is None or count < ticks:
+        start = clock()
+        tick()
+        if metrics is not None:
+            metrics.record(clock() - start, start - deadline)
+        count += 1
+        deadline += period
+        delay = deadline - clock()
+        if delay < -5 * period:
+            deadline = clock()
+            delay = 0
+            if metrics is not None:
+                metrics.restarts += 1
+        await asyncio.sleep(max(0.0, delay))
+
+
+class NetClient(asyncio.DatagramProtocol):
+    """
+    One player's connection to a NetServer, running its own event loop on a
+    background thread so the game can keep drawing on the main thread.
+
+    === Public Attributes ===
+    index:
+        The player's paddle, once the server has answered
+    width, height, goal_score, tick_rate, infinite_mode:
+        The settings of the match, once the server has answered
+    link:
+        Delays the datagrams sent to the server
+
+    === Private Attributes ===
+    _pending:
+        The (sequence number, input) of every input sent that the server
+        has not applied yet, oldest first
+    _next_seq:
+        The sequence number of the next input
+    _snapshot:
+        The newest snapshot received and not yet taken
+    _newest_tick:
+        The tick of the newest snapshot received
+    _decoder:
+        Decodes the snapshots received, on the network thread only
+    _lock:
+        Guards the attributes above, which both threads use
+    _welcomed:
+        Set once the server has answered
+    """
+    index: Optional[int]
+    width: int
+    height: int
+    goal_score: int
+    tick_rate: int
+    infinite_mode: bool
+    link: LinkConditioner
+    _pending: Deque[Tuple[int, int]]
+    _next_seq: int
+    _snapshot: Optional[Snapshot]
+    _newest_tick: int
+    _decoder: DeltaDecoder
+
+    def __init__(self, link: Optional[LinkConditioner] = None) -> None:
+        self.index = None
+        self.link = link if link is not None else LinkConditioner()
+        self.refused = False
+        self._pending = deque()
+        self._next_seq = 1
+        self._snapshot = None
+        self._newest_tick = -1
+        self._decoder = DeltaDecoder()
+        self._lock = threading.Lock()
+        self._welcomed = threading.Event()
+        self._loop = None
+        self._transport = None
+        self._thread = None
+
+    def connect(self, host: str, port: int = DEFAULT_PORT,
+                timeout: float = 5.0, goal_score: int = 0,
+                infinite_mode: bool = False) -> bool:
+        """
+        Start the network thread and join a match on the server at
+        <host>:<port>, played in infinite mode if <infinite_mode> or else
+        to <goal_score>, where 0 takes the server's default settings.
+        Return True once the server has seated this player, or False if it
+        did not within <timeout> seconds or the server was full.
+        """
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever,
+                                        daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(
+            self._open(host, port), self._loop).result(timeout)
+        deadline = time.monotonic() + timeout
+        while not self._welcomed.is_set() and not self.refused \
+                and time.monotonic() < deadline:
+            self._call(self._send, HELLO + _HELLO.pack(
+                PROTOCOL_VERSION, goal_score, infinite_mode))
+            self._welcomed.wait(0.25)
+        return self._welcomed.is_set()
+
+    async def _open(self, host: str, port: int) -> None:
+        await asyncio.get_running_loop().create_datagram_endpoint(
+            lambda: self, remote_addr=(host, port))
+
+    def close(self) -> None:
+        """
+        Leave the match and stop the network thread.
+        """
+        if self._loop is None:
+            return
+        if self._transport is not None:
+            self._call(self._transport.sendto, BYE)
+            self._call(self._transport.close)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(1.0)
+        self._loop = None
+
+    def _call(self, function: Callable, *args) -> None:
+        self._loop.call_soon_threadsafe(function, *args)
+
+    def _send(self, data: bytes) -> None:
+        if self._transport is not None and not self._transport.is_closing():
+            self.link.send(self._transport, data)
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self._transport = transport
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        kind = data[:1]
+        if kind == SNAPSHOT and len(data) >= 1 + _SNAPSHOT.size:
+            ack, = _SNAPSHOT.unpack_from(data, 1)
+            try:
+                tick, state = self._decoder.decode(data[1 + _SNAPSHOT.size:])
+            except ValueError:
+                return
+            snapshot = Snapshot(tick, ack, state)
+            with self._lock:
+                # Datagrams can arrive out of order; keep the newest
+                if snapshot.tick >= self._newest_tick:
+                    self._newest_tick = snapshot.tick
+                    self._snapshot = snapshot
+                    while self._pending and \
+                            self._pending[0][0] <= snapshot.ack:
+                        self._pending.popleft()
+        elif kind == WELCOME and len(data) >= 1 + _WELCOME.size:
+            (self.index, self.width, self.height, self.goal_score,
+             self.tick_rate, self.infinite_mode) = _WELCOME.unpack_from(data, 1)
+            self._welcomed.set()
+        elif kind == FULL:
+            self.refused = True
+
+    def send_input(self, direction: int, serve: bool = False) -> None:
+        """
+        Send the input of this tick: holding <direction>, and asking for
+        the ball to be served if <serve>.
+        """
+        with self._lock:
+            self._pending.append((self._next_seq, encode_input(direction,
+                                                               serve)))
+            self._next_seq += 1
+            recent = list(self._pending)[-INPUT_REDUNDANCY:]
+        self._call(self._send_inputs, recent[0][0],
+                   bytes(code for _, code in recent))
+
+    def _send_inputs(self, first_seq: int, codes: bytes) -> None:
+        """
+        Send the inputs <codes> numbered from <first_seq>, and acknowledge
+        the newest snapshot received.
+        """
+        newest = self._decoder.newest
+        self._send(INPUT + _INPUT.pack(0 if newest is None else newest + 1,
+                                       first_seq, len(codes)) + codes)
+
+    def take_snapshot(self) -> Optional[Snapshot]:
+        """
+        Return the newest snapshot that has not been taken yet, or None.
+        """
+        with self._lock:
+            snapshot, self._snapshot = self._snapshot, None
+        return snapshot
+
+    def unacknowledged(self) -> List[int]:
+        """
+        Return the directions of the inputs sent that the server had not
+        applied as of the newest snapshot, oldest first.
+        """
+        with self._lock:
+            return [decode_input(code)[0] for _, code in self._pending]
+
+
+def predict(sim: Simulation, index: int, snapshot: Snapshot,
+            directions: Sequence[int], dt: float) -> None:
+    """
+    Put <sim> as it is in <snapshot>, then move paddle <index> again by
+    each of the <directions> the server has not applied yet.
+    """
+    restore(sim, snapshot.state)
+    if sim.waiting:
+        return
+    paddle = sim.paddles[index]
+    for direction in directions:
+        sim.move_paddle(paddle, direction, dt)
+
+
+def link_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    Add the options that make a link slower or lossier to <parser>.
+    """
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="delay added to every datagram sent, in ms")
+    parser.add_argument("--jitter", type=float, default=0.0,
+                        help="random variation of the delay, in ms")
+    parser.add_argument("--loss", type=float, default=0.0,
+                        help="fraction of datagrams dropped, from 0 to 1")
+
+
+def make_link(args: argparse.Namespace) -> LinkConditioner:
+    return LinkConditioner(args.latency / 1000, args.jitter / 1000,
+                           args.loss)
+
+
+def print_stats(stats: Dict[str, float]) -> None:
+    """
+    Print one line of server <stats>.
+    """
+    print("{matches} matches, {players} players, backlog {backlog}; "
+          "tick mean {tick_mean_ms:.2f} ms, p99 {tick_p99_ms:.2f} ms, "
+          "max {tick_max_ms:.2f} ms; late p99 {late_p99_ms:.2f} ms; "
+          "load {load:.0%}; {restarts} restarts".format(**stats),
+          flush=True)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Run a match server from the command line.
+    """
+    parser = argparse.ArgumentParser(
+        prog="main.py serve",
+        description="Host two-player matches over UDP.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--goal", type=int, default=10,
+                        help="score that wins a match, unless the players "
+                             "ask for another one")
+    parser.add_argument("--infinite", action="store_true",
+                        help="play in infinite mode unless the players ask "
+                             "for a goal score")
+    parser.add_argument("--tick-rate", type=int, default=TICK_RATE)
+    parser.add_argument("--max-matches", type=int, default=MAX_MATCHES)
+    parser.add_argument("--stats", type=float, default=0, metavar="SECONDS",
+                        help="print the tick times and backlog this often")
+    link_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server = NetServer(args.goal, args.infinite, args.tick_rate,
+                       args.max_matches, make_link(args))
+    print("Serving on {}:{}".format(args.host, args.port))
+    try:
+        asyncio.run(server.serve(args.host, args.port,
+                                 report=print_stats if args.stats else None,
+                                 report_every=args.stats))
+    except KeyboardInterrupt:
+        pass
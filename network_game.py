@@ -0,0 +1,155 @@
+"""
+The game window of a player in a match hosted by a NetServer.
+
+The server runs the match; the window only draws it and sends the keys
+the player holds. The player's own paddle moves as soon as a key is
+pressed, and the ball keeps moving between the server's snapshots, so
+neither waits a round trip to the server.
+
+Run it through main.py, for example:
+
+    python main.py connect 127.0.0.1:5290 --latency 50 --jitter 10
+"""
+from __future__ import annotations
+import argparse
+from typing import List, Optional
+import pygame
+from controls import SERVE, SOLO_KEYS, KeyboardSource, allow_events, direction
+from game import Game
+from lifecycle import MENU, PLAYING
+from network import (DEFAULT_PORT, NetClient, Snapshot, link_arguments,
+                     make_link, predict)
+
+
+class NetworkGame(Game):
+    """
+    A game whose match is played on a server, by one player at each end.
+
+    === Public Attributes ===
+    client:
+        The connection to the server, already connected
+    snapshot:
+        The newest state of the match received from the server, or None
+        before the first one arrives
+
+    Its only source is the player at this end, whichever paddle they play.
+    """
+    client: NetClient
+    snapshot: Optional[Snapshot]
+
+    def __init__(self, client: NetClient) -> None:
+        """
+        Initialize a game showing the match <client> has joined.
+        """
+        super().__init__((client.width, client.height), client.goal_score)
+        self.client = client
+        self.snapshot = None
+        self.infinite_mode = client.infinite_mode
+        self.tick_rate = client.tick_rate
+        self.record_replays = False
+        self.sources = [KeyboardSource(SOLO_KEYS)]
+
+    def on_init(self) -> None:
+        """
+        Initialize this game, playing from the start: the server decides
+        when the ball is served and which messages are shown.
+        """
+        super().on_init()
+        self.lifecycle.go(PLAYING)
+        self.game_over_message2.set_text("Press SPACE to play again")
+        pygame.display.set_caption(
+            "PING - Player {} online".format(self.client.index + 1))
+
+    def is_idle(self) -> bool:
+        """
+        Return False: the match goes on at the server whatever the keys.
+        """
+        return False
+
+    def record_score(self) -> None:
+        """
+        Do nothing: online matches are not recorded on the leaderboard.
+        """
+
+    def load_state(self, path: str = "") -> bool:
+        """
+        Return False: the server, not this window, decides the state of an
+        online match.
+        """
+        return False
+
+    def return_to_menu(self) -> None:
+        """
+        Leave the match and close the window.
+        """
+        self.lifecycle.go(MENU)
+        self.client.close()
+
+    def update(self, dt: float) -> None:
+        """
+        Send the server the actions of the player during this tick of
+        length <dt>, and show the match as the newest snapshot has it, with
+        this player's inputs the server has not applied yet moved on top.
+        """
+        actions = self.sources[0].actions(self, self.client.index)
+        self.ticks += 1
+        move = direction(actions)
+        self.client.send_input(move, bool(actions & SERVE))
+
+        sim = self.sim
+        snapshot = self.client.take_snapshot()
+        if snapshot is not None:
+            self.snapshot = snapshot
+            predict(sim, self.client.index, snapshot,
+                    self.client.unacknowledged(), dt)
+            self.show_state(snapshot)
+        elif self.snapshot is not None and not sim.waiting:
+            # No news from the server this tick: carry on as it would
+            sim.move_paddle(sim.paddles[self.client.index], move, dt)
+            sim.advance_ball(sim.ball, dt)
+
+    def show_state(self, snapshot: Snapshot) -> None:
+        """
+        Show the messages for the state of the match in <snapshot>.
+        """
+        winner = snapshot.winner
+        over = winner is not None
+        if over:
+            self.winner = "Player " + str(winner + 1)
+            self.game_over_message.set_text(self.winner + " won!")
+        self.game_over_message.set_drawn(over)
+        self.game_over_message2.set_drawn(over)
+        self.start_message.set_drawn(snapshot.waiting and not over)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Join a match from the command line and play it in a window.
+    """
+    parser = argparse.ArgumentParser(
+        prog="main.py connect",
+        description="Play a match hosted with 'main.py serve'.")
+    parser.add_argument("address", metavar="HOST[:PORT]")
+    parser.add_argument("--goal", type=int, default=0,
+                        help="ask for a match to this score")
+    parser.add_argument("--infinite", action="store_true",
+                        help="ask for a match in infinite mode")
+    link_arguments(parser)
+    args = parser.parse_args(argv)
+
+    host, _, port = args.address.partition(":")
+    client = NetClient(make_link(args))
+    if not client.connect(host, int(port) if port else DEFAULT_PORT,
+                          goal_score=args.goal,
+                          infinite_mode=args.infinite):
+        client.close()
+        print("The server is full." if client.refused
+              else "No answer from " + args.address)
+        return
+
+    pygame.init()
+    allow_events()
+    game = NetworkGame(client)
+    game.on_execute()
+    client.close()
+    pygame.quit()
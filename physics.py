@@ -0,0 +1,138 @@
+"""
+Continuous collision helpers used to move the ball without tunnelling
+through the paddles, whatever the length of the time step.
+"""
+from __future__ import annotations
+import math
+from typing import NamedTuple, Optional
+
+
+class Impact(NamedTuple):
+    """
+    The first contact of a moving circle with a rectangle.
+
+    t:
+        The fraction of the step (between 0 and 1) at which contact happens
+    x, y:
+        The contact point on the surface of the rectangle
+    nx, ny:
+        The outward normal of the rectangle at the contact point
+    """
+    t: float
+    x: float
+    y: float
+    nx: float
+    ny: float
+
+
+def ray_circle(px: float, py: float, vx: float, vy: float,
+               cx: float, cy: float, r: float) -> Optional[float]:
+    """
+    Return the earliest fraction t in [0, 1] at which the point
+    <px>, <py> moving by <vx>, <vy> reaches distance <r> from <cx>, <cy>.
+    Return None if that never happens during the step.
+    """
+    fx, fy = px - cx, py - cy
+    a = vx * vx + vy * vy
+    if a == 0:
+        return None
+    b = fx * vx + fy * vy
+    c = fx * fx + fy * fy - r * r
+    disc = b * b - a * c
+    if disc < 0:
+        return None
+    t = (-b - math.sqrt(disc)) / a
+    if 0 <= t <= 1:
+        return t
+    return None
+
+
+def swept_circle_aabb(px: float, py: float, vx: float, vy: float, r: float,
+                      left: float, top: float, right: float,
+                      bottom: float) -> Optional[Impact]:
+    """
+    Sweep a circle of radius <r> centred at <px>, <py> by the displacement
+    <vx>, <vy> against the rectangle <left>, <top>, <right>, <bottom>.
+
+    Return the Impact of the first contact during the step, or None if the
+    circle does not touch the rectangle. A circle that already overlaps the
+    rectangle and is moving towards its centre collides at t = 0.
+
+    The circle hits the rectangle exactly when its centre enters the
+    rectangle grown by <r> with rounded corners, so the test is a ray cast
+    against the grown rectangle followed, in the corner regions, by a ray
+    cast against the corner circle.
+    """
+    # Already overlapping: only collide if still moving inwards.
+    near_x = min(max(px, left), right)
+    near_y = min(max(py, top), bottom)
+    dist_x, dist_y = px - near_x, py - near_y
+    if dist_x * dist_x + dist_y * dist_y < r * r:
+        mid_x, mid_y = (left + right) / 2, (top + bottom) / 2
+        if vx * (mid_x - px) + vy * (mid_y - py) <= 0:
+            return None
+        if dist_x or dist_y:
+            length = math.hypot(dist_x, dist_y)
+            return Impact(0.0, near_x, near_y, dist_x / length,
+                          dist_y / length)
+        return Impact(0.0, near_x, near_y, -1.0 if vx > 0 else 1.0, 0.0)
+
+    # Slab test against the rectangle grown by r on every side.
+    t_enter, t_exit = -math.inf, math.inf
+    nx = ny = 0.0
+    for p, v, lo, hi, axis in ((px, vx, left - r, right + r, 0),
+                               (py, vy, top - r, bottom + r, 1)):
+        if v == 0:
+            if p < lo or p > hi:
+                return None
+            continue
+        t1, t2 = (lo - p) / v, (hi - p) / v
+        normal = -1.0
+        if t1 > t2:
+            t1, t2 = t2, t1
+            normal = 1.0
+        if t1 > t_enter:
+            t_enter = t1
+            nx, ny = (normal, 0.0) if axis == 0 else (0.0, normal)
+        t_exit = min(t_exit, t2)
+    if t_enter > t_exit or t_enter > 1 or t_exit < 0:
+        return None
+    if t_enter >= 0:
+        if nx * vx + ny * vy >= 0:
+            # Resting on a face and moving away from it.
+            return None
+        hit_x, hit_y = px + vx * t_enter, py + vy * t_enter
+        in_x = left <= hit_x <= right
+        in_y = top <= hit_y <= bottom
+        if in_x or in_y:
+            # Face region: the grown rectangle is the exact shape here.
+            return Impact(t_enter, min(max(hit_x, left), right),
+                          min(max(hit_y, top), bottom), nx, ny)
+    else:
+        # The centre starts inside the grown rectangle without touching
+        # the rectangle, so it is in a corner region, outside the rounded
+        # corner: it may still reach the corner circle during the step.
+        hit_x, hit_y = px, py
+
+    # Corner region: test against the circle around the nearest corner.
+    corner_x = left if hit_x < left else right
+    corner_y = top if hit_y < top else bottom
+    t = ray_circle(px, py, vx, vy, corner_x, corner_y, r)
+    if t is None:
+        return None
+    centre_x, centre_y = px + vx * t, py + vy * t
+    return Impact(t, corner_x, corner_y, (centre_x - corner_x) / r,
+                  (centre_y - corner_y) / r)
+
+
+def time_to_line(p: float, v: float, line: float) -> Optional[float]:
+    """
+    Return the fraction t in [0, 1] at which the coordinate <p> moving by
+    <v> reaches <line>, or None if it does not reach it during the step.
+    """
+    if v == 0:
+        return None
+    t = (line - p) / v
+    if 0 <= t <= 1:
+        return t
+    return None
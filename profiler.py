@@ -0,0 +1,214 @@
+"""
+Times each phase of the game's frames, to find out which one makes a
+frame late, and each phase of starting the game.
+"""
+from __future__ import annotations
+import csv
+import time
+from array import array
+from typing import Callable, Dict, List, Optional, Tuple
+
+# The phases of a frame, in the order they run
+PHASES = ("wait", "input", "physics", "scoreboard", "draw", "display")
+# The columns kept for each frame: its whole length, then each phase
+COLUMNS = ("frame",) + PHASES
+# How many frames are kept by default
+FRAME_HISTORY = 600
+
+
+class FrameProfiler:
+    """
+    Records how long each phase of the most recent frames took, in
+    milliseconds, in a ring buffer of fixed size.
+
+    A frame starts with begin_frame(). Each call to lap() adds the time
+    since the previous call to the phase it names, and end_frame() stores
+    the frame, overwriting the oldest one once the buffer is full.
+
+    === Public Attributes ===
+    capacity:
+        The number of frames kept
+    frames:
+        The number of frames recorded so far, including overwritten ones
+
+    === Private Attributes ===
+    _data:
+        The timings of the kept frames, one row of COLUMNS per frame
+    _current:
+        The timings of the frame being recorded
+    _frame_start:
+        When the frame being recorded started, or None between frames
+    _last_lap:
+        When the last phase of the frame being recorded ended
+    _clock:
+        Returns the current time in seconds
+    """
+    capacity: int
+    frames: int
+    _data: array
+    _current: List[float]
+    _frame_start: Optional[float]
+    _last_lap: float
+    _clock: Callable[[], float]
+
+    def __init__(self, capacity: int = FRAME_HISTORY,
+                 clock: Callable[[], float] = time.perf_counter) -> None:
+        self.capacity = capacity
+        self.frames = 0
+        self._data = array('d', [0.0]) * (capacity * len(COLUMNS))
+        self._current = [0.0] * len(COLUMNS)
+        self._frame_start = None
+        self._last_lap = 0.0
+        self._clock = clock
+
+    def __len__(self) -> int:
+        """
+        Return the number of frames kept.
+        """
+        return min(self.frames, self.capacity)
+
+    def begin_frame(self) -> None:
+        """
+        Start recording a frame.
+        """
+        self._frame_start = self._last_lap = self._clock()
+        for i in range(len(self._current)):
+            self._current[i] = 0.0
+
+    def lap(self, phase: str) -> None:
+        """
+        Add the time since the last lap, or since the frame began, to
+        <phase>. Does nothing between frames.
+        """
+        if self._frame_start is None:
+            return
+        now = self._clock()
+        self._current[COLUMNS.index(phase)] += (now - self._last_lap) * 1000
+        self._last_lap = now
+
+    def end_frame(self) -> None:
+        """
+        Store the frame being recorded.
+        """
+        if self._frame_start is None:
+            return
+        self._current[0] = (self._clock() - self._frame_start) * 1000
+        self._frame_start = None
+        width = len(COLUMNS)
+        start = (self.frames % self.capacity) * width
+        self._data[start:start + width] = array('d', self._current)
+        self.frames += 1
+
+    def column(self, name: str) -> List[float]:
+        """
+        Return the timings of column <name> of the kept frames, oldest
+        first.
+        """
+        width = len(COLUMNS)
+        index = COLUMNS.index(name)
+        first = self.frames - len(self)
+        return [self._data[((first + i) % self.capacity) * width + index]
+                for i in range(len(self))]
+
+    def percentile(self, name: str, fraction: float) -> float:
+        """
+        Return the time of column <name> that <fraction> of the kept frames
+        did not go over.
+        """
+        values = sorted(self.column(name))
+        if not values:
+            return 0.0
+        return values[min(len(values) - 1,
+                          max(0, round(fraction * len(values)) - 1))]
+
+    def summary(self) -> Dict[str, float]:
+        """
+        Return the frame rate, the p50 and p99 frame times and the mean time
+        of each phase over the kept frames.
+        """
+        count = len(self)
+        frames = self.column("frame")
+        total = sum(frames)
+        summary = {"fps": count / total * 1000 if total else 0.0,
+                   "p50": self.percentile("frame", 0.5),
+                   "p99": self.percentile("frame", 0.99)}
+        for phase in PHASES:
+            summary[phase] = sum(self.column(phase)) / count if count else 0.0
+        return summary
+
+    def dump_csv(self, path: str) -> None:
+        """
+        Write the kept frames to the CSV file <path>, oldest first, with
+        one column of milliseconds per phase.
+        """
+        columns = [self.column(name) for name in COLUMNS]
+        with open(path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(COLUMNS)
+            for row in zip(*columns):
+                writer.writerow(["{:.3f}".format(value) for value in row])
+
+
+class StartupTimer:
+    """
+    Records how long each phase of starting the game took, in
+    milliseconds, from when the program started to the first frame of the
+    menu.
+
+    Each call to lap() ends the phase it names, which began when the
+    previous one ended.
+
+    === Public Attributes ===
+    phases:
+        The name and length of each phase ended so far, in order
+
+    === Private Attributes ===
+    _started:
+        When the first phase began
+    _last_lap:
+        When the last phase ended
+    _clock:
+        Returns the current time in seconds
+    """
+    phases: List[Tuple[str, float]]
+    _started: float
+    _last_lap: float
+    _clock: Callable[[], float]
+
+    def __init__(self, started: Optional[float] = None,
+                 clock: Callable[[], float] = time.perf_counter) -> None:
+        """
+        Initialize a timer whose first phase began at <started>, as told by
+        <clock>, or now if it is not given.
+        """
+        self._clock = clock
+        self._started = self._last_lap = \
+            clock() if started is None else started
+        self.phases = []
+
+    def lap(self, phase: str) -> None:
+        """
+        End <phase>, which began when the last phase ended.
+        """
+        now = self._clock()
+        self.phases.append((phase, (now - self._last_lap) * 1000))
+        self._last_lap = now
+
+    def total(self) -> float:
+        """
+        Return the time from the start to the end of the last phase.
+        """
+        return (self._last_lap - self._started) * 1000
+
+    def report(self) -> str:
+        """
+        Return a table of the phases, their lengths and their share of the
+        total.
+        """
+        total = self.total()
+        lines = ["{:<14}{:>10}{:>8}".format("phase", "ms", "share")]
+        for phase, ms in self.phases:
+            lines.append("{:<14}{:>10.1f}{:>7.0f}%".format(
+                phase, ms, ms / total * 100 if total else 0.0))
+        lines.append("{:<14}{:>10.1f}".format("total", total))
+        return "\n".join(lines)
@@ -0,0 +1,439 @@
+"""
+Record matches as compact binary replays, and play them back.
+
+A Simulation is deterministic given the paddle directions of every tick
+and the random numbers it draws for serves and bounces, so that is all a
+replay stores: one byte per tick for the two paddle directions and one
+byte per random draw. Ticks spent waiting for a serve do not move
+anything and are not stored; a replay serves the ball whenever it reaches
+a stored tick while waiting.
+
+A replay file is a fixed header followed by the zlib-compressed tick and
+draw buffers:
+
+    magic, version, width, height, goal score, infinite mode, tick length,
+    number of ticks, number of draws
+
+Run it through main.py to watch a replay, for example:
+
+    python main.py replay replays/match.pingreplay --speed 4
+"""
+from __future__ import annotations
+import argparse
+import os
+import random
+import struct
+import zlib
+from array import array
+from typing import Any, List, Optional, Sequence, Tuple
+from simulation import UP, Simulation
+
+MAGIC = b"PING"
+VERSION = 1
+_HEADER = struct.Struct("<4sHHHH?dII")
+# The file extension of replays
+EXTENSION = ".pingreplay"
+# How many ticks apart the player keeps snapshots to seek back to
+KEYFRAME_INTERVAL = 600
+# How many replays are kept in a directory by default; older ones are
+# deleted as new ones are saved
+KEEP_REPLAYS = 100
+
+
+def encode_inputs(inputs: Sequence[int]) -> int:
+    """
+    Return the byte standing for the two paddle directions in <inputs>.
+    """
+    return (inputs[0] - UP) * 3 + (inputs[1] - UP)
+
+
+def decode_inputs(code: int) -> Tuple[int, int]:
+    """
+    Return the two paddle directions stood for by <code>.
+    """
+    return code // 3 + UP, code % 3 + UP
+
+
+class Replay:
+    """
+    The recorded inputs and random draws of one match.
+
+    === Public Attributes ===
+    width, height:
+        The size of the stage the match was played on
+    goal_score:
+        The score that wins the match
+    infinite_mode:
+        True if the match was played in infinite mode
+    dt:
+        The length of one tick in units of simulation time
+    inputs:
+        The encoded paddle directions of every tick the ball moved
+    draws:
+        Every random number drawn by the simulation, in order
+    """
+    width: int
+    height: int
+    goal_score: int
+    infinite_mode: bool
+    dt: float
+    inputs: array
+    draws: array
+
+    def __init__(self, width: int, height: int, goal_score: int,
+                 infinite_mode: bool, dt: float,
+                 inputs: Optional[array] = None,
+                 draws: Optional[array] = None) -> None:
+        self.width, self.height = width, height
+        self.goal_score = goal_score
+        self.infinite_mode = infinite_mode
+        self.dt = dt
+        self.inputs = inputs if inputs is not None else array('B')
+        self.draws = draws if draws is not None else array('B')
+
+    def __len__(self) -> int:
+        """
+        Return the number of ticks in this replay.
+        """
+        return len(self.inputs)
+
+    def to_bytes(self) -> bytes:
+        """
+        Return this replay in the replay file format.
+        """
+        header = _HEADER.pack(MAGIC, VERSION, self.width, self.height,
+                              self.goal_score, self.infinite_mode, self.dt,
+                              len(self.inputs), len(self.draws))
+        return header + zlib.compress(self.inputs.tobytes() +
+                                      self.draws.tobytes(), 9)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> Replay:
+        """
+        Return the replay stored in <data>.
+        """
+        if len(data) < _HEADER.size:
+            raise ValueError("not a replay: too short")
+        (magic, version, width, height, goal_score, infinite_mode, dt,
+         ticks, draws) = _HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("not a replay")
+        if version != VERSION:
+            raise ValueError("unsupported replay version " + str(version))
+        try:
+            body = zlib.decompress(data[_HEADER.size:])
+        except zlib.error:
+            raise ValueError("replay is corrupt") from None
+        if len(body) != ticks + draws:
+            raise ValueError("replay is truncated")
+        return cls(width, height, goal_score, infinite_mode, dt,
+                   array('B', body[:ticks]), array('B', body[ticks:]))
+
+    def save(self, path: str) -> None:
+        """
+        Write this replay to the file <path>.
+        """
+        with open(path, 'wb') as file:
+            file.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path: str) -> Replay:
+        """
+        Return the replay stored in the file <path>.
+        """
+        with open(path, 'rb') as file:
+            return cls.from_bytes(file.read())
+
+    def random(self) -> _ReplayRandom:
+        """
+        Return a random source for a Simulation that gives back the random
+        numbers drawn in this replay, in order.
+        """
+        return _ReplayRandom(self.draws)
+
+
+def prune_replays(directory: str, keep: int = KEEP_REPLAYS) -> List[str]:
+    """
+    Delete all but the newest <keep> replays in <directory>, and return the
+    files deleted.
+    """
+    paths = [os.path.join(directory, name) for name in os.listdir(directory)
+             if name.endswith(EXTENSION)]
+    paths.sort(key=os.path.getmtime, reverse=True)
+    for path in paths[keep:]:
+        os.remove(path)
+    return paths[keep:]
+
+
+class _RecordingRandom:
+    """
+    Draws random numbers from another source and writes each one down.
+    Only the draws a Simulation makes are supported.
+    """
+
+    def __init__(self, source: random.Random, draws: array) -> None:
+        self._source = source
+        self._draws = draws
+
+    def choice(self, seq: Sequence[Any]) -> Any:
+        index = self._source.randrange(len(seq))
+        self._draws.append(index)
+        return seq[index]
+
+    def randint(self, a: int, b: int) -> int:
+        value = self._source.randint(a, b)
+        self._draws.append(value - a)
+        return value
+
+
+class _ReplayRandom:
+    """
+    Gives back the random numbers written down by a _RecordingRandom.
+
+    === Public Attributes ===
+    position:
+        The index of the next draw
+    """
+    position: int
+
+    def __init__(self, draws: array) -> None:
+        self._draws = draws
+        self.position = 0
+
+    def _next(self) -> int:
+        if self.position >= len(self._draws):
+            raise ValueError("replay ran out of random draws")
+        self.position += 1
+        return self._draws[self.position - 1]
+
+    def choice(self, seq: Sequence[Any]) -> Any:
+        return seq[self._next()]
+
+    def randint(self, a: int, b: int) -> int:
+        return a + self._next()
+
+
+class ReplayRecorder:
+    """
+    Records a match being played on a Simulation.
+
+    The paddle directions are recorded as they are given, so whatever
+    chooses them must not draw from the simulation's random source.
+
+    === Public Attributes ===
+    replay:
+        The replay being recorded
+
+    === Private Attributes ===
+    _sim:
+        The simulation being recorded
+    _source:
+        The random source of <_sim> before recording started
+    """
+    replay: Replay
+    _sim: Simulation
+    _source: Any
+
+    def __init__(self, sim: Simulation, dt: float) -> None:
+        """
+        Start recording <sim>, which must be at the start of a match and
+        advance by ticks of length <dt>.
+        """
+        self.replay = Replay(sim.width, sim.height, sim.goal_score,
+                             sim.infinite_mode, dt)
+        self._sim = sim
+        self._source = sim.rng
+        sim.rng = _RecordingRandom(sim.rng, self.replay.draws)
+
+    def record(self, inputs: Sequence[int]) -> None:
+        """
+        Record that the simulation is about to be stepped with <inputs>.
+        """
+        if not self._sim.waiting:
+            self.replay.inputs.append(encode_inputs(inputs))
+
+    def stop(self) -> Replay:
+        """
+        Stop recording, give the simulation its random source back, and
+        return the replay.
+        """
+        self._sim.rng = self._source
+        return self.replay
+
+
+class ReplayPlayer:
+    """
+    Plays a replay back on a fresh Simulation.
+
+    Snapshots are kept every KEYFRAME_INTERVAL ticks on the way, so seeking
+    back only replays the ticks since the nearest one.
+
+    === Public Attributes ===
+    replay:
+        The replay being played
+    sim:
+        The simulation the replay is played on
+    tick:
+        The number of ticks played so far
+
+    === Private Attributes ===
+    _rng:
+        The source of the recorded random draws
+    _keyframes:
+        The snapshots of the simulation, by tick
+    """
+    replay: Replay
+    sim: Simulation
+    tick: int
+    _rng: _ReplayRandom
+    _keyframes: List[tuple]
+
+    def __init__(self, replay: Replay) -> None:
+        self.replay = replay
+        self._rng = _ReplayRandom(replay.draws)
+        self.sim = Simulation(replay.width, replay.height, replay.goal_score,
+                              replay.infinite_mode, self._rng)
+        self.tick = 0
+        self._keyframes = [self._snapshot()]
+
+    def finished(self) -> bool:
+        """
+        Return True if every tick of the replay has been played.
+        """
+        return self.tick >= len(self.replay)
+
+    def step(self) -> Optional[int]:
+        """
+        Play the next tick and return the index of the player who scored
+        in it, or None if nobody did.
+        """
+        sim = self.sim
+        if sim.waiting:
+            sim.serve()
+        scorer = sim.step(decode_inputs(self.replay.inputs[self.tick]),
+                          self.replay.dt)
+        self.tick += 1
+        if (self.tick % KEYFRAME_INTERVAL == 0
+                and len(self._keyframes) == self.tick // KEYFRAME_INTERVAL):
+            self._keyframes.append(self._snapshot())
+        return scorer
+
+    def advance(self, ticks: int) -> None:
+        """
+        Play up to <ticks> ticks, stopping at the end of the replay.
+        """
+        end = min(self.tick + ticks, len(self.replay))
+        while self.tick < end:
+            self.step()
+
+    def seek(self, tick: int) -> None:
+        """
+        Move to just after tick <tick>, from the nearest snapshot before it.
+        """
+        tick = max(0, min(tick, len(self.replay)))
+        if tick < self.tick or tick - self.tick > KEYFRAME_INTERVAL:
+            index = min(tick // KEYFRAME_INTERVAL, len(self._keyframes) - 1)
+            self._restore(self._keyframes[index], index * KEYFRAME_INTERVAL)
+        self.advance(tick - self.tick)
+
+    def _snapshot(self) -> tuple:
+        """
+        Return everything needed to put the simulation back as it is now.
+        """
+        sim, ball = self.sim, self.sim.ball
+        return (tuple((p.y, p.score) for p in sim.paddles),
+                (ball.x, ball.y, ball.dx, ball.dy),
+                sim.waiting, sim.rally, sim.serves, self._rng.position)
+
+    def _restore(self, snapshot: tuple, tick: int) -> None:
+        """
+        Put the simulation back as it was at <tick>, from <snapshot>.
+        """
+        paddles, ball, waiting, rally, serves, position = snapshot
+        sim = self.sim
+        for paddle, (y, score) in zip(sim.paddles, paddles):
+            paddle.y, paddle.score = y, score
+            sim.world.update(paddle)
+        sim.ball.x, sim.ball.y, sim.ball.dx, sim.ball.dy = ball
+        sim.world.update(sim.ball)
+        sim.waiting, sim.rally, sim.serves = waiting, rally, serves
+        self._rng.position = position
+        self.tick = tick
+
+
+def view(replay: Replay, speed: float = 1.0) -> None:
+    """
+    Show <replay> in a window, at <speed> times real time. Ticks between
+    two frames are played without being drawn.
+
+    Space pauses, the left and right arrows seek back and forward by five
+    seconds, and the up and down arrows double and halve the speed.
+    """
+    import pygame
+    from text_cache import render_text
+
+    player = ReplayPlayer(replay)
+    sim = player.sim
+    ticks_per_second = 1000 / 30 / player.replay.dt
+    pygame.init()
+    pygame.display.set_caption("PING replay")
+    screen = pygame.display.set_mode((sim.width, sim.height))
+    clock = pygame.time.Clock()
+    white = (255, 255, 255)
+    paused = False
+    owed = 0.0
+    while True:
+        frame_ms = clock.tick(60)
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                return
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_SPACE:
+                    paused = not paused
+                elif event.key == pygame.K_RIGHT:
+                    player.seek(player.tick + int(5 * ticks_per_second))
+                elif event.key == pygame.K_LEFT:
+                    player.seek(player.tick - int(5 * ticks_per_second))
+                elif event.key == pygame.K_UP:
+                    speed *= 2
+                elif event.key == pygame.K_DOWN:
+                    speed /= 2
+        if not paused:
+            owed += frame_ms / 1000 * ticks_per_second * speed
+            player.advance(int(owed))
+            owed -= int(owed)
+
+        screen.fill((0, 0, 0))
+        for box in (sim.upper_bound, sim.lower_bound, *sim.paddles):
+            pygame.draw.rect(screen, white, box.get_bounds()[:2] +
+                             (box.width, box.height))
+        pygame.draw.circle(screen, white,
+                           (int(sim.ball.x), int(sim.ball.y)),
+                           sim.ball.radius)
+        status = "{} - {}   tick {}/{}   x{:g}{}".format(
+            sim.paddles[0].score, sim.paddles[1].score, player.tick,
+            len(player.replay), speed, "   paused" if paused else "")
+        text = render_text(status, 24, white)
+        screen.blit(text, text.get_rect(centerx=sim.width // 2,
+                                        top=sim.y_bound[0] + 10))
+        pygame.display.flip()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Show a replay from the command line.
+    """
+    parser = argparse.ArgumentParser(prog="main.py replay",
+                                     description="Watch a recorded match.")
+    parser.add_argument("file")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="playback speed, as a multiple of real time")
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.file):
+        parser.error("no such replay: " + args.file)
+    try:
+        replay = Replay.load(args.file)
+    except ValueError as error:
+        parser.error("cannot play {}: {}".format(args.file, error))
+    view(replay, args.speed)
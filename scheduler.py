@@ -0,0 +1,54 @@
+"""
+Decides when the next frame is drawn, so that screens where nothing is
+moving do not keep the CPU busy.
+"""
+from __future__ import annotations
+from typing import List, Optional
+import pygame
+
+# How long an idle screen sleeps at most before waking up on its own
+IDLE_TIMEOUT_MS = 1000
+
+
+class FrameScheduler:
+    """
+    Paces the frames of the menu and the game.
+
+    While something is animating, tick() sleeps just long enough to keep to
+    a frame cap. While nothing is, wait() blocks on pygame's event queue
+    until there is input or the idle timeout runs out, so the screen is
+    only redrawn after something happens.
+
+    === Public Attributes ===
+    clock:
+        The clock used to measure and cap frame times
+    idle_timeout:
+        The longest wait() blocks for, in milliseconds
+    """
+    clock: pygame.time.Clock
+    idle_timeout: int
+
+    def __init__(self, idle_timeout: int = IDLE_TIMEOUT_MS) -> None:
+        self.clock = pygame.time.Clock()
+        self.idle_timeout = idle_timeout
+
+    def tick(self, fps_cap: Optional[int] = None) -> int:
+        """
+        Sleep until the next frame is due under <fps_cap> (None for no
+        limit) and return the milliseconds since the previous frame.
+        """
+        return self.clock.tick(fps_cap or 0)
+
+    def wait(self) -> List[pygame.event.Event]:
+        """
+        Block until there is at least one event or the idle timeout runs
+        out, and return every waiting event (none on a timeout).
+
+        The clock is restarted afterwards, so the time spent idle does not
+        count as a long frame.
+        """
+        event = pygame.event.wait(self.idle_timeout)
+        events = [] if event.type == pygame.NOEVENT else [event]
+        events.extend(pygame.event.get())
+        self.clock.tick()
+        return events
@@ -0,0 +1,346 @@
+"""
+The rules of ping without any window, event pump or drawing.
+
+A Simulation holds the ball, the paddles, the bounds of the stage and the
+score, and advances them with step(). The Game draws it and feeds it the
+players' input, but a Simulation can run on its own, for example to play
+matches much faster than real time on a machine without a display.
+"""
+from __future__ import annotations
+import random
+from typing import List, Optional, Sequence, Tuple
+from collision import CollisionWorld
+from physics import Impact, swept_circle_aabb, time_to_line
+
+# Paddle directions
+UP = -1
+STAY = 0
+DOWN = 1
+
+PADDLE_WIDTH = 15
+PADDLE_HEIGHT = 80
+PADDLE_SPEED = 10
+BALL_RADIUS = 18
+BALL_SPEED = 10
+# The steepest vertical speed the ball gets from a serve or a paddle
+MAX_BALL_DY = 16
+# How far past the edge of the stage the ball goes before a point is scored
+SCORE_MARGIN = 35
+# The most impacts the ball resolves within a single step
+MAX_CONTACTS = 8
+
+
+class Box:
+    """
+    A rectangle on the stage that does not move, such as a boundary.
+    """
+    __slots__ = ('x', 'y', 'width', 'height')
+    x: float
+    y: float
+    width: float
+    height: float
+
+    def __init__(self, x: float, y: float, width: float,
+                 height: float) -> None:
+        self.x, self.y, self.width, self.height = x, y, width, height
+
+    def get_bounds(self) -> Tuple[float, float, float, float]:
+        """
+        Return the (left, top, right, bottom) bounds of this box.
+        """
+        return self.x, self.y, self.x + self.width, self.y + self.height
+
+
+class Paddle(Box):
+    """
+    A player's paddle and score.
+    """
+    __slots__ = ('speed', 'score')
+    speed: float
+    score: int
+
+    def __init__(self, x: float, y: float) -> None:
+        super().__init__(x, y, PADDLE_WIDTH, PADDLE_HEIGHT)
+        self.speed = PADDLE_SPEED
+        self.score = 0
+
+
+class BallState:
+    """
+    The ball: a circle centred on <x>, <y> moving by <dx>, <dy> per unit
+    of time.
+    """
+    __slots__ = ('x', 'y', 'dx', 'dy', 'radius')
+    x: float
+    y: float
+    dx: float
+    dy: float
+    radius: float
+
+    def __init__(self, x: float, y: float) -> None:
+        self.x, self.y = x, y
+        self.dx = self.dy = 0
+        self.radius = BALL_RADIUS
+
+    def get_bounds(self) -> Tuple[float, float, float, float]:
+        """
+        Return the (left, top, right, bottom) bounds of this ball.
+        """
+        r = self.radius
+        return self.x - r, self.y - r, self.x + r, self.y + r
+
+
+class Simulation:
+    """
+    The state of one match and the rules that advance it.
+
+    === Public Attributes ===
+    width, height:
+        The size of the stage
+    x_bound:
+        The horizontal [left, right] bounds of the stage
+    y_bound:
+        The vertical [upper, lower] bounds of the moving actors, inside
+        the boundaries
+    goal_score:
+        The score that wins the match
+    infinite_mode:
+        True if the match never ends
+    paddles:
+        The left and right paddles, in player order
+    ball:
+        The ball
+    upper_bound, lower_bound:
+        The boundaries at the top and bottom of the stage
+    world:
+        The collision world holding the paddles, boundaries and ball
+    waiting:
+        True between points, until the ball is served
+    rally:
+        The number of times the ball has hit a paddle since the last serve
+    serves:
+        The number of times the ball has been served
+    rng:
+        The source of the random ball directions
+    """
+    width: int
+    height: int
+    x_bound: List[int]
+    y_bound: List[int]
+    goal_score: int
+    infinite_mode: bool
+    paddles: List[Paddle]
+    ball: BallState
+    upper_bound: Box
+    lower_bound: Box
+    world: CollisionWorld
+    waiting: bool
+    rally: int
+    serves: int
+    rng: random.Random
+
+    def __init__(self, width: int, height: int, goal_score: int = 10,
+                 infinite_mode: bool = False,
+                 rng: Optional[random.Random] = None) -> None:
+        """
+        Initialize a match on a <width>x<height> stage.
+        """
+        self.width, self.height = width, height
+        self.goal_score = goal_score
+        self.infinite_mode = infinite_mode
+        self.rng = rng if rng is not None else random.Random()
+
+        h_bars = round(height * 0.05)
+        self.x_bound = [0, width]
+        self.y_bound = [h_bars, height - h_bars]
+        self.upper_bound = Box(0, 0, width, h_bars)
+        self.lower_bound = Box(0, height - h_bars, width, h_bars)
+        self.paddles = [Paddle(10, (height // 2) - 40),
+                        Paddle(width - 25, (height // 2) - 40)]
+        self.ball = BallState(width // 2, height // 2)
+        self.waiting = True
+        self.rally = 0
+        self.serves = 0
+
+        self.world = CollisionWorld()
+        for body in (self.paddles[0], self.paddles[1], self.ball,
+                     self.upper_bound, self.lower_bound):
+            self.world.insert(body)
+
+    def reset_round(self) -> None:
+        """
+        Put the paddles and the ball back in their starting positions and
+        wait for the next serve.
+        """
+        for paddle in self.paddles:
+            paddle.y = (self.height // 2) - 40
+            self.world.update(paddle)
+        ball = self.ball
+        ball.x, ball.y = self.width // 2, self.height // 2
+        ball.dx = ball.dy = 0
+        self.world.update(ball)
+        self.waiting = True
+
+    def reset_match(self) -> None:
+        """
+        Set both scores back to 0 and start a new round.
+        """
+        for paddle in self.paddles:
+            paddle.score = 0
+        self.reset_round()
+
+    def serve(self) -> None:
+        """
+        Start the ball moving in a random direction.
+        """
+        self.ball.dy = self.new_direction(-MAX_BALL_DY, MAX_BALL_DY)[1]
+        self.ball.dx = self.rng.choice([-BALL_SPEED, BALL_SPEED])
+        self.waiting = False
+        self.rally = 0
+        self.serves += 1
+
+    def new_direction(self, lower: int, upper: int) -> Tuple[int, int]:
+        """
+        Return a random (dx, dy) direction for the ball, with dy between
+        <lower> and <upper>.
+        """
+        return BALL_SPEED, self.rng.randint(lower, upper)
+
+    def winner(self) -> Optional[int]:
+        """
+        Return the index of the player who won the match, or None if the
+        match is not over.
+        """
+        if self.infinite_mode:
+            return None
+        for i, paddle in enumerate(self.paddles):
+            if paddle.score >= self.goal_score:
+                return i
+        return None
+
+    def move_paddle(self, paddle: Paddle, direction: int, dt: float) -> None:
+        """
+        Move <paddle> UP or DOWN for <dt> units of time, stopping it at the
+        edge of the stage.
+        """
+        if direction == UP:
+            paddle.y = max(paddle.y - paddle.speed * dt, self.y_bound[0])
+        elif direction == DOWN:
+            paddle.y = min(paddle.y + paddle.speed * dt,
+                           self.y_bound[1] - paddle.height)
+        else:
+            return
+        self.world.update(paddle)
+
+    def ball_impact(self, step_x: float, step_y: float,
+                    ball: Optional[BallState] = None) -> Optional[Impact]:
+        """
+        Return the first Impact of <ball> (by default, the ball) with a
+        paddle while it moves by <step_x>, <step_y>, or None if it does not
+        hit any paddle.
+        """
+        if ball is None:
+            ball = self.ball
+        r = ball.radius
+        nearby = self.world.query_box(min(ball.x, ball.x + step_x) - r,
+                                      min(ball.y, ball.y + step_y) - r,
+                                      max(ball.x, ball.x + step_x) + r,
+                                      max(ball.y, ball.y + step_y) + r)
+        first = None
+        for paddle in nearby:
+            if not isinstance(paddle, Paddle):
+                continue
+            impact = swept_circle_aabb(ball.x, ball.y, step_x, step_y, r,
+                                       *paddle.get_bounds())
+            if impact is not None and (first is None or impact.t < first.t):
+                first = impact
+        return first
+
+    def move_ball(self, dt: float) -> Optional[int]:
+        """
+        Move the ball for <dt> units of time, bouncing it off the borders and
+        the paddles. Collisions are resolved continuously, so the ball cannot
+        pass through a paddle however large <dt> is.
+
+        Return the index of the player who scored, or None if nobody did.
+        """
+        scorer = self.advance_ball(self.ball, dt)
+        if scorer is not None:
+            self.paddles[scorer].score += 1
+            self.reset_round()
+        return scorer
+
+    def advance_ball(self, ball: BallState, dt: float) -> Optional[int]:
+        """
+        Move <ball> for <dt> units of time, bouncing it off the borders and
+        the paddles, without changing the score.
+
+        Return the index of the player who scores from where <ball> ended
+        up, or None if nobody does.
+        """
+        radius = ball.radius
+        for _ in range(MAX_CONTACTS):
+            step_x, step_y = ball.dx * dt, ball.dy * dt
+            impact = self.ball_impact(step_x, step_y, ball)
+
+            # Check collision with the top and bottom borders
+            wall_t = None
+            if step_y < 0:
+                wall_t = time_to_line(ball.y, step_y,
+                                      self.y_bound[0] + radius)
+            elif step_y > 0:
+                wall_t = time_to_line(ball.y, step_y,
+                                      self.y_bound[1] - radius)
+
+            if wall_t is not None and (impact is None or wall_t < impact.t):
+                ball.x += step_x * wall_t
+                ball.y += step_y * wall_t
+                ball.dy = -ball.dy
+                dt *= 1 - wall_t
+
+            # Check collision with paddles
+            elif impact is not None:
+                ball.x += step_x * impact.t
+                ball.y += step_y * impact.t
+                ball.dx = -ball.dx
+                self.rally += 1
+
+                # check if the ball is coming up or coming down
+                if ball.dy > 0:
+                    ball.dy = self.new_direction(-MAX_BALL_DY, 0)[1]
+                elif ball.dy < 0:
+                    ball.dy = self.new_direction(0, MAX_BALL_DY)[1]
+                else:
+                    ball.dy = self.new_direction(-MAX_BALL_DY,
+                                                 MAX_BALL_DY)[1]
+                dt *= 1 - impact.t
+
+            # No Collision
+            else:
+                ball.x += step_x
+                ball.y += step_y
+                break
+        if ball in self.world:
+            self.world.update(ball)
+
+        # Check Collision with the left and right screen edges
+        if ball.x - radius <= self.x_bound[0] - SCORE_MARGIN:
+            return 1
+        if ball.x + radius >= self.x_bound[1] + SCORE_MARGIN:
+            return 0
+        return None
+
+    def step(self, inputs: Sequence[int], dt: float) -> Optional[int]:
+        """
+        Advance the match by <dt> units of time, moving each paddle in the
+        direction given for it in <inputs>. Nothing moves while waiting for
+        a serve.
+
+        Return the index of the player who scored, or None if nobody did.
+        """
+        if self.waiting:
+            return None
+        for paddle, direction in zip(self.paddles, inputs):
+            if direction:
+                self.move_paddle(paddle, direction, dt)
+        return self.move_ball(dt)
@@ -0,0 +1,309 @@
+"""
+A compact binary format for the state of a match: the ball, the paddles,
+the scores and whether the match is paused, waiting for a serve or over.
+
+Positions and velocities are quantized to fixed-point integers, so a
+State compares exactly and only the fields that changed since a base
+state need to be sent. An encoded snapshot is a fixed header
+
+    tick, ticks back to the base state (0 for none), mask of changed fields
+
+followed by the difference from the base of each changed field, as a
+zigzag varint. The base is the last state the receiver acknowledged, so
+snapshots sent every tick are a few bytes long, and a lost one costs
+nothing more than a larger next one.
+
+The same format, with no base, is used to save the state of a game to a
+file and load it back.
+"""
+from __future__ import annotations
+import struct
+from typing import Dict, NamedTuple, Optional, Tuple
+from simulation import Simulation
+
+# Positions are kept in 1/16ths of a pixel, and velocities in 1/256ths of a
+# pixel per unit of time
+POSITION_SCALE = 16
+VELOCITY_SCALE = 256
+
+# Flags
+WAITING = 1
+PAUSED = 2
+NEW_ROUND = 4
+OVER = 8
+WINNER_2 = 16
+
+# How many of the latest states are kept as possible bases
+HISTORY = 64
+
+_HEADER = struct.Struct("<IBH")
+# The most ticks a base may be behind the state encoded against it
+_MAX_BASE_AGE = 255
+
+MAGIC = b"PNGS"
+VERSION = 1
+_FILE_HEADER = struct.Struct("<4sHH?")
+# The file extension of saved states
+EXTENSION = ".pingstate"
+
+
+class State(NamedTuple):
+    """
+    The quantized state of a match.
+    """
+    ball_x: int
+    ball_y: int
+    ball_dx: int
+    ball_dy: int
+    paddle1_y: int
+    paddle2_y: int
+    score1: int
+    score2: int
+    flags: int
+
+    @property
+    def waiting(self) -> bool:
+        return bool(self.flags & WAITING)
+
+    @property
+    def winner(self) -> Optional[int]:
+        """
+        Return the index of the player who won the match, or None if the
+        match is not over.
+        """
+        if not self.flags & OVER:
+            return None
+        return 1 if self.flags & WINNER_2 else 0
+
+
+_EMPTY = State(0, 0, 0, 0, 0, 0, 0, 0, 0)
+
+
+def capture(sim: Simulation, paused: bool = False,
+            new_round: bool = False) -> State:
+    """
+    Return the state of the match held by <sim>, which is <paused> and
+    between rounds if <new_round>.
+    """
+    ball, paddles = sim.ball, sim.paddles
+    flags = (WAITING if sim.waiting else 0) | (PAUSED if paused else 0) | \
+        (NEW_ROUND if new_round else 0)
+    winner = sim.winner()
+    if winner is not None:
+        flags |= OVER | (WINNER_2 if winner == 1 else 0)
+    return State(round(ball.x * POSITION_SCALE),
+                 round(ball.y * POSITION_SCALE),
+                 round(ball.dx * VELOCITY_SCALE),
+                 round(ball.dy * VELOCITY_SCALE),
+                 round(paddles[0].y * POSITION_SCALE),
+                 round(paddles[1].y * POSITION_SCALE),
+                 paddles[0].score, paddles[1].score, flags)
+
+
+def restore(sim: Simulation, state: State) -> None:
+    """
+    Put the ball, paddles, scores and serve state of <sim> as they are in
+    <state>.
+    """
+    ball = sim.ball
+    ball.x = state.ball_x / POSITION_SCALE
+    ball.y = state.ball_y / POSITION_SCALE
+    ball.dx = state.ball_dx / VELOCITY_SCALE
+    ball.dy = state.ball_dy / VELOCITY_SCALE
+    if ball in sim.world:
+        sim.world.update(ball)
+    for paddle, y, score in zip(sim.paddles,
+                                (state.paddle1_y, state.paddle2_y),
+                                (state.score1, state.score2)):
+        paddle.y = y / POSITION_SCALE
+        paddle.score = score
+        sim.world.update(paddle)
+    sim.waiting = state.waiting
+
+
+def encode(tick: int, state: State, base_tick: Optional[int] = None,
+           base: Optional[State] = None) -> bytes:
+    """
+    Return <state> at <tick> as the changes from <base>, the state at
+    <base_tick>, or whole if no base is given or it is too old.
+    """
+    age = 0
+    if base is not None and 0 < tick - base_tick <= _MAX_BASE_AGE:
+        age = tick - base_tick
+    else:
+        base = _EMPTY
+    mask = 0
+    bit = 1
+    body = bytearray()
+    for value, old in zip(state, base):
+        if value != old:
+            mask |= bit
+            # The zigzag varint of the change, written inline as this is
+            # run for every field of every snapshot sent
+            change = value - old
+            change = change << 1 if change >= 0 else (-change << 1) - 1
+            while change > 0x7f:
+                body.append(change & 0x7f | 0x80)
+                change >>= 7
+            body.append(change)
+        bit <<= 1
+    return _HEADER.pack(tick, age, mask) + body
+
+
+def decode(data: bytes, bases: Optional[Dict[int, State]] = None
+           ) -> Tuple[int, State]:
+    """
+    Return the tick and the state of the snapshot <data>, whose base, if
+    it has one, is looked up by tick in <bases>.
+    """
+    if len(data) < _HEADER.size:
+        raise ValueError("snapshot is truncated")
+    tick, age, mask = _HEADER.unpack_from(data)
+    base = _EMPTY
+    if age:
+        base = (bases or {}).get(tick - age)
+        if base is None:
+            raise ValueError("base of snapshot {} is unknown".format(tick))
+    if not mask:
+        return tick, base
+    values = list(base)
+    offset = _HEADER.size
+    try:
+        for i in range(len(values)):
+            if mask >> i & 1:
+                # A zigzag varint, read inline as this is run for every
+                # field of every snapshot received
+                change = shift = 0
+                while True:
+                    byte = data[offset]
+                    offset += 1
+                    change |= (byte & 0x7f) << shift
+                    if byte < 0x80:
+                        break
+                    shift += 7
+                values[i] += (change >> 1) ^ -(change & 1)
+    except IndexError:
+        raise ValueError("snapshot is truncated") from None
+    return tick, State(*values)
+
+
+class DeltaEncoder:
+    """
+    Encodes the states sent to one receiver against the last one it
+    acknowledged.
+
+    === Private Attributes ===
+    _sent:
+        The latest states sent, by tick
+    _acked:
+        The tick of the newest state acknowledged, or None
+    """
+    _sent: Dict[int, State]
+    _acked: Optional[int]
+
+    def __init__(self) -> None:
+        self._sent = {}
+        self._acked = None
+
+    def ack(self, tick: int) -> None:
+        """
+        Record that the receiver has the state of <tick>.
+        """
+        if tick in self._sent and (self._acked is None or tick > self._acked):
+            self._acked = tick
+
+    def encode(self, tick: int, state: State) -> bytes:
+        """
+        Return <state> at <tick> encoded for the receiver.
+        """
+        sent = self._sent
+        sent[tick] = state
+        if len(sent) > HISTORY:
+            del sent[next(iter(sent))]
+        acked = self._acked
+        if acked is None:
+            return encode(tick, state)
+        return encode(tick, state, acked, sent.get(acked))
+
+
+class DeltaDecoder:
+    """
+    Decodes the states sent by a DeltaEncoder.
+
+    === Public Attributes ===
+    newest:
+        The tick of the newest state decoded, or None, to acknowledge to
+        the sender
+
+    === Private Attributes ===
+    _received:
+        The latest states decoded, by tick
+    """
+    newest: Optional[int]
+    _received: Dict[int, State]
+
+    def __init__(self) -> None:
+        self.newest = None
+        self._received = {}
+
+    def decode(self, data: bytes) -> Tuple[int, State]:
+        """
+        Return the tick and the state of the snapshot <data>. Raise
+        ValueError if its base has already been forgotten.
+        """
+        tick, state = decode(data, self._received)
+        received = self._received
+        received[tick] = state
+        if len(received) > HISTORY:
+            del received[min(received)]
+        if self.newest is None or tick > self.newest:
+            self.newest = tick
+        return tick, state
+
+
+def save_state(path: str, state: State, goal_score: int,
+               infinite_mode: bool) -> None:
+    """
+    Write <state> of a match to <goal_score>, or in infinite mode if
+    <infinite_mode>, to the file <path>.
+    """
+    with open(path, 'wb') as file:
+        file.write(_FILE_HEADER.pack(MAGIC, VERSION, goal_score,
+                                     infinite_mode) + encode(0, state))
+
+
+def load_state(path: str) -> Tuple[State, int, bool]:
+    """
+    Return the state, goal score and mode saved in the file <path>. Raise
+    ValueError if it is not a state saved by this version of the game, or
+    its match is over when nobody has won it or the other way round.
+    """
+    with open(path, 'rb') as file:
+        data = file.read()
+    if len(data) < _FILE_HEADER.size:
+        raise ValueError("not a saved state: too short")
+    magic, version, goal_score, infinite_mode = \
+        _FILE_HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("not a saved state")
+    if version != VERSION:
+        raise ValueError("unsupported saved state version " + str(version))
+    state = decode(data[_FILE_HEADER.size:])[1]
+    if state.winner != _winner(state, goal_score, infinite_mode):
+        raise ValueError("saved state is over when its scores are not, "
+                         "or the other way round")
+    return state, goal_score, infinite_mode
+
+
+def _winner(state: State, goal_score: int,
+            infinite_mode: bool) -> Optional[int]:
+    """
+    Return the index of the player whose score in <state> wins a match to
+    <goal_score>, or in infinite mode, as Simulation.winner() would.
+    """
+    if infinite_mode:
+        return None
+    for i, score in enumerate((state.score1, state.score2)):
+        if score >= goal_score:
+            return i
+    return None
@@ -0,0 +1,598 @@
+"""
+Let many spectators watch the same match over TCP.
+
+A Broadcaster encodes the state of its match once per frame, and writes
+that one buffer to the connection of every spectator. A spectator whose
+connection has not taken the last frames yet skips the new ones instead
+of having them queued, so a slow spectator neither holds the others up
+nor makes the broadcaster's memory grow. Every frame holds the whole state
+of the match (see snapshot.py), so a spectator can pick the stream up
+again after any frame it missed.
+
+A stream starts with a header giving the size of the stage, the goal
+score and the mode, then the latest frame, then a frame whenever the
+match is published. Each frame is its length in one byte followed by the
+encoded state. When the broadcaster moves on to a new match, spectators
+already watching get a zero length byte, the header of the new match and
+its latest frame, as if they had just connected.
+
+Run it through main.py, for example:
+
+    python main.py spectate serve --port 5291 --stats 5
+    python main.py spectate watch 127.0.0.1:5291
+    python main.py spectate load 127.0.0.1:5291 --connections 2000
+
+The game itself broadcasts the matches played in its window when started
+with python main.py --broadcast 5291.
+
+Only watch() draws anything: it imports pygame when it is called, so
+servers and load tests run where pygame is not installed.
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import random
+import socket
+import struct
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+from ai import AIController
+from network import MS_PER_UNIT, TICK_RATE, run_ticks
+from simulation import Simulation
+from snapshot import State, capture, decode, encode
+
+MAGIC = b"PNGW"
+VERSION = 1
+DEFAULT_PORT = 5291
+SCREEN_SIZE = (960, 500)
+_HEADER = struct.Struct("<4sHHHH?")
+_LENGTH = struct.Struct("<B")
+# The number of frames sent to spectators per second by default
+FRAME_RATE = 30
+# The most bytes waiting to be sent to one spectator before the frames
+# after them are skipped
+MAX_BUFFERED = 256
+# The size asked for the kernel's send buffer of each spectator's socket,
+# which bounds how far behind a spectator who stopped reading can fall
+SOCKET_BUFFER = 4096
+# How many connections may wait to be accepted at once
+ACCEPT_BACKLOG = 1024
+# How many connections the load test opens at once
+CONNECT_BATCH = 256
+# The length byte that starts the header of a new match in a stream, as
+# no frame is empty
+_RESTART = b"\x00"
+
+
+def encode_frame(tick: int, state: State) -> bytes:
+    """
+    Return the frame of the stream holding <state> at <tick>.
+    """
+    data = encode(tick, state)
+    return _LENGTH.pack(len(data)) + data
+
+
+class _Spectator(asyncio.Protocol):
+    """
+    The connection of one spectator to a Broadcaster.
+
+    === Public Attributes ===
+    transport:
+        The connection, once it is made
+    behind:
+        True while the connection has more than MAX_BUFFERED bytes waiting
+        to be sent
+    """
+    transport: Optional[asyncio.Transport]
+    behind: bool
+
+    def __init__(self, broadcaster: Broadcaster) -> None:
+        self._broadcaster = broadcaster
+        self.transport = None
+        self.behind = False
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self.transport = transport
+        sock = transport.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF,
+                            SOCKET_BUFFER)
+        transport.set_write_buffer_limits(MAX_BUFFERED, 0)
+        self._broadcaster.add(self)
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        self._broadcaster.remove(self)
+
+    def pause_writing(self) -> None:
+        self.behind = True
+
+    def resume_writing(self) -> None:
+        self.behind = False
+
+    def data_received(self, data: bytes) -> None:
+        # Spectators have nothing to say
+        pass
+
+
+class Broadcaster:
+    """
+    Sends every frame of one match to all of its spectators.
+
+    === Public Attributes ===
+    frames:
+        The number of frames published
+    sent:
+        The number of frames written to a spectator
+    dropped:
+        The number of frames skipped for a spectator who was behind
+
+    === Private Attributes ===
+    _header:
+        The start of every stream
+    _latest:
+        The last frame published, sent first to new spectators
+    _spectators:
+        The connected spectators
+    _loop:
+        The event loop the connections run on, once serving
+    _thread:
+        The thread running <_loop>, if start() started one
+    _server:
+        The listening socket, once serving
+    """
+    frames: int
+    sent: int
+    dropped: int
+    _header: bytes
+    _latest: Optional[bytes]
+    _spectators: Set[_Spectator]
+
+    def __init__(self, width: int, height: int, goal_score: int,
+                 infinite_mode: bool) -> None:
+        self.frames = self.sent = self.dropped = 0
+        self._header = _HEADER.pack(MAGIC, VERSION, width, height,
+                                    goal_score, infinite_mode)
+        self._latest = None
+        self._spectators = set()
+        self._loop = None
+        self._thread = None
+        self._server = None
+
+    def __len__(self) -> int:
+        """
+        Return the number of spectators connected.
+        """
+        return len(self._spectators)
+
+    def set_match(self, width: int, height: int, goal_score: int,
+                  infinite_mode: bool) -> None:
+        """
+        Move on to a new match with these settings. Spectators already
+        watching are sent its header, and then its frames from the next
+        one published. May be called from any thread.
+        """
+        header = _HEADER.pack(MAGIC, VERSION, width, height, goal_score,
+                              infinite_mode)
+        if self._thread is None:
+            self._restart(header)
+        elif self._loop is not None:
+            self._loop.call_soon_threadsafe(self._restart, header)
+        else:
+            self._header = header
+
+    def _restart(self, header: bytes) -> None:
+        """
+        Start the stream of every spectator again with <header>. The last
+        frame published belongs to the previous match, and is forgotten.
+        """
+        self._header = header
+        self._latest = None
+        restart = _RESTART + header
+        for spectator in self._spectators:
+            spectator.transport.write(restart)
+
+    def add(self, spectator: _Spectator) -> None:
+        """
+        Start sending frames to <spectator>, from the latest one.
+        """
+        self._spectators.add(spectator)
+        spectator.transport.write(self._header)
+        if self._latest is not None:
+            spectator.transport.write(self._latest)
+
+    def remove(self, spectator: _Spectator) -> None:
+        self._spectators.discard(spectator)
+
+    async def serve(self, host: str = "0.0.0.0",
+                    port: int = DEFAULT_PORT) -> None:
+        """
+        Start accepting spectators on <host>:<port> on the running loop.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._server = await self._loop.create_server(
+            lambda: _Spectator(self), host, port, backlog=ACCEPT_BACKLOG)
+
+    def start(self, host: str = "0.0.0.0", port: int = DEFAULT_PORT) -> None:
+        """
+        Start accepting spectators on <host>:<port> on a background thread,
+        for a match run by a program that has no event loop.
+        """
+        loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=loop.run_forever, daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self.serve(host, port),
+                                         loop).result()
+
+    def stop(self) -> None:
+        """
+        Close every connection and stop the thread start() started.
+        """
+        loop = self._loop
+        if loop is None:
+            return
+        if self._thread is None:
+            self._close()
+            self._loop = None
+            return
+        loop.call_soon_threadsafe(self._close)
+        loop.call_soon_threadsafe(loop.stop)
+        self._thread.join(1.0)
+        self._thread = self._loop = None
+
+    def _close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+        for spectator in list(self._spectators):
+            spectator.transport.close()
+
+    def publish(self, tick: int, state: State) -> None:
+        """
+        Send <state> at <tick> to every spectator. May be called from any
+        thread: the frame is encoded here, and written by the loop.
+        """
+        frame = encode_frame(tick, state)
+        if self._thread is None:
+            self._fan_out(frame)
+        elif self._loop is not None:
+            self._loop.call_soon_threadsafe(self._fan_out, frame)
+
+    def _fan_out(self, frame: bytes) -> None:
+        """
+        Write <frame> to every spectator who is not behind. The transports
+        send from the same buffer; none of them gets a copy of its own.
+        """
+        self._latest = frame
+        self.frames += 1
+        view = memoryview(frame)
+        sent = 0
+        for spectator in self._spectators:
+            if spectator.behind:
+                continue
+            spectator.transport.write(view)
+            sent += 1
+        self.sent += sent
+        self.dropped += len(self._spectators) - sent
+
+    def stats(self) -> Dict[str, int]:
+        return {"spectators": len(self), "frames": self.frames,
+                "sent": self.sent, "dropped": self.dropped}
+
+
+class FrameReader:
+    """
+    Splits the bytes of a stream into its header and frames.
+
+    === Public Attributes ===
+    width, height, goal_score, infinite_mode:
+        The settings of the match, once the header has been read
+    matches:
+        The number of match headers read
+
+    === Private Attributes ===
+    _buffer:
+        The bytes received that do not make a whole header or frame yet
+    """
+    width: int
+    height: int
+    goal_score: int
+    infinite_mode: bool
+    matches: int
+    _buffer: bytearray
+
+    def __init__(self) -> None:
+        self.width = 0
+        self.matches = 0
+        self._buffer = bytearray()
+
+    def feed(self, data: bytes) -> List[Tuple[int, State]]:
+        """
+        Take <data> from the stream and return the (tick, state) of every
+        frame it completes.
+        """
+        return [decode(frame) for frame in self.split(data)]
+
+    def split(self, data: bytes) -> List[bytes]:
+        """
+        Take <data> from the stream and return the encoded state of every
+        frame it completes.
+        """
+        buffer = self._buffer
+        buffer += data
+        offset = 0
+        if not self.matches:
+            if len(buffer) < _HEADER.size:
+                return []
+            offset = self._read_header(buffer, 0)
+        frames = []
+        while offset < len(buffer):
+            if buffer[offset] == _RESTART[0]:
+                # The frames after this are of a new match
+                if offset + 1 + _HEADER.size > len(buffer):
+                    break
+                offset = self._read_header(buffer, offset + 1)
+                frames.clear()
+                continue
+            end = offset + 1 + buffer[offset]
+            if end > len(buffer):
+                break
+            frames.append(bytes(buffer[offset + 1:end]))
+            offset = end
+        del buffer[:offset]
+        return frames
+
+    def _read_header(self, buffer: bytearray, offset: int) -> int:
+        """
+        Read the header at <offset> in <buffer>, and return where it ends.
+        """
+        (magic, version, self.width, self.height, self.goal_score,
+         self.infinite_mode) = _HEADER.unpack_from(buffer, offset)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a spectator stream")
+        self.matches += 1
+        return offset + _HEADER.size
+
+
+async def broadcast_match(broadcaster: Broadcaster, sim: Simulation,
+                          frame_rate: int = FRAME_RATE,
+                          tick_rate: int = TICK_RATE,
+                          ticks: Optional[int] = None) -> None:
+    """
+    Play matches of <sim> between two computer players, one after the
+    other, publishing them on <broadcaster> <frame_rate> times a second.
+    """
+    controller = AIController()
+    dt = 1000 / tick_rate / MS_PER_UNIT
+    every = max(1, round(tick_rate / frame_rate))
+    count = [0]
+
+    def tick() -> None:
+        if sim.waiting:
+            if sim.winner() is not None:
+                sim.reset_match()
+            sim.serve()
+        sim.step([controller(sim, 0), controller(sim, 1)], dt)
+        count[0] += 1
+        if count[0] % every == 0:
+            broadcaster.publish(count[0], capture(sim))
+    await run_ticks(tick, tick_rate, ticks)
+
+
+async def _connect(host: str, port: int,
+                   receive_buffer: Optional[int] = None,
+                   attempts: int = 50) -> socket.socket:
+    """
+    Return a socket connected to <host>:<port>, with a kernel receive
+    buffer of <receive_buffer> bytes if it is given. A refused connection
+    is tried again, up to <attempts> times, as a server that is busy
+    accepting thousands of them refuses the ones its queue has no room for.
+    """
+    loop = asyncio.get_running_loop()
+    for attempt in range(attempts):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        if receive_buffer is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF,
+                            receive_buffer)
+        sock.setblocking(False)
+        try:
+            await loop.sock_connect(sock, (host, port))
+            return sock
+        except ConnectionRefusedError:
+            sock.close()
+            if attempt == attempts - 1:
+                raise
+            await asyncio.sleep(0.1)
+
+
+async def load_test(host: str, port: int, connections: int,
+                    seconds: float, slow: float = 0.0,
+                    batch: int = CONNECT_BATCH) -> Dict:
+    """
+    Open <connections> spectator connections to <host>:<port>, <batch> at
+    a time, of which the fraction <slow> never read, watch for <seconds>
+    seconds and return how many frames the readers received.
+    """
+    loop = asyncio.get_running_loop()
+
+    class Reader(asyncio.Protocol):
+        def __init__(self) -> None:
+            self.reader = FrameReader()
+            self.frames = 0
+
+        def connection_made(self, transport: asyncio.BaseTransport) -> None:
+            self.transport = transport
+
+        def data_received(self, data: bytes) -> None:
+            self.frames += len(self.reader.split(data))
+
+    readers = []
+    stalled = []
+    failed = 0
+
+    async def open_connection(is_slow: bool) -> None:
+        nonlocal failed
+        try:
+            sock = await _connect(host, port, 1024 if is_slow else None)
+        except ConnectionRefusedError:
+            failed += 1
+            return
+        transport, protocol = await loop.create_connection(Reader, sock=sock)
+        if is_slow:
+            transport.pause_reading()
+            stalled.append(protocol)
+        else:
+            readers.append(protocol)
+
+    started = time.perf_counter()
+    for first in range(0, connections, batch):
+        last = min(first + batch, connections)
+        await asyncio.gather(*(open_connection(i < connections * slow)
+                               for i in range(first, last)))
+    connect_seconds = time.perf_counter() - started
+    before = [reader.frames for reader in readers]
+    await asyncio.sleep(seconds)
+    received = sorted(reader.frames - old
+                      for reader, old in zip(readers, before))
+    for protocol in readers + stalled:
+        protocol.transport.close()
+    return {"connections": len(readers) + len(stalled), "failed": failed,
+            "slow": len(stalled),
+            "connect_seconds": connect_seconds,
+            "frames_min": received[0] if received else 0,
+            "frames_median": received[len(received) // 2] if received else 0,
+            "frames_per_second": (received[len(received) // 2] / seconds
+                                  if received else 0.0)}
+
+
+def watch(host: str, port: int) -> None:
+    """
+    Show the match broadcast at <host>:<port> in a window, until it is
+    closed or the broadcast ends.
+    """
+    import pygame
+    from snapshot import restore
+    from text_cache import render_text
+
+    reader = FrameReader()
+    sock = socket.create_connection((host, port))
+    sock.setblocking(False)
+    sim = None
+    matches = 0
+    pygame.init()
+    pygame.display.set_caption("PING spectator")
+    clock = pygame.time.Clock()
+    white = (255, 255, 255)
+    screen = None
+    while True:
+        clock.tick(60)
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                sock.close()
+                pygame.quit()
+                return
+        try:
+            data = sock.recv(65536)
+            if not data:
+                break
+        except BlockingIOError:
+            data = b""
+        frames = reader.feed(data)
+        if reader.matches != matches:
+            # The first match watched, or the broadcast moved on to a new one
+            matches = reader.matches
+            sim = Simulation(reader.width, reader.height, reader.goal_score,
+                             reader.infinite_mode)
+            screen = pygame.display.set_mode((sim.width, sim.height))
+        if sim is None:
+            continue
+        if frames:
+            restore(sim, frames[-1][1])
+        screen.fill((0, 0, 0))
+        for box in (sim.upper_bound, sim.lower_bound, *sim.paddles):
+            pygame.draw.rect(screen, white, box.get_bounds()[:2] +
+                             (box.width, box.height))
+        pygame.draw.circle(screen, white,
+                           (int(sim.ball.x), int(sim.ball.y)),
+                           sim.ball.radius)
+        text = render_text("{} - {}".format(sim.paddles[0].score,
+                                            sim.paddles[1].score), 24, white)
+        screen.blit(text, text.get_rect(centerx=sim.width // 2,
+                                        top=sim.y_bound[0] + 10))
+        pygame.display.flip()
+    sock.close()
+    pygame.quit()
+
+
+def _address(text: str) -> Tuple[str, int]:
+    host, _, port = text.partition(":")
+    return host, int(port) if port else DEFAULT_PORT
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Broadcast, watch or load test a broadcast from the command line.
+    """
+    parser = argparse.ArgumentParser(
+        prog="main.py spectate",
+        description="Broadcast matches to many spectators.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser(
+        "serve", help="broadcast matches between two computer players")
+    serve.add_argument("--host", default="0.0.0.0")
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve.add_argument("--goal", type=int, default=10)
+    serve.add_argument("--frame-rate", type=int, default=FRAME_RATE)
+    serve.add_argument("--seconds", type=float,
+                       help="stop after this long instead of never")
+    serve.add_argument("--stats", type=float, default=0, metavar="SECONDS",
+                       help="print the number of spectators and frames "
+                            "this often")
+    watcher = commands.add_parser("watch", help="watch a broadcast")
+    watcher.add_argument("address", metavar="HOST[:PORT]")
+    load = commands.add_parser(
+        "load", help="open many spectator connections to a broadcast")
+    load.add_argument("address", metavar="HOST[:PORT]")
+    load.add_argument("--connections", type=int, default=1000)
+    load.add_argument("--seconds", type=float, default=10.0)
+    load.add_argument("--slow", type=float, default=0.1,
+                      help="fraction of the connections that never read")
+    load.add_argument("--batch", type=int, default=CONNECT_BATCH,
+                      help="connections opened at once")
+    args = parser.parse_args(argv)
+
+    if args.command == "watch":
+        watch(*_address(args.address))
+    elif args.command == "load":
+        result = asyncio.run(load_test(*_address(args.address),
+                                       args.connections, args.seconds,
+                                       args.slow, args.batch))
+        print("{connections} connections ({slow} never reading) opened in "
+              "{connect_seconds:.2f} s, {failed} refused; each reader received a median of "
+              "{frames_median} frames ({frames_per_second:.1f}/s), "
+              "at least {frames_min}".format(**result))
+    else:
+        asyncio.run(_serve(args))
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    sim = Simulation(SCREEN_SIZE[0], SCREEN_SIZE[1], args.goal,
+                     rng=random.Random())
+    broadcaster = Broadcaster(sim.width, sim.height, sim.goal_score,
+                              sim.infinite_mode)
+    await broadcaster.serve(args.host, args.port)
+    print("Broadcasting on {}:{}".format(args.host, args.port), flush=True)
+
+    async def report() -> None:
+        while True:
+            await asyncio.sleep(args.stats)
+            print("{spectators} spectators, {frames} frames, {sent} sent, "
+                  "{dropped} dropped".format(**broadcaster.stats()),
+                  flush=True)
+    if args.stats:
+        asyncio.ensure_future(report())
+    ticks = None if args.seconds is None else int(args.seconds * TICK_RATE)
+    try:
+        await broadcast_match(broadcaster, sim, args.frame_rate, TICK_RATE,
+                              ticks)
+    finally:
+        broadcaster.stop()
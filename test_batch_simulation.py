@@ -0,0 +1,80 @@
+"""
+Tests that the vectorized sweep in batch_simulation.py gives the same
+contacts as physics.py and Simulation.
+"""
+import math
+import random
+import numpy as np
+import pytest
+from batch_simulation import swept_circle_aabb
+from physics import swept_circle_aabb as scalar_sweep
+from simulation import BALL_RADIUS, Simulation
+
+
+def _scalar_times(cases: list, r: float) -> list:
+    """
+    Return the time of contact physics.swept_circle_aabb finds for each of
+    <cases>, or infinity for none.
+    """
+    times = []
+    for case in cases:
+        impact = scalar_sweep(*case[:4], r, *case[4:])
+        times.append(math.inf if impact is None else impact.t)
+    return times
+
+
+def _batch_times(cases: list, r: float) -> np.ndarray:
+    """
+    Return the times of contact the vectorized sweep finds for <cases>.
+    """
+    columns = [np.array(column, dtype=float) for column in zip(*cases)]
+    return swept_circle_aabb(*columns[:4], r, *columns[4:])
+
+
+def test_corner_region_inside_grown_rectangle() -> None:
+    case = (918.06, 420.57, 10, -1.40, 935, 325.36, 950, 405.36)
+    times = _batch_times([case], 18)
+    assert times[0] == pytest.approx(_scalar_times([case], 18)[0])
+    assert math.isfinite(times[0])
+
+
+def test_matches_scalar_sweep_on_random_inputs() -> None:
+    rng = random.Random(2)
+    cases = []
+    for _ in range(20000):
+        left, top = rng.uniform(100, 200), rng.uniform(100, 200)
+        right, bottom = left + rng.uniform(1, 30), top + rng.uniform(1, 90)
+        # Some still and some axis-aligned steps, as well as any others
+        vx = rng.choice((0.0, rng.uniform(-40, 40)))
+        vy = rng.choice((0.0, rng.uniform(-40, 40)))
+        cases.append((rng.uniform(left - 60, right + 60),
+                      rng.uniform(top - 60, bottom + 60), vx, vy,
+                      left, top, right, bottom))
+    expected = _scalar_times(cases, 18)
+    actual = _batch_times(cases, 18)
+    for want, got in zip(expected, actual):
+        assert got == pytest.approx(want)
+
+
+def test_matches_simulation_paddle_impacts() -> None:
+    rng = random.Random(3)
+    sim = Simulation(960, 500)
+    paddles = sim.paddles
+    for _ in range(5000):
+        for paddle in paddles:
+            paddle.y = rng.uniform(sim.y_bound[0],
+                                   sim.y_bound[1] - paddle.height)
+            sim.world.update(paddle)
+        side = rng.randrange(2)
+        paddle = paddles[side]
+        x = rng.uniform(paddle.x - 80, paddle.x + paddle.width + 80)
+        y = rng.uniform(paddle.y - 80, paddle.y + paddle.height + 80)
+        step_x, step_y = rng.uniform(-30, 30), rng.uniform(-30, 30)
+        sim.ball.x, sim.ball.y = x, y
+        impact = sim.ball_impact(step_x, step_y)
+
+        times = [_batch_times([(x, y, step_x, step_y,
+                                *other.get_bounds())], BALL_RADIUS)[0]
+                 for other in paddles]
+        assert min(times) == pytest.approx(
+            math.inf if impact is None else impact.t)
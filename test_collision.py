@@ -0,0 +1,37 @@
+"""
+Tests for the grid broadphase of collision.py.
+"""
+from collision import CollisionWorld
+
+
+class _Body:
+    def __init__(self, left: float, top: float, right: float,
+                 bottom: float) -> None:
+        self.bounds = (left, top, right, bottom)
+
+    def get_bounds(self) -> tuple:
+        return self.bounds
+
+
+def test_queries_in_insertion_order() -> None:
+    world = CollisionWorld()
+    bodies = [_Body(10 * i, 0, 10 * i + 50, 50) for i in range(4)]
+    for body in reversed(bodies):
+        world.insert(body)
+    assert world.query_box(0, 0, 100, 100) == bodies[::-1]
+    assert world.query_point(45, 25) == bodies[::-1]
+
+
+def test_cleared_world_starts_over() -> None:
+    world = CollisionWorld()
+    for i in range(3):
+        world.insert(_Body(i, i, i + 5, i + 5))
+    world.clear()
+    fresh = CollisionWorld()
+    bodies = [_Body(0, 0, 20, 20), _Body(5, 5, 30, 30)]
+    for target in (world, fresh):
+        for body in bodies:
+            target.insert(body)
+    assert len(world) == 2
+    assert world.query_box(0, 0, 40, 40) == bodies
+    assert world._next_order == fresh._next_order == 2
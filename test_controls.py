@@ -0,0 +1,79 @@
+"""
+Tests for the input sources of controls.py, driving a game headless
+through Game.update as a player at the keyboard would.
+"""
+import os
+import random
+import pytest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+from controls import (MOVE_DOWN, MOVE_UP, SERVE, AISource, ReplaySource,
+                      ScriptedSource, pack_frame)
+from game import Game
+from leaderboard import Leaderboard
+from lifecycle import GAME_OVER
+
+SCREEN_SIZE = (960, 500)
+GOAL = 2
+MAX_TICKS = 60000
+
+
+@pytest.fixture(scope="module", autouse=True)
+def display():
+    pygame.init()
+    pygame.display.set_mode(SCREEN_SIZE)
+    yield
+    pygame.quit()
+
+
+def _game(sources: list, record: bool = True) -> Game:
+    """
+    Return a game to GOAL played by <sources>, ready for its first serve,
+    that records a replay of its match if <record>.
+    """
+    game = Game(SCREEN_SIZE, GOAL, Leaderboard(":memory:"))
+    game.read_events = False
+    game.record_replays = record
+    game.sources = sources
+    game.on_init()
+    return game
+
+
+def _play(game: Game) -> None:
+    """
+    Play the match of <game> tick by tick until it is over.
+    """
+    dt = game.get_tick_dt()
+    while game.lifecycle.state != GAME_OVER:
+        assert game.ticks < MAX_TICKS
+        game.update(dt)
+
+
+def test_shared_script_steps_once_a_tick() -> None:
+    script = ScriptedSource([SERVE, MOVE_UP, MOVE_DOWN])
+    game = _game([script, script])
+    frames = []
+    for _ in range(4):
+        frames.append(game.poll_actions())
+        game.update(game.get_tick_dt())
+    assert frames == [pack_frame([action, action])
+                      for action in (SERVE, MOVE_UP, MOVE_DOWN, 0)]
+
+
+def test_replay_source_plays_the_match_again() -> None:
+    rng = random.Random(6)
+    script = [rng.choice((0, MOVE_UP, MOVE_DOWN, SERVE))
+              for _ in range(997)]
+    recorded = _game([ScriptedSource(script, loop=True), AISource()])
+    _play(recorded)
+    replay = recorded.recorder.stop()
+    assert recorded.sim.winner() is not None
+
+    source = ReplaySource(replay)
+    game = _game([source, source], record=False)
+    game.sim.rng = replay.random()
+    _play(game)
+    assert game.capture_state() == recorded.capture_state()
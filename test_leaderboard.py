@@ -0,0 +1,67 @@
+"""
+Tests for the SQLite leaderboard of leaderboard.py.
+"""
+from leaderboard import (INFINITE_MODE, Entry, Leaderboard, import_high_score,
+                         mode_name)
+
+
+def test_mode_name() -> None:
+    assert mode_name(10, False) == "first to 10"
+    assert mode_name(10, True) == INFINITE_MODE
+
+
+def test_top_scores_best_first(tmp_path) -> None:
+    board = Leaderboard(str(tmp_path / "scores.db"))
+    board.record("Player 1", 3, "first to 5", "2026-01-01T10:00:00")
+    board.record("Player 2", 7, "first to 5", "2026-01-01T11:00:00")
+    board.record("Player 1", 3, "first to 5", "2026-01-01T12:00:00")
+    board.record("Player 2", 9, INFINITE_MODE, "2026-01-01T13:00:00")
+    assert board.top(2, "first to 5") == [
+        Entry("Player 2", 7, "first to 5", "2026-01-01T11:00:00"),
+        Entry("Player 1", 3, "first to 5", "2026-01-01T10:00:00")]
+    assert [entry.score for entry in board.top(10)] == [9, 7, 3, 3]
+    assert board.best("first to 5") == 7
+    assert board.best("first to 11") == 0
+    board.close()
+
+
+def test_only_the_best_are_kept(tmp_path) -> None:
+    board = Leaderboard(str(tmp_path / "scores.db"), keep=3)
+    for score in (5, 1, 8, 2, 6):
+        board.record("Player 1", score, INFINITE_MODE)
+    assert [entry.score for entry in board.top(10)] == [8, 6, 5]
+    board.close()
+
+
+def test_instances_share_the_file(tmp_path) -> None:
+    path = str(tmp_path / "scores.db")
+    reader, writer = Leaderboard(path), Leaderboard(path)
+    version = reader.version()
+    writer.record("Player 2", 4, INFINITE_MODE)
+    assert reader.version() != version
+    assert reader.best(INFINITE_MODE) == 4
+    reader.close()
+    writer.close()
+
+
+def test_import_high_score(tmp_path) -> None:
+    board = Leaderboard(str(tmp_path / "scores.db"))
+    path = tmp_path / "high_score_value.txt"
+    assert not import_high_score(board, str(path))
+    path.write_text("23\n")
+    assert import_high_score(board, str(path))
+    # Only once: the file is kept, under another name
+    assert not import_high_score(board, str(path))
+    assert (tmp_path / "high_score_value.txt.imported").read_text() == "23\n"
+    assert [(entry.player, entry.score, entry.mode)
+            for entry in board.top(10)] == [("Player", 23, INFINITE_MODE)]
+    board.close()
+
+
+def test_import_empty_high_score(tmp_path) -> None:
+    board = Leaderboard(str(tmp_path / "scores.db"))
+    path = tmp_path / "high_score_value.txt"
+    path.write_text("")
+    assert not import_high_score(board, str(path))
+    assert board.top(10) == []
+    board.close()
@@ -0,0 +1,62 @@
+"""
+Tests for the stages of a game and the transitions between them in
+lifecycle.py.
+"""
+import pytest
+from lifecycle import (GAME_OVER, MENU, PAUSED, PLAYING, READY, TRANSITIONS,
+                       Lifecycle)
+
+STAGES = [MENU, READY, PLAYING, PAUSED, GAME_OVER]
+
+
+def test_a_match() -> None:
+    changes = []
+    lifecycle = Lifecycle(lambda old, new: changes.append((old, new)))
+    for state in (READY, PLAYING, PAUSED, PLAYING, READY, PLAYING,
+                  GAME_OVER, READY, MENU):
+        assert lifecycle.go(state)
+    assert changes[:2] == [(MENU, READY), (READY, PLAYING)]
+    assert changes[-1] == (READY, MENU)
+    assert len(changes) == 9
+
+
+def test_staying_is_no_change() -> None:
+    changes = []
+    lifecycle = Lifecycle(lambda old, new: changes.append((old, new)), READY)
+    assert not lifecycle.go(READY)
+    assert changes == []
+
+
+@pytest.mark.parametrize("old, new", [
+    (old, new) for old in STAGES for new in STAGES
+    if new != old and new not in TRANSITIONS[old]])
+def test_illegal_transitions_raise(old: str, new: str) -> None:
+    changes = []
+    lifecycle = Lifecycle(lambda old, new: changes.append((old, new)), old)
+    with pytest.raises(ValueError):
+        lifecycle.go(new)
+    assert lifecycle.state == old
+    assert changes == []
+
+
+@pytest.mark.parametrize("old", STAGES[1:])
+def test_every_match_stage_can_leave_for_the_menu(old: str) -> None:
+    lifecycle = Lifecycle(state=old)
+    assert lifecycle.go(MENU)
+    assert not lifecycle.in_match
+
+
+@pytest.mark.parametrize("old, new, route", [
+    (READY, PAUSED, [PLAYING, PAUSED]),
+    (GAME_OVER, PAUSED, [READY, PLAYING, PAUSED]),
+    (PAUSED, READY, [PLAYING, READY]),
+    (PAUSED, GAME_OVER, [PLAYING, GAME_OVER]),
+    (PLAYING, PLAYING, []),
+])
+def test_route(old: str, new: str, route: list) -> None:
+    changes = []
+    lifecycle = Lifecycle(lambda old, new: changes.append(new), old)
+    assert lifecycle.route(new) == route
+    assert lifecycle.go_to(new) == bool(route)
+    assert changes == route
+    assert lifecycle.state == new
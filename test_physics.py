@@ -0,0 +1,74 @@
+"""
+Tests for the continuous collision helpers in physics.py.
+"""
+import math
+import random
+from physics import swept_circle_aabb
+
+PADDLE = (935, 325.36, 950, 405.36)
+RADIUS = 18
+
+
+def _distance(x: float, y: float, left: float, top: float, right: float,
+              bottom: float) -> float:
+    """
+    Return the distance from <x>, <y> to the rectangle.
+    """
+    dx = max(left - x, 0, x - right)
+    dy = max(top - y, 0, y - bottom)
+    return math.hypot(dx, dy)
+
+
+def _closest_approach(px: float, py: float, vx: float, vy: float,
+                      end: float, rect: tuple, steps: int = 64) -> float:
+    """
+    Return the least distance to <rect> of the point <px>, <py> moving by
+    <vx>, <vy> up to the fraction <end> of the step.
+    """
+    return min(_distance(px + vx * end * i / steps,
+                         py + vy * end * i / steps, *rect)
+               for i in range(steps + 1))
+
+
+def test_face_hit() -> None:
+    impact = swept_circle_aabb(900, 360, 30, 0, RADIUS, *PADDLE)
+    assert impact is not None
+    assert math.isclose(impact.t, (935 - 18 - 900) / 30)
+    assert (impact.nx, impact.ny) == (-1.0, 0.0)
+
+
+def test_moving_away_from_face() -> None:
+    assert swept_circle_aabb(900, 360, -30, 0, RADIUS, *PADDLE) is None
+
+
+def test_miss() -> None:
+    assert swept_circle_aabb(900, 200, 30, 0, RADIUS, *PADDLE) is None
+
+
+def test_corner_region_inside_grown_rectangle() -> None:
+    # The centre starts inside the rectangle grown by the radius, but
+    # outside the rounded corner, and reaches the corner during the step
+    impact = swept_circle_aabb(918.06, 420.57, 10, -1.40, RADIUS, *PADDLE)
+    assert impact is not None
+    assert (impact.x, impact.y) == (935, 405.36)
+    centre_x = 918.06 + 10 * impact.t
+    centre_y = 420.57 - 1.40 * impact.t
+    assert math.isclose(_distance(centre_x, centre_y, *PADDLE), RADIUS)
+
+
+def test_random_sweeps_never_pass_into_the_paddle() -> None:
+    rng = random.Random(1)
+    left, top, right, bottom = PADDLE
+    for _ in range(20000):
+        px = rng.uniform(left - 60, right + 60)
+        py = rng.uniform(top - 60, bottom + 60)
+        if _distance(px, py, *PADDLE) < RADIUS:
+            continue
+        vx, vy = rng.uniform(-30, 30), rng.uniform(-30, 30)
+        impact = swept_circle_aabb(px, py, vx, vy, RADIUS, *PADDLE)
+        end = 1.0 if impact is None else impact.t
+        assert _closest_approach(px, py, vx, vy, end, PADDLE) > RADIUS - 1e-6
+        if impact is not None:
+            x, y = px + vx * impact.t, py + vy * impact.t
+            assert math.isclose(_distance(x, y, *PADDLE), RADIUS,
+                                abs_tol=1e-6)
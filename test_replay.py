@@ -0,0 +1,126 @@
+"""
+Tests for recording matches as replays and playing them back in replay.py.
+"""
+import os
+import random
+import zlib
+import pytest
+from replay import (EXTENSION, KEYFRAME_INTERVAL, Replay, ReplayPlayer,
+                    ReplayRecorder, decode_inputs, encode_inputs,
+                    prune_replays)
+from simulation import DOWN, STAY, UP, Simulation
+
+DT = 0.5
+
+
+def _follow(sim: Simulation, index: int) -> int:
+    """
+    Return the direction that moves paddle <index> towards the ball.
+    """
+    paddle = sim.paddles[index]
+    centre = paddle.y + paddle.height / 2
+    if abs(centre - sim.ball.y) < 5:
+        return STAY
+    return UP if centre > sim.ball.y else DOWN
+
+
+def _state(sim: Simulation) -> tuple:
+    ball = sim.ball
+    return (ball.x, ball.y, ball.dx, ball.dy, sim.waiting,
+            tuple((paddle.y, paddle.score) for paddle in sim.paddles))
+
+
+def _record(seed: int, max_ticks: int = 20000) -> tuple:
+    """
+    Record a match of a player following the ball against one moving at
+    random, and return the replay and the final state of the match.
+    """
+    sim = Simulation(960, 500, 3, rng=random.Random(seed))
+    recorder = ReplayRecorder(sim, DT)
+    moves = random.Random(seed + 1)
+    for _ in range(max_ticks):
+        if sim.waiting:
+            if sim.winner() is not None:
+                break
+            sim.serve()
+        inputs = [_follow(sim, 0), moves.choice((UP, STAY, DOWN))]
+        recorder.record(inputs)
+        sim.step(inputs, DT)
+    return recorder.stop(), _state(sim)
+
+
+@pytest.fixture(scope="module")
+def recorded() -> tuple:
+    return _record(4)
+
+
+def test_inputs_round_trip() -> None:
+    for first in (UP, STAY, DOWN):
+        for second in (UP, STAY, DOWN):
+            assert decode_inputs(encode_inputs([first, second])) == \
+                (first, second)
+
+
+def test_bytes_round_trip(recorded: tuple) -> None:
+    replay = recorded[0]
+    copy = Replay.from_bytes(replay.to_bytes())
+    assert (copy.width, copy.height, copy.goal_score, copy.infinite_mode,
+            copy.dt) == (960, 500, 3, False, DT)
+    assert copy.inputs == replay.inputs
+    assert copy.draws == replay.draws
+
+
+def test_corrupt_bytes() -> None:
+    data = Replay(960, 500, 3, False, DT).to_bytes()
+    for bad in (data[:10], b"JUNK" + data[4:]):
+        with pytest.raises(ValueError):
+            Replay.from_bytes(bad)
+
+
+def test_playback_reproduces_the_match(recorded: tuple) -> None:
+    replay, final = recorded
+    assert len(replay) > 2 * KEYFRAME_INTERVAL
+    player = ReplayPlayer(Replay.from_bytes(replay.to_bytes()))
+    player.advance(len(replay))
+    assert player.finished()
+    assert _state(player.sim) == final
+    assert player.sim.winner() is not None
+
+
+def test_seek_matches_playing_straight_through(recorded: tuple) -> None:
+    replay = recorded[0]
+    straight = ReplayPlayer(replay)
+    states = [_state(straight.sim)]
+    while not straight.finished():
+        straight.step()
+        states.append(_state(straight.sim))
+
+    player = ReplayPlayer(replay)
+    rng = random.Random(5)
+    for _ in range(30):
+        tick = rng.randrange(len(replay) + 1)
+        player.seek(tick)
+        assert player.tick == tick
+        assert _state(player.sim) == states[tick]
+    player.seek(0)
+    assert _state(player.sim) == states[0]
+
+
+def test_corrupt_body() -> None:
+    data = Replay(960, 500, 3, False, DT).to_bytes()
+    header = len(data) - len(zlib.compress(b"", 9))
+    with pytest.raises(ValueError):
+        Replay.from_bytes(data[:header] + b"not zlib data")
+
+
+def test_prune_keeps_the_newest(tmp_path) -> None:
+    for i in range(5):
+        path = tmp_path / "match-{}{}".format(i, EXTENSION)
+        path.write_bytes(b"")
+        os.utime(path, (1000 + i, 1000 + i))
+    (tmp_path / "notes.txt").write_text("")
+    deleted = prune_replays(str(tmp_path), keep=2)
+    assert sorted(os.path.basename(path) for path in deleted) == \
+        ["match-0" + EXTENSION, "match-1" + EXTENSION, "match-2" + EXTENSION]
+    assert sorted(os.listdir(tmp_path)) == \
+        ["match-3" + EXTENSION, "match-4" + EXTENSION, "notes.txt"]
@@ -0,0 +1,101 @@
+"""
+Tests for the snapshot format of snapshot.py, sent over the network and
+written to saved states.
+"""
+import struct
+import pytest
+from simulation import Simulation
+from snapshot import (MAGIC, OVER, VERSION, WINNER_2, DeltaDecoder,
+                      DeltaEncoder, State, capture, decode, encode, load_state,
+                      restore, save_state)
+
+STATE = State(7680, 4000, -1536, 870, 3200, 5120, 3, 9, 2)
+
+
+def test_encode_decode_round_trip() -> None:
+    assert decode(encode(12, STATE)) == (12, STATE)
+
+
+def test_delta_encodes_only_the_changes() -> None:
+    base = STATE._replace(ball_x=7000, score2=8)
+    data = encode(13, STATE, 10, base)
+    assert len(data) < len(encode(13, STATE))
+    assert decode(data, {10: base}) == (13, STATE)
+
+
+def test_delta_encoder_and_decoder() -> None:
+    encoder, decoder = DeltaEncoder(), DeltaDecoder()
+    for tick in range(1, 50):
+        state = STATE._replace(ball_x=STATE.ball_x + tick * 37,
+                               ball_dy=-tick)
+        assert decoder.decode(encoder.encode(tick, state)) == (tick, state)
+        if tick % 5 == 0:
+            encoder.ack(decoder.newest)
+
+
+def test_capture_restore() -> None:
+    sim = Simulation(960, 500)
+    sim.ball.x, sim.ball.y, sim.ball.dx, sim.ball.dy = 300.5, 210.25, -4, 2
+    sim.paddles[1].score = 4
+    state = capture(sim, paused=True)
+    other = Simulation(960, 500)
+    restore(other, state)
+    assert capture(other, paused=True) == state
+
+
+def test_save_load_round_trip(tmp_path) -> None:
+    path = str(tmp_path / "game.pingstate")
+    save_state(path, STATE, 11, True)
+    assert load_state(path) == (STATE, 11, True)
+
+
+def test_truncated_snapshot() -> None:
+    data = encode(12, STATE)
+    for end in range(len(data)):
+        with pytest.raises(ValueError):
+            decode(data[:end])
+
+
+def test_unknown_base() -> None:
+    with pytest.raises(ValueError):
+        decode(encode(13, STATE, 10, STATE._replace(score1=0)))
+
+
+@pytest.mark.parametrize("data", [
+    b"",
+    b"PNG",
+    b"\x89PNG\r\n\x1a\n" + bytes(64),
+    struct.pack("<4sHH?", MAGIC, VERSION + 1, 10, False) + encode(0, STATE),
+    struct.pack("<4sHH?", MAGIC, VERSION, 10, False),
+    struct.pack("<4sHH?", MAGIC, VERSION, 10, False) + encode(0, STATE)[:9],
+])
+def test_load_corrupt_state(tmp_path, data: bytes) -> None:
+    path = tmp_path / "game.pingstate"
+    path.write_bytes(data)
+    with pytest.raises(ValueError):
+        load_state(str(path))
+
+
+@pytest.mark.parametrize("state, goal_score, infinite_mode", [
+    # Over, though neither score reached the goal
+    (STATE._replace(score1=1, score2=2, flags=OVER), 10, False),
+    # Over in infinite mode
+    (STATE._replace(score1=12, score2=2, flags=OVER), 10, True),
+    # Won by the player who did not reach the goal
+    (STATE._replace(score1=10, score2=2, flags=OVER | WINNER_2), 10, False),
+    # A score reached the goal, but the match goes on
+    (STATE._replace(score1=10, score2=2, flags=0), 10, False),
+])
+def test_load_inconsistent_state(tmp_path, state: State, goal_score: int,
+                                 infinite_mode: bool) -> None:
+    path = str(tmp_path / "game.pingstate")
+    save_state(path, state, goal_score, infinite_mode)
+    with pytest.raises(ValueError):
+        load_state(path)
+
+
+def test_load_won_state(tmp_path) -> None:
+    path = str(tmp_path / "game.pingstate")
+    state = STATE._replace(score1=3, score2=10, flags=OVER | WINNER_2)
+    save_state(path, state, 10, False)
+    assert load_state(path) == (state, 10, False)
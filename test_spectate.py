@@ -0,0 +1,71 @@
+"""
+Tests for the spectator streams of spectate.py.
+"""
+import asyncio
+from spectate import Broadcaster, FrameReader, load_test
+from snapshot import State
+
+STATE = State(7680, 4000, -1536, 870, 3200, 5120, 3, 9, 1)
+
+
+class _Transport:
+    """
+    Keeps the bytes written to a spectator.
+    """
+
+    def __init__(self) -> None:
+        self.data = bytearray()
+
+    def write(self, data: bytes) -> None:
+        self.data += data
+
+
+class _Spectator:
+    behind = False
+
+    def __init__(self) -> None:
+        self.transport = _Transport()
+
+
+def test_new_match_restarts_connected_streams() -> None:
+    broadcaster = Broadcaster(960, 500, 10, False)
+    spectator = _Spectator()
+    broadcaster.add(spectator)
+    broadcaster.publish(1, STATE)
+    broadcaster.set_match(800, 400, 5, True)
+    broadcaster.publish(2, STATE._replace(score1=0, score2=0))
+
+    reader = FrameReader()
+    data = bytes(spectator.transport.data)
+    # Fed a byte at a time, the stream splits up the same
+    frames = [frame for i in range(len(data))
+              for frame in reader.feed(data[i:i + 1])]
+    assert reader.matches == 2
+    assert (reader.width, reader.height, reader.goal_score,
+            reader.infinite_mode) == (800, 400, 5, True)
+    assert frames[-1] == (2, STATE._replace(score1=0, score2=0))
+
+    # A spectator who joins now starts at the new match
+    late = _Spectator()
+    broadcaster.add(late)
+    reader = FrameReader()
+    assert reader.feed(bytes(late.transport.data)) == \
+        [(2, STATE._replace(score1=0, score2=0))]
+    assert reader.matches == 1
+
+
+def test_load_test_opens_every_connection() -> None:
+    async def run() -> dict:
+        broadcaster = Broadcaster(960, 500, 10, False)
+        await broadcaster.serve("127.0.0.1", 0)
+        port = broadcaster._server.sockets[0].getsockname()[1]
+        broadcaster.publish(1, STATE)
+        try:
+            return await load_test("127.0.0.1", port, 60, 0.1, 0.1,
+                                   batch=16)
+        finally:
+            broadcaster.stop()
+    result = asyncio.run(run())
+    assert result["connections"] == 60
+    assert result["slow"] == 6
+    assert result["failed"] == 0
@@ -0,0 +1,14 @@
+"""
+Tests for the command line of tournament.py.
+"""
+import pytest
+from tournament import main
+
+
+@pytest.mark.parametrize("argument", ["--matches", "--workers", "--goal",
+                                      "--chunk-size", "--max-ticks"])
+@pytest.mark.parametrize("value", ["0", "-3", "many"])
+def test_rejects_counts_below_one(argument: str, value: str, capsys) -> None:
+    with pytest.raises(SystemExit):
+        main([argument, value])
+    assert "greater than 0" in capsys.readouterr().err
@@ -0,0 +1,95 @@
+"""
+A shared font registry and a cache of rendered text surfaces, so that text
+drawn every frame is only rendered once.
+"""
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+import pygame
+
+_fonts: Dict[Tuple[Optional[str], int], pygame.font.Font] = {}
+
+
+def get_font(size: int, face: Optional[str] = None) -> pygame.font.Font:
+    """
+    Return the shared font for the given <face> and <size>, loading it the
+    first time it is asked for. A <face> of None is pygame's default font.
+    """
+    key = (face, size)
+    font = _fonts.get(key)
+    if font is None:
+        font = pygame.font.Font(face, size)
+        _fonts[key] = font
+    return font
+
+
+class TextCache:
+    """
+    A bounded least-recently-used cache of rendered text surfaces.
+
+    === Public Attributes ===
+    max_size:
+        The most surfaces kept in this cache
+    hits:
+        The number of lookups answered from this cache
+    misses:
+        The number of lookups that had to render the text
+
+    === Private Attributes ===
+    _surfaces:
+        The cached surfaces, from least to most recently used
+    """
+    max_size: int
+    hits: int
+    misses: int
+    _surfaces: OrderedDict
+
+    def __init__(self, max_size: int = 256) -> None:
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._surfaces = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._surfaces)
+
+    def render(self, text: str, size: int, colour: Tuple[int, int, int],
+               antialias: bool = True,
+               face: Optional[str] = None) -> pygame.Surface:
+        """
+        Return a surface with <text> rendered at <size> in <colour>.
+        The returned surface is shared and must not be drawn on.
+        """
+        key = (text, size, tuple(colour), bool(antialias), face)
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self._surfaces.move_to_end(key)
+            return surface
+        self.misses += 1
+        surface = get_font(size, face).render(text, antialias, colour)
+        self._surfaces[key] = surface
+        if len(self._surfaces) > self.max_size:
+            self._surfaces.popitem(last=False)
+        return surface
+
+    def clear(self) -> None:
+        """
+        Drop every cached surface and reset the counters.
+        """
+        self._surfaces.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+# The cache shared by everything that draws text
+text_cache = TextCache()
+
+
+def render_text(text: str, size: int, colour: Tuple[int, int, int],
+                antialias: bool = True,
+                face: Optional[str] = None) -> pygame.Surface:
+    """
+    Render <text> through the shared text cache.
+    """
+    return text_cache.render(text, size, colour, antialias, face)
@@ -0,0 +1,259 @@
+"""
+Play many headless matches between paddle controllers on a pool of worker
+processes, and report win rates, rally lengths and throughput.
+
+Run it through main.py, for example:
+
+    python main.py simulate --matches 100000 --workers 8 --goal 10
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import random
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence
+from ai import AIController
+from simulation import DOWN, STAY, UP, Simulation
+
+SCREEN_SIZE = (960, 500)
+# The length of one simulation step, in the game's units of time
+TICK = 1.0
+# A match that reaches this many ticks is stopped and scored as it stands
+MAX_TICKS = 20000
+
+
+def idle_controller(sim: Simulation, index: int) -> int:
+    """
+    Never move.
+    """
+    return STAY
+
+
+def random_controller(sim: Simulation, index: int) -> int:
+    """
+    Move in a random direction every tick.
+    """
+    return sim.rng.choice((UP, STAY, DOWN))
+
+
+def tracking_controller(sim: Simulation, index: int) -> int:
+    """
+    Keep the middle of the paddle level with the ball.
+    """
+    paddle = sim.paddles[index]
+    middle = paddle.y + paddle.height / 2
+    if sim.ball.y < middle - paddle.speed / 2:
+        return UP
+    if sim.ball.y > middle + paddle.speed / 2:
+        return DOWN
+    return STAY
+
+
+# The controllers a tournament can use, by name
+CONTROLLERS: Dict[str, Callable[[Simulation, int], int]] = {
+    "idle": idle_controller,
+    "random": random_controller,
+    "track": tracking_controller,
+    "ai": AIController(),
+}
+
+
+def play_match(sim: Simulation, controllers: Sequence[Callable],
+               rallies: Counter, max_ticks: int = MAX_TICKS) -> Dict:
+    """
+    Play one match of <sim> from 0-0, with <controllers> choosing the
+    direction of each paddle, and count the length of every rally in
+    <rallies>.
+
+    Return a dict with the winner's index (None for a draw) and the number
+    of ticks played.
+    """
+    sim.reset_match()
+    ticks = 0
+    winner = None
+    while ticks < max_ticks:
+        if sim.waiting:
+            sim.serve()
+        inputs = [controllers[0](sim, 0), controllers[1](sim, 1)]
+        ticks += 1
+        if sim.step(inputs, TICK) is not None:
+            rallies[sim.rally] += 1
+            winner = sim.winner()
+            if winner is not None:
+                break
+    if winner is None:
+        # Stopped early, or infinite mode: the higher score wins
+        score1, score2 = sim.paddles[0].score, sim.paddles[1].score
+        if score1 != score2:
+            winner = 0 if score1 > score2 else 1
+    return {"winner": winner, "ticks": ticks}
+
+
+def run_chunk(count: int, seed: int, goal: int, infinite: bool,
+              names: Sequence[str], max_ticks: int = MAX_TICKS) -> Dict:
+    """
+    Play <count> matches in this process and return their merged results.
+    This is the unit of work handed to each worker process.
+    """
+    sim = Simulation(SCREEN_SIZE[0], SCREEN_SIZE[1], goal, infinite,
+                     random.Random(seed))
+    controllers = [CONTROLLERS[name] for name in names]
+    wins = [0, 0, 0]
+    rallies = Counter()
+    ticks = 0
+    start = time.perf_counter()
+    for _ in range(count):
+        result = play_match(sim, controllers, rallies, max_ticks)
+        wins[2 if result["winner"] is None else result["winner"]] += 1
+        ticks += result["ticks"]
+    return {"matches": count, "wins": wins, "ticks": ticks,
+            "rallies": dict(rallies),
+            "seconds": time.perf_counter() - start}
+
+
+def _percentile(counts: Counter, fraction: float) -> int:
+    """
+    Return the value below which <fraction> of the values counted in
+    <counts> fall.
+    """
+    total = sum(counts.values())
+    seen = 0
+    for value in sorted(counts):
+        seen += counts[value]
+        if seen >= fraction * total:
+            return value
+    return 0
+
+
+def run_tournament(matches: int, workers: Optional[int] = None,
+                   goal: int = 10, infinite: bool = False,
+                   names: Sequence[str] = ("track", "track"),
+                   chunk_size: Optional[int] = None, seed: int = 0,
+                   max_ticks: int = MAX_TICKS) -> Dict:
+    """
+    Play <matches> matches between the controllers called <names> on
+    <workers> processes and return the merged results.
+
+    The matches are split into chunks of <chunk_size> so that each worker
+    only sends one small result back per chunk.
+    """
+    workers = workers or os.cpu_count() or 1
+    if chunk_size is None:
+        chunk_size = max(1, -(-matches // (workers * 4)))
+    chunks = []
+    left = matches
+    while left > 0:
+        chunks.append(min(chunk_size, left))
+        left -= chunks[-1]
+
+    wins = [0, 0, 0]
+    rallies = Counter()
+    ticks = 0
+    cpu_seconds = 0.0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_chunk, count, seed + i, goal, infinite,
+                               tuple(names), max_ticks)
+                   for i, count in enumerate(chunks)]
+        for future in futures:
+            result = future.result()
+            wins = [a + b for a, b in zip(wins, result["wins"])]
+            rallies.update({int(k): v for k, v in result["rallies"].items()})
+            ticks += result["ticks"]
+            cpu_seconds += result["seconds"]
+    wall_seconds = time.perf_counter() - start
+
+    points = sum(rallies.values())
+    return {
+        "matches": matches,
+        "workers": workers,
+        "chunks": len(chunks),
+        "controllers": list(names),
+        "goal_score": goal,
+        "infinite_mode": infinite,
+        "win_rate": [wins[0] / matches, wins[1] / matches],
+        "draw_rate": wins[2] / matches,
+        "rally": {
+            "points": points,
+            "mean": sum(k * v for k, v in rallies.items()) / points
+            if points else 0.0,
+            "p50": _percentile(rallies, 0.5),
+            "p90": _percentile(rallies, 0.9),
+            "p99": _percentile(rallies, 0.99),
+            "max": max(rallies) if rallies else 0,
+            "histogram": {str(k): rallies[k] for k in sorted(rallies)},
+        },
+        "ticks": ticks,
+        "wall_seconds": wall_seconds,
+        "cpu_seconds": cpu_seconds,
+        "matches_per_second": matches / wall_seconds,
+        "ticks_per_second": ticks / wall_seconds,
+    }
+
+
+def _positive_int(text: str) -> int:
+    """
+    Return the whole number greater than zero written in <text>.
+    """
+    try:
+        value = int(text)
+    except ValueError:
+        value = 0
+    if value < 1:
+        raise argparse.ArgumentTypeError(
+            "must be a whole number greater than 0, not " + repr(text))
+    return value
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Run a tournament from the command line and print its results.
+    """
+    parser = argparse.ArgumentParser(
+        prog="main.py simulate",
+        description="Play headless matches between paddle controllers.")
+    parser.add_argument("--matches", type=_positive_int, default=1000)
+    parser.add_argument("--workers", type=_positive_int, default=None,
+                        help="number of processes (default: one per core)")
+    parser.add_argument("--goal", type=_positive_int, default=10,
+                        help="score that wins a match")
+    parser.add_argument("--infinite", action="store_true",
+                        help="play in infinite mode until --max-ticks")
+    parser.add_argument("--player1", choices=sorted(CONTROLLERS),
+                        default="track")
+    parser.add_argument("--player2", choices=sorted(CONTROLLERS),
+                        default="track")
+    parser.add_argument("--chunk-size", type=_positive_int, default=None,
+                        help="matches per unit of work sent to a worker")
+    parser.add_argument("--max-ticks", type=_positive_int, default=MAX_TICKS,
+                        help="ticks after which a match is stopped")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", metavar="FILE",
+                        help="also write the results to FILE as JSON")
+    args = parser.parse_args(argv)
+
+    results = run_tournament(args.matches, args.workers, args.goal,
+                             args.infinite, (args.player1, args.player2),
+                             args.chunk_size, args.seed, args.max_ticks)
+
+    rally = results["rally"]
+    print("{} matches, {} vs {}, on {} workers in {} chunks".format(
+        results["matches"], args.player1, args.player2, results["workers"],
+        results["chunks"]))
+    print("win rate: player 1 {:.1%}, player 2 {:.1%}, draws {:.1%}".format(
+        results["win_rate"][0], results["win_rate"][1],
+        results["draw_rate"]))
+    print("rally length (paddle hits per point): mean {:.2f}, p50 {}, "
+          "p90 {}, p99 {}, max {}".format(rally["mean"], rally["p50"],
+                                         rally["p90"], rally["p99"],
+                                         rally["max"]))
+    print("throughput: {:.0f} matches/s, {:.0f} ticks/s "
+          "({:.2f}s wall, {:.2f}s cpu)".format(
+              results["matches_per_second"], results["ticks_per_second"],
+              results["wall_seconds"], results["cpu_seconds"]))
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)